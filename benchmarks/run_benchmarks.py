@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+回测热路径基准测试
+
+用合成行情数据（日线/分钟线）用run_rule_backtest执行回测（默认规则组：金叉死叉、相对强度、Martingale），
+并对RuleParser、IndicatorService、PortfolioManager做微基准测试，结果写入JSON，便于跨提交对比性能回归。
+
+使用方法：
+    # 默认规模（1k、10k根K线）
+    python benchmarks/run_benchmarks.py
+
+    # 指定规模、只运行名称包含backtest的基准，并与基线结果对比（慢于基线10%以上时返回1）
+    python benchmarks/run_benchmarks.py --sizes 1000,100000,1000000 --filter backtest \\
+        --compare benchmarks/results/baseline.json --threshold 0.1
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+import pandas as pd
+from synthetic_data import make_ohlcv
+from src.core.strategy.backtesting import BacktestConfig, run_rule_backtest
+from src.core.strategy.indicators import IndicatorService
+from src.core.strategy.rule_groups import DEFAULT_RULE_GROUPS
+from src.core.strategy.rule_parser import RuleParser
+from src.core.strategy.position_strategy import FixedPercentStrategy
+from src.core.portfolio.portfolio import PortfolioManager
+from src.support.log.logger import configure_logging
+
+SYMBOL = 'sh.600000'
+GOLDEN_CROSS = DEFAULT_RULE_GROUPS['金叉死叉']['buy_rule']
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+class Benchmark:
+    """单个基准测试：setup准备输入（不计时），run执行被测代码（计时）"""
+
+    def __init__(self, name: str, params: Dict[str, Any], setup: Callable[[], Any],
+                 run: Callable[[Any], Any], bars: int, check: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            check: 校验run的返回值（不计时），不满足时抛出异常，避免基准测试没有覆盖被测路径
+        """
+        self.name = name
+        self.params = params
+        self.setup = setup
+        self.run = run
+        self.bars = bars
+        self.check = check
+
+    @property
+    def key(self) -> str:
+        """基准测试的唯一标识（名称+参数），用于跨提交对比"""
+        return self.name + "[" + ",".join(f"{k}={v}" for k, v in self.params.items()) + "]"
+
+
+def _backtest_config(frequency: str, execution_mode: str) -> BacktestConfig:
+    return BacktestConfig(
+        start_date='19000101',
+        end_date='21001231',
+        target_symbol=SYMBOL,
+        frequency=frequency,
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.1},
+        execution_mode=execution_mode,
+        debug_mode='off',
+    )
+
+
+def _check_trades(results: Dict[str, Any]):
+    """端到端基准必须产生交易，否则没有覆盖订单、成交和组合处理"""
+    if not results.get('trades'):
+        raise RuntimeError("回测没有产生交易")
+
+
+def backtest_benchmarks(sizes: List[int], frequencies: List[str]) -> List[Benchmark]:
+    """run_rule_backtest端到端基准（含引擎构建）：默认规则组 × 数据频率 × K线数 × 执行模式（每次使用新的指标服务）"""
+    benchmarks = []
+    for frequency in frequencies:
+        for bars in sizes:
+            data = make_ohlcv(bars, frequency, SYMBOL)
+            for group, rules in DEFAULT_RULE_GROUPS.items():
+                for mode in ('event', 'hybrid'):
+                    def setup(data=data):
+                        return data.copy()
+
+                    def run(frame, frequency=frequency, mode=mode, rules=rules):
+                        return run_rule_backtest(_backtest_config(frequency, mode), frame, rules,
+                                                 IndicatorService(), strategy_name='benchmark')
+
+                    benchmarks.append(Benchmark(
+                        'backtest', {'group': group, 'frequency': frequency, 'bars': bars, 'mode': mode},
+                        setup, run, bars, check=_check_trades
+                    ))
+    return benchmarks
+
+
+def rule_parser_benchmarks(sizes: List[int]) -> List[Benchmark]:
+    """RuleParser微基准：逐K线求值（指标缓存已预热）和整列向量化求值"""
+    benchmarks = []
+    for bars in sizes:
+        data = make_ohlcv(bars)
+
+        def setup_parser(data=data):
+            parser = RuleParser(data, IndicatorService())
+            parser.precompute_indicators([GOLDEN_CROSS])
+            return parser
+
+        def evaluate_at(parser, bars=bars):
+            for index in range(bars):
+                parser.evaluate_at(GOLDEN_CROSS, index)
+                parser.clear_cache()
+
+        def evaluate_series(parser):
+            return parser.evaluate_series(GOLDEN_CROSS)
+
+        benchmarks.append(Benchmark('rule_parser.evaluate_at', {'bars': bars}, setup_parser, evaluate_at, bars))
+        benchmarks.append(Benchmark('rule_parser.evaluate_series', {'bars': bars}, setup_parser, evaluate_series, bars))
+    return benchmarks
+
+
+def indicator_benchmarks(sizes: List[int]) -> List[Benchmark]:
+    """IndicatorService微基准：整列计算（冷缓存）和逐K线取值（热缓存）"""
+    benchmarks = []
+    for bars in sizes:
+        close = make_ohlcv(bars)['close']
+        for func_name in ('sma', 'rsi'):
+            def compute(service, func_name=func_name, close=close):
+                return service.calculate_series(func_name, close, 14)
+
+            benchmarks.append(Benchmark(
+                'indicators.calculate_series', {'indicator': func_name, 'bars': bars},
+                IndicatorService, compute, bars
+            ))
+
+        def setup_warm(close=close):
+            service = IndicatorService()
+            service.precompute('sma', close, 14)
+            return service
+
+        def lookup(service, close=close, bars=bars):
+            for index in range(bars):
+                service.calculate_indicator('sma', close, index, 14)
+
+        benchmarks.append(Benchmark('indicators.calculate_indicator', {'bars': bars}, setup_warm, lookup, bars))
+    return benchmarks
+
+
+def portfolio_benchmarks(sizes: List[int]) -> List[Benchmark]:
+    """PortfolioManager微基准：逐K线调仓并记录净值，以及无交易区间的批量净值记录"""
+    benchmarks = []
+    for bars in sizes:
+        data = make_ohlcv(bars)
+        prices = data['close'].to_numpy()
+        times = list(data['combined_time'])
+
+        def setup():
+            return PortfolioManager(1e9, FixedPercentStrategy(1e9, 0.1))
+
+        def trade_and_record(portfolio, prices=prices, times=times):
+            for i, price in enumerate(prices):
+                portfolio.update_position(SYMBOL, 100 if i % 2 == 0 else -100, float(price))
+                portfolio.record_equity_history(times[i], {'close': price})
+
+        def record_batch(portfolio, prices=prices, times=times):
+            portfolio.record_equity_history_batch(times, {'close': prices})
+
+        benchmarks.append(Benchmark('portfolio.update_and_record', {'bars': bars}, setup, trade_and_record, bars))
+        benchmarks.append(Benchmark('portfolio.record_batch', {'bars': bars}, setup, record_batch, bars))
+    return benchmarks
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Dict[str, Any]:
+    """执行基准测试repeat次，返回耗时统计（秒）"""
+    timings = []
+    for _ in range(repeat):
+        state = benchmark.setup()
+        start = time.perf_counter()
+        result = benchmark.run(state)
+        timings.append(time.perf_counter() - start)
+        if benchmark.check is not None:
+            try:
+                benchmark.check(result)
+            except Exception as e:
+                raise RuntimeError(f"基准测试校验失败: {benchmark.key}: {str(e)}") from e
+    best = min(timings)
+    return {
+        'key': benchmark.key,
+        'name': benchmark.name,
+        'params': benchmark.params,
+        'repeat': repeat,
+        'min': best,
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'bars_per_second': benchmark.bars / best if best > 0 else None,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> List[str]:
+    """与基线结果对比（按min耗时）
+    Returns:
+        慢于基线超过threshold比例的基准测试标识
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {entry['key']: entry for entry in json.load(f)['results']}
+    regressions = []
+    print(f"\n与基线对比: {baseline_path}")
+    for entry in results:
+        base = baseline.get(entry['key'])
+        if base is None:
+            continue
+        ratio = entry['min'] / base['min'] if base['min'] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  <-- 回归'
+            regressions.append(entry['key'])
+        print(f"  {entry['key']:<80} {base['min']:.4f}s -> {entry['min']:.4f}s  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="回测热路径基准测试")
+    parser.add_argument('--sizes', default='1000,10000', help="K线数量列表，逗号分隔（默认1000,10000）")
+    parser.add_argument('--frequencies', default='d,5', help="数据频率列表，逗号分隔（d为日线，数字为分钟线）")
+    parser.add_argument('--repeat', type=int, default=3, help="每个基准的重复次数，取最小耗时")
+    parser.add_argument('--filter', default='', help="只运行标识中包含该字符串的基准")
+    parser.add_argument('--output', help="结果JSON路径，默认benchmarks/results/<提交>.json")
+    parser.add_argument('--compare', help="基线结果JSON路径")
+    parser.add_argument('--threshold', type=float, default=0.1, help="判定为回归的耗时增长比例")
+    parser.add_argument('--log-level', default='WARNING', help="回测日志级别")
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_level)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    frequencies = args.frequencies.split(',')
+    benchmarks = (
+        backtest_benchmarks(sizes, frequencies)
+        + rule_parser_benchmarks(sizes)
+        + indicator_benchmarks(sizes)
+        + portfolio_benchmarks(sizes)
+    )
+    benchmarks = [benchmark for benchmark in benchmarks if args.filter in benchmark.key]
+
+    results = []
+    for benchmark in benchmarks:
+        entry = measure(benchmark, args.repeat)
+        results.append(entry)
+        print(f"{entry['key']:<80} min {entry['min']:.4f}s  median {entry['median']:.4f}s  "
+              f"{entry['bars_per_second'] or 0:,.0f} bars/s")
+
+    commit = _git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+    if args.output:
+        output = Path(args.output)
+    else:
+        output = RESULTS_DIR / f"{commit or datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入: {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)}个基准慢于基线{args.threshold:.0%}以上")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
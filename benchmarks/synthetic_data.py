@@ -0,0 +1,68 @@
+"""基准测试用的合成行情数据
+
+按几何布朗运动生成收盘价，开高低价和成交量围绕收盘价随机生成，
+列结构与数据库读出的行情数据一致（code/date/time/open/high/low/close/volume/combined_time），
+相同参数总是生成相同的数据，保证不同提交之间的基准结果可比。
+"""
+import numpy as np
+import pandas as pd
+
+# A股交易时段（分钟线按此生成K线时间）
+SESSIONS = (('09:30', '11:30'), ('13:00', '15:00'))
+
+
+def _minute_offsets(frequency: int) -> pd.TimedeltaIndex:
+    """一个交易日内各根分钟K线相对0点的时间偏移（K线结束时间）"""
+    offsets = []
+    for start, end in SESSIONS:
+        start, end = pd.Timedelta(f"{start}:00"), pd.Timedelta(f"{end}:00")
+        offsets.append(pd.timedelta_range(start + pd.Timedelta(minutes=frequency), end, freq=f"{frequency}min"))
+    return offsets[0].append(offsets[1])
+
+
+def make_ohlcv(bars: int, frequency: str = 'd', symbol: str = 'sh.600000', seed: int = 0,
+               start: str = '2000-01-04') -> pd.DataFrame:
+    """生成合成OHLCV数据
+    Args:
+        bars: K线数量
+        frequency: 数据频率，'d'为日线，数字为分钟线周期（如'5'）
+        symbol: 标的代码
+        seed: 随机种子
+        start: 首个交易日
+    Returns:
+        行情数据DataFrame
+    Raises:
+        ValueError: 参数无效
+    """
+    if bars < 1:
+        raise ValueError("K线数量必须大于0")
+    if frequency == 'd':
+        times = pd.bdate_range(start, periods=bars)
+    elif frequency.isdigit() and 0 < int(frequency) <= 120:
+        offsets = _minute_offsets(int(frequency))
+        days = pd.bdate_range(start, periods=-(-bars // len(offsets)))
+        times = pd.DatetimeIndex(
+            (days.values[:, None] + offsets.values[None, :]).ravel()[:bars]
+        )
+    else:
+        raise ValueError(f"不支持的数据频率: {frequency}")
+
+    rng = np.random.default_rng(seed)
+    volatility = 0.02 if frequency == 'd' else 0.02 / np.sqrt(240 / int(frequency))
+    close = 10 * np.exp(np.cumsum(rng.normal(0, volatility, bars)))
+    spread = np.abs(rng.normal(0, volatility, (3, bars)))
+    open_ = close * (1 + rng.normal(0, volatility / 2, bars))
+    high = np.maximum(open_, close) * (1 + spread[0])
+    low = np.minimum(open_, close) * (1 - spread[1])
+
+    return pd.DataFrame({
+        'code': symbol,
+        'date': times.strftime('%Y-%m-%d'),
+        'time': times.strftime('%H:%M:%S'),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': rng.integers(1_000, 100_000, bars).astype(float),
+        'combined_time': times,
+    })
@@ -0,0 +1,446 @@
+"""命令行入口
+
+无界面批量执行回测：读取BacktestConfig的JSON配置，从本地Parquet/Arrow缓存（或数据库）加载行情数据，
+用run_rule_backtest执行规则策略回测，结果写入Parquet或JSON。
+optimize子命令对规则模板做参数网格/随机搜索，migrate-schema子命令迁移行情表结构。
+pandas、回测引擎和数据库模块都在执行命令时才导入，--help等不执行回测的调用几乎没有启动开销。
+
+配置文件即BacktestConfig.to_json的输出，可额外包含rules字段（{open_rule/close_rule/buy_rule/sell_rule: 表达式}）。
+
+命令行用法示例：
+    # 从缓存目录读取 sh.600000_d.parquet，使用内置规则组，结果写入 results/<配置名>/
+    python -m src.cli backtest configs/sh600000.json --cache-dir data/cache --rule-group 金叉死叉
+
+    # 批量执行多个配置，缓存缺失时从数据库加载并写回缓存，结果输出为JSON
+    python -m src.cli backtest configs/*.json --cache-dir data/cache --db --format json --output results
+
+    # 规则模板参数优化（网格搜索，4个进程），结果表写入CSV
+    python -m src.cli optimize --data sh600000.csv --symbol sh.600000 \\
+        --open-rule "RSI(close,{period}) < {low}" --close-rule "RSI(close,{period}) > {high}" \\
+        --grid period=5,9,14 --grid low=20,30 --grid high=70,80 --grid position.percent=0.1,0.2 \\
+        --workers 4 --output results.csv
+
+    # 把StockData迁移到紧凑表结构（完成后设置QSYS_STOCK_SCHEMA=compact切换）
+    python -m src.cli migrate-schema --frequency 5 --frequency d
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+RULE_KEYS = ('open_rule', 'close_rule', 'buy_rule', 'sell_rule')
+OPTIMIZE_METRICS = ('total_return', 'max_drawdown', 'sharpe', 'trade_count')  # 同optimizer.METRICS
+CACHE_SUFFIXES = ('.parquet', '.arrow', '.feather')
+CACHE_RANGE_KEY = b'qsys.date_range'  # 缓存文件元数据：数据库加载的日期区间（YYYYMMDD-YYYYMMDD）
+
+
+def cache_path(cache_dir: str, symbol: str, frequency: str) -> Optional[Path]:
+    """查找标的行情缓存文件（<标的>_<频率>.parquet/.arrow/.feather）
+    Returns:
+        存在的缓存文件路径，不存在时为None
+    """
+    for suffix in CACHE_SUFFIXES:
+        path = Path(cache_dir) / f"{symbol}_{frequency}{suffix}"
+        if path.exists():
+            return path
+    return None
+
+
+def cache_range(path: Path) -> Optional[Tuple[str, str]]:
+    """读取缓存文件记录的日期区间
+    Returns:
+        (开始日期, 结束日期)，格式YYYYMMDD；未记录区间的文件（手工放入的完整历史）为None
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.suffix == '.parquet':
+        metadata = pq.read_schema(path).metadata
+    else:
+        with pa.memory_map(str(path)) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata
+    value = (metadata or {}).get(CACHE_RANGE_KEY)
+    if value is None:
+        return None
+    start_date, end_date = value.decode().split('-')
+    return start_date, end_date
+
+
+def write_cache(data, path: Path, start_date: str, end_date: str):
+    """把数据库加载的行情写入Parquet缓存，并在文件元数据中记录加载的日期区间"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[CACHE_RANGE_KEY] = f"{start_date}-{end_date}".encode()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def load_config(path: str):
+    """读取配置文件
+    Returns:
+        (BacktestConfig, 配置文件中的规则表达式)
+    """
+    from src.core.strategy.backtesting import BacktestConfig
+
+    with open(path, encoding='utf-8') as f:
+        config_dict = json.load(f)
+    rules = config_dict.pop('rules', None) or {}
+    unknown = set(rules) - set(RULE_KEYS)
+    if unknown:
+        raise ValueError(f"未知的规则类型: {', '.join(sorted(unknown))}")
+    return BacktestConfig.from_dict(config_dict), rules
+
+
+def load_data(config, cache_dir: Optional[str], use_db: bool, verify: bool = False) -> Dict[str, Any]:
+    """加载配置中各标的的行情数据
+    缓存文件记录了日期区间（数据库加载时写入）且不覆盖回测区间时，视为缓存缺失。
+    Args:
+        config: 回测配置
+        cache_dir: 本地缓存目录
+        use_db: 缓存缺失时是否从数据库加载（加载后写回缓存目录）
+        verify: 从数据库加载时是否扫描行情表校验完整性并修复覆盖记录
+    Returns:
+        {标的: DataFrame}
+    Raises:
+        FileNotFoundError: 缓存缺失且未启用数据库
+        ValueError: 没有加载到数据
+    """
+    import pandas as pd
+    from src.core.strategy.optimizer import load_price_data, slice_dates
+    from src.support.log.logger import logger
+
+    start_date = pd.to_datetime(config.start_date).strftime('%Y%m%d')
+    end_date = pd.to_datetime(config.end_date).strftime('%Y%m%d')
+    frames = {}
+    missing = []
+    # 数据库加载区间：回测区间与缺失标的已缓存区间的并集，写回的缓存不会比原来覆盖得少
+    load_start, load_end = start_date, end_date
+    for symbol in config.get_symbols():
+        path = cache_path(cache_dir, symbol, config.frequency) if cache_dir else None
+        covered = cache_range(path) if path is not None else None
+        if path is not None and (covered is None or covered[0] <= start_date and end_date <= covered[1]):
+            frames[symbol] = slice_dates(load_price_data(str(path), symbol), start_date, end_date)
+            continue
+        if covered is not None:
+            logger.info(f"缓存 {path.name} 只覆盖 {covered[0]}-{covered[1]}，不包含回测区间 {start_date}-{end_date}")
+            load_start, load_end = min(load_start, covered[0]), max(load_end, covered[1])
+        missing.append(symbol)
+
+    if missing:
+        if not use_db:
+            raise FileNotFoundError(f"缓存目录中没有以下标的在回测区间内的行情数据: {', '.join(missing)}")
+        loaded = _load_from_database(missing, config, load_start, load_end, verify)
+        for symbol, data in loaded.items():
+            if cache_dir:
+                write_cache(data, Path(cache_dir) / f"{symbol}_{config.frequency}.parquet", load_start, load_end)
+            frames[symbol] = slice_dates(data, start_date, end_date)
+
+    empty = [symbol for symbol in config.get_symbols() if symbol not in frames or frames[symbol].empty]
+    if empty:
+        raise ValueError(f"以下标的在回测区间内没有行情数据: {', '.join(empty)}")
+    return {symbol: frames[symbol] for symbol in config.get_symbols()}
+
+
+def _load_from_database(symbols: List[str], config, start_date: str, end_date: str,
+                        verify: bool = False) -> Dict[str, Any]:
+    """从数据库批量加载[start_date, end_date]的行情（数据缺失时由DatabaseManager从数据源补齐）"""
+    import asyncio
+    import pandas as pd
+    from src.core.data.database import DatabaseManager
+
+    async def load():
+        db = DatabaseManager()
+        await db.initialize()
+        try:
+            return await db.load_multiple_stock_data(
+                symbols,
+                pd.to_datetime(start_date).date(),
+                pd.to_datetime(end_date).date(),
+                config.frequency,
+                verify=verify,
+            )
+        finally:
+            await db.pool.close()
+
+    return asyncio.run(load())
+
+
+def resolve_rules(file_rules: Dict[str, str], rule_group: Optional[str], overrides: Dict[str, str]) -> Dict[str, str]:
+    """合并规则表达式，优先级：命令行规则 > 配置文件rules字段 > 规则组
+    Raises:
+        ValueError: 规则组不存在或没有任何规则
+    """
+    rules = {}
+    if rule_group:
+        from src.core.strategy.rule_groups import DEFAULT_RULE_GROUPS
+        if rule_group not in DEFAULT_RULE_GROUPS:
+            raise ValueError(f"规则组不存在: {rule_group}（可选: {'/'.join(DEFAULT_RULE_GROUPS)}）")
+        rules.update(DEFAULT_RULE_GROUPS[rule_group])
+    rules.update(file_rules)
+    rules.update({key: value for key, value in overrides.items() if value})
+    rules = {key: rules[key] for key in RULE_KEYS if rules.get(key)}
+    if not rules:
+        raise ValueError("没有指定任何规则（配置文件rules字段、--rule-group或--open-rule等参数）")
+    return rules
+
+
+def _json_default(value: Any):
+    """json.dump无法直接序列化的值（numpy标量、时间戳等）"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def write_results(results: Dict[str, Any], output_dir: Path, fmt: str, extra: Dict[str, Any]):
+    """写出回测结果
+    Args:
+        results: run_rule_backtest的结果
+        output_dir: 输出目录
+        fmt: 表格格式（parquet/json）
+        extra: 写入summary.json的附加信息（配置、规则、耗时等）
+    """
+    import pandas as pd
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    individual = results.get('individual') or {}
+    summary = {
+        **extra,
+        'summary': results.get('summary'),
+        'individual': {symbol: result.get('summary') for symbol, result in individual.items()},
+        'errors': results.get('errors', []),
+        'perf': results.get('perf'),
+    }
+    with open(output_dir / 'summary.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=_json_default)
+
+    equity = results.get('combined_equity')
+    if equity is None:
+        equity = pd.DataFrame(results.get('equity_records') or [])
+    tables = {
+        'trades': pd.DataFrame(results.get('trades') or []),
+        'equity': equity,
+        'signals': results.get('signals'),
+    }
+    for name, table in tables.items():
+        if table is None or table.empty:
+            continue
+        if fmt == 'parquet':
+            table.to_parquet(output_dir / f"{name}.parquet", index=False)
+        else:
+            table.to_json(output_dir / f"{name}.json", orient='records', date_format='iso', force_ascii=False)
+
+
+def run_backtest_command(args) -> int:
+    """backtest子命令：依次执行各配置文件，单个配置失败不影响其他配置
+    Returns:
+        进程退出码（有配置失败时为1）
+    """
+    from src.support.log.logger import configure_logging, logger
+
+    configure_logging(args.log_level)
+    from src.core.strategy.backtesting import run_rule_backtest
+    from src.core.strategy.profiler import BacktestProfiler
+
+    overrides = {key: getattr(args, key) for key in RULE_KEYS}
+    failed = 0
+    for config_path in args.configs:
+        name = Path(config_path).stem
+        try:
+            config, file_rules = load_config(config_path)
+            rules = resolve_rules(file_rules, args.rule_group, overrides)
+            profiler = BacktestProfiler(config.profile_mode)
+
+            start = time.perf_counter()
+            frames = load_data(config, args.cache_dir, args.db, args.verify_db)
+            load_seconds = time.perf_counter() - start
+            profiler.add_stage('load_data', load_seconds)
+            data = frames if config.is_multi_symbol() else frames[config.target_symbol]
+
+            start = time.perf_counter()
+            results = run_rule_backtest(config, data, rules, profiler=profiler, strategy_name=name)
+            backtest_seconds = time.perf_counter() - start
+
+            write_results(results, Path(args.output) / name, args.format, {
+                'config': config.to_dict(),
+                'rules': rules,
+                'timings': {'load_data': load_seconds, 'backtest': backtest_seconds},
+            })
+        except Exception as e:
+            failed += 1
+            logger.error(f"回测失败: {config_path}, 错误: {str(e)}")
+            continue
+
+        total_return = (results.get('summary') or {}).get('total_return')
+        if total_return is None and results.get('combined_equity') is not None:
+            # 多标的组合结果没有summary，按组合净值计算
+            total_return = (results['combined_equity']['total_value'].iloc[-1] / config.initial_capital - 1) * 100
+        print(f"{name}: 收益率 {total_return if total_return is not None else float('nan'):.2f}%  "
+              f"交易 {len(results.get('trades') or [])}笔  "
+              f"加载 {load_seconds:.2f}s  回测 {backtest_seconds:.2f}s")
+    return 1 if failed else 0
+
+
+def parse_value(text: str) -> Any:
+    """命令行参数值：优先解析为整数，其次浮点数，否则保留字符串"""
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            continue
+    return text
+
+
+def parse_space(items: Optional[List[str]], ranged: bool) -> Dict[str, Any]:
+    """解析 name=v1,v2,... 或 name=low:high 形式的参数空间"""
+    space = {}
+    for item in items or []:
+        name, _, values = item.partition('=')
+        if not name or not values:
+            raise ValueError(f"参数格式应为 name=v1,v2 或 name=low:high: {item}")
+        if ranged and ':' in values:
+            low, high = values.split(':', 1)
+            space[name] = (parse_value(low), parse_value(high))
+        else:
+            space[name] = [parse_value(value) for value in values.split(',')]
+    return space
+
+
+def run_optimize_command(args) -> int:
+    """optimize子命令：按参数网格或随机采样批量回测规则模板，输出排序后的结果表
+    Returns:
+        进程退出码
+    """
+    from src.support.log.logger import configure_logging, logger
+
+    configure_logging(args.log_level)
+    import pandas as pd
+    from src.core.strategy.backtesting import BacktestConfig
+    from src.core.strategy import optimizer
+
+    grid = parse_space(args.grid, ranged=False)
+    sampled = parse_space(args.random, ranged=True)
+    points = optimizer.grid_points(grid) if grid else [{}]
+    if sampled:
+        points = [
+            {**point, **sample}
+            for point in points
+            for sample in optimizer.random_points(sampled, args.samples, args.seed)
+        ]
+
+    data = optimizer.slice_dates(optimizer.load_price_data(args.data, args.symbol), args.start, args.end)
+    if data.empty:
+        logger.error(f"回测区间内没有行情数据: {args.data}")
+        return 1
+    dates = pd.to_datetime(data['date'])
+    config = BacktestConfig(
+        start_date=dates.iloc[0].strftime('%Y%m%d'),
+        end_date=dates.iloc[-1].strftime('%Y%m%d'),
+        target_symbol=args.symbol,
+        frequency=args.frequency,
+        initial_capital=args.initial_capital,
+        commission_rate=args.commission_rate,
+    )
+    rules = {key: getattr(args, key) for key in RULE_KEYS}
+    table = optimizer.ParameterOptimizer(data, config, rules, workers=args.workers).run(
+        points, sort_by=args.sort_by, ascending=args.ascending
+    )
+
+    if args.output:
+        table.to_csv(args.output, index=False)
+    print(table.head(args.top).to_string(index=False))
+    return 0
+
+
+def run_migrate_command(args) -> int:
+    """migrate-schema子命令：把StockData迁移到紧凑表结构，并输出各频率的行数和表大小
+    Returns:
+        进程退出码
+    """
+    import asyncio
+    from src.support.log.logger import configure_logging
+    from src.core.data.database import DatabaseManager
+    from src.core.data.stock_schema import migrate_to_compact
+
+    configure_logging(args.log_level)
+
+    async def migrate():
+        db = DatabaseManager(stock_schema='legacy')
+        await db.initialize()
+        try:
+            async with db.pool.acquire() as conn:
+                return await migrate_to_compact(conn, args.frequency)
+        finally:
+            await db.pool.close()
+
+    report = asyncio.run(migrate())
+    for frequency, stats in report.items():
+        print(f"频率 {frequency}: {stats['rows']}行 {stats['partitions']}个分区  "
+              f"原表约 {stats['legacy_bytes'] / 2 ** 20:.1f}MB -> {stats['compact_bytes'] / 2 ** 20:.1f}MB")
+    if not report:
+        print("StockData中没有需要迁移的数据")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description="量化系统命令行工具")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    backtest = commands.add_parser('backtest', help="无界面执行规则策略回测")
+    backtest.add_argument('configs', nargs='+', help="回测配置JSON文件（可多个）")
+    backtest.add_argument('--cache-dir', help="本地行情缓存目录（<标的>_<频率>.parquet/.arrow/.feather）")
+    backtest.add_argument('--db', action='store_true', help="缓存缺失时从数据库加载，并写回缓存目录")
+    backtest.add_argument('--verify-db', action='store_true',
+                          help="从数据库加载时全量扫描行情表校验完整性（默认只查覆盖记录），并修复覆盖记录")
+    backtest.add_argument('--rule-group', help="使用内置规则组（如 金叉死叉）")
+    for key in RULE_KEYS:
+        backtest.add_argument(f"--{key.replace('_', '-')}", dest=key, default='', help=f"{key}表达式")
+    backtest.add_argument('--output', default='results', help="结果输出目录（每个配置一个子目录），默认results")
+    backtest.add_argument('--format', default='parquet', choices=('parquet', 'json'), help="交易/净值/信号表的格式")
+    backtest.add_argument('--log-level', default='WARNING', help="日志级别，默认WARNING")
+
+    optimize = commands.add_parser('optimize', help="规则策略参数优化（网格/随机搜索）")
+    optimize.add_argument('--data', required=True, help="行情数据文件（CSV/Parquet/Arrow）")
+    optimize.add_argument('--symbol', required=True, help="标的代码")
+    optimize.add_argument('--frequency', default='d', help="数据频率（d/w/m/y或分钟数），默认d")
+    optimize.add_argument('--start', help="回测开始日期YYYYMMDD，默认数据首日")
+    optimize.add_argument('--end', help="回测结束日期YYYYMMDD，默认数据末日")
+    optimize.add_argument('--initial-capital', type=float, default=1e6)
+    optimize.add_argument('--commission-rate', type=float, default=0.0005)
+    for key in RULE_KEYS:
+        optimize.add_argument(f"--{key.replace('_', '-')}", dest=key, default='', help=f"{key}模板")
+    optimize.add_argument('--grid', action='append', help="网格参数 name=v1,v2,...（可重复）")
+    optimize.add_argument('--random', action='append', help="随机参数 name=v1,v2,... 或 name=low:high（可重复）")
+    optimize.add_argument('--samples', type=int, default=100, help="随机搜索的采样个数")
+    optimize.add_argument('--seed', type=int, default=None)
+    optimize.add_argument('--workers', type=int, default=1)
+    optimize.add_argument('--sort-by', default='sharpe', choices=OPTIMIZE_METRICS)
+    optimize.add_argument('--ascending', action='store_true')
+    optimize.add_argument('--top', type=int, default=20, help="输出前N个结果")
+    optimize.add_argument('--output', help="结果表输出路径（CSV）")
+    optimize.add_argument('--log-level', default='WARNING', help="日志级别，默认WARNING")
+
+    migrate = commands.add_parser('migrate-schema', help="把StockData迁移到紧凑表结构（按频率分表、按时间分区）")
+    migrate.add_argument('--frequency', action='append',
+                         help="只迁移指定频率（可重复），默认迁移全部频率")
+    migrate.add_argument('--log-level', default='WARNING', help="日志级别，默认WARNING")
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate-schema':
+        return run_migrate_command(args)
+    if args.command == 'optimize':
+        if not args.grid and not args.random:
+            parser.error("需要至少一个--grid或--random参数")
+        return run_optimize_command(args)
+    if args.command == 'backtest':
+        if not args.cache_dir and not args.db:
+            parser.error("需要指定--cache-dir或--db")
+        return run_backtest_command(args)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -5,6 +5,7 @@ from .data_factory import DataFactory
 from typing import Optional
 from datetime import date, datetime, timedelta
 from src.core.data.database import DatabaseManager
+from src.core.data.trading_calendar import get_trading_calendar
 import os
 from datetime import datetime
 
@@ -46,6 +47,15 @@ class BaostockDataSource(DataSource):
             end_dt = end_date
 
         freq = frequency if frequency is not None else self.default_frequency
+
+        # 区间收缩到首尾交易日，不含交易日时无需登录查询
+        trading_days = get_trading_calendar().trading_days(start_dt, end_dt)
+        if not len(trading_days):
+            raise DataSourceError(
+                f"区间内没有交易日, symbol: {symbol}, start_date:{start_dt}, end_date:{end_dt}"
+            )
+        start_dt, end_dt = trading_days[0].item(), trading_days[-1].item()
+
         task_id = f"{symbol}_{freq}_load"
         progress_service.start_task(task_id, 1)
 
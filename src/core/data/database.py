@@ -1,17 +1,85 @@
 import asyncpg
+from itertools import repeat
 from typing import Optional, List, Dict
+import numpy as np
 import pandas as pd
-import chinese_calendar as calendar
 import streamlit as st
-from datetime import datetime, date,time
+from datetime import datetime, date, time, timedelta
 import asyncio
 import os
 from src.support.log.logger import logger
+from .trading_calendar import get_trading_calendar
+from .stock_schema import (STOCK_SCHEMA_ENV, STOCK_DATA_COLUMNS, STAGING_TABLE, CREATE_STAGING_SQL,
+                           ADJUSTFLAG_WIDTH, create_stock_schema)
 
 # 加载环境变量
 from dotenv import load_dotenv
 load_dotenv()
 
+COPY_CHUNK_SIZE = 100_000  # 行情每批写入的记录数
+
+# 交易日历表：seq为交易日序号，供缺失区间查询按 seq - 行号 分组（gaps-and-islands）
+_CREATE_CALENDAR_SQL = """
+    CREATE TABLE IF NOT EXISTS TradingCalendar (
+        date DATE PRIMARY KEY,
+        seq INTEGER NOT NULL UNIQUE
+    )
+"""
+
+# 数据覆盖范围：save_stock_data写入时维护，完整性检查只需查表做区间运算，无需扫描StockData
+# covered_ranges为已从数据源获取并保存过的日期区间（daterange为左闭右开）
+_CREATE_COVERAGE_SQL = """
+    CREATE TABLE IF NOT EXISTS DataCoverage (
+        code VARCHAR(20) NOT NULL,
+        frequency VARCHAR(10) NOT NULL,
+        covered_ranges DATERANGE[] NOT NULL DEFAULT '{}',
+        last_updated TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (code, frequency)
+    )
+"""
+_LOAD_COVERAGE_SQL = """
+    SELECT code, covered_ranges FROM DataCoverage
+    WHERE code = ANY($1::varchar[]) AND frequency = $2
+"""
+# 覆盖记录批量合并：先补齐缺少的行，再按代码顺序一次锁定全部行（避免并发写入互相死锁），
+# 最后把各标的合并后的闭区间（unnest展开为一行一个区间）聚合回DATERANGE[]一次更新
+_INSERT_COVERAGE_SQL = """
+    INSERT INTO DataCoverage (code, frequency)
+    SELECT unnest($1::varchar[]), $2
+    ON CONFLICT DO NOTHING
+"""
+_LOCK_COVERAGE_SQL = """
+    SELECT code, covered_ranges FROM DataCoverage
+    WHERE code = ANY($1::varchar[]) AND frequency = $2
+    ORDER BY code
+    FOR UPDATE
+"""
+_UPDATE_COVERAGE_SQL = """
+    UPDATE DataCoverage c
+    SET covered_ranges = m.ranges, last_updated = NOW()
+    FROM (
+        SELECT code, array_agg(daterange(range_start, range_end, '[]') ORDER BY range_start) AS ranges
+        FROM unnest($1::varchar[], $3::date[], $4::date[]) AS t(code, range_start, range_end)
+        GROUP BY code
+    ) m
+    WHERE c.code = m.code AND c.frequency = $2
+"""
+
+# 行情读取：COPY BINARY结果（列布局见stock_schema）直接按NumPy结构化数组解析
+_LOAD_STOCK_DATA_FIELDS = (
+    ('day', '>i4'), ('seconds', '>i4'),
+    ('open', '>f8'), ('high', '>f8'), ('low', '>f8'), ('close', '>f8'), ('volume', '>f8'), ('amount', '>f8'),
+    ('adjustflag', f'S{ADJUSTFLAG_WIDTH}'),
+)
+# COPY BINARY每行：int16字段数，每个字段int32长度+数据（大端）
+_COPY_ROW_DTYPE = np.dtype([('nfields', '>i2')] + [
+    item for name, fmt in _LOAD_STOCK_DATA_FIELDS for item in ((f'{name}_len', '>i4'), (name, fmt))
+])
+_COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+STOCK_DATA_FRAME_COLUMNS = ['date', 'time', 'code', 'open', 'high', 'low', 'close', 'volume', 'amount',
+                            'adjustflag', 'frequency', 'combined_time']
+
+
 @st.cache_resource(ttl=3600, show_spinner=False)
 def get_db_manager():
     """带缓存的数据库管理器工厂函数"""
@@ -21,13 +89,12 @@ def get_db_manager():
 
 class DatabaseManager:
     def __init__(self, host=None, port=None, dbname=None,
-                 user=None, password=None, admin_db=None):
+                 user=None, password=None, admin_db=None, stock_schema=None):
         self.connection = None
         # self._loop = asyncio.get_event_loop()  # 全局唯一事件循环
         import logging
         from src.support.log.logger import logger
         logger = logger
-        logger.setLevel(logging.DEBUG)
         self._instance_id = id(self)  # 添加实例ID用于调试
         self.connection_states = {}  # 连接状态跟踪 {conn_id: {status, last_change}}
         logger.debug(f"DatabaseManager initialized, instance_id: {self._instance_id}")  # 测试warning日志
@@ -72,6 +139,10 @@ class DatabaseManager:
         self.query_timeout = int(os.getenv('DB_QUERY_TIMEOUT', '60'))  # 查询超时时间（秒）
         self.active_connections = {}  # 目前活跃的连接
         self._conn_lock = asyncio.Lock()  
+        self._calendar_lock = asyncio.Lock()  # 交易日历表同步锁
+        self._calendar_synced = None  # 已同步到数据库的交易日历(行数, 首日, 末日)
+        # 行情表结构（legacy/compact），见stock_schema
+        self.stock_schema = create_stock_schema(stock_schema or os.getenv(STOCK_SCHEMA_ENV, 'legacy'))
         
 
     async def initialize(self):
@@ -99,7 +170,7 @@ class DatabaseManager:
                     "port": self.connection_config.get("port",'5432')
                 }
                 self.pool = await asyncpg.create_pool(
-                    loop=st.session_state._loop,
+                    loop=st.session_state.get('_loop'),  # 脱离Streamlit运行（命令行）时为None，使用当前事件循环
                     **valid_config,
                     min_size=3,
                     max_size=self.max_pool_size,
@@ -121,24 +192,20 @@ class DatabaseManager:
         # await self.del_stock_data("StockData")
 
         async with self.pool.acquire() as conn:
-            # 建表StockData
-            await conn.execute("""
-                CREATE TABLE IF NOT EXISTS StockData (
-                    id SERIAL PRIMARY KEY,
-                    code VARCHAR(20) NOT NULL,
-                    date DATE NOT NULL,
-                    time TIME NOT NULL,
-                    open NUMERIC NOT NULL,
-                    high NUMERIC NOT NULL,
-                    low NUMERIC NOT NULL,
-                    close NUMERIC NOT NULL,
-                    volume NUMERIC NOT NULL,
-                    amount NUMERIC,
-                    adjustflag VARCHAR(10),
-                    frequency VARCHAR(10) NOT NULL,
-                    UNIQUE (code, date, time, frequency)
-                );
-                """)
+            # 建表StockData（或紧凑结构的代码表，分区表在首次读写时按频率创建）
+            for statement in self.stock_schema.init_statements():
+                await conn.execute(statement)
+
+            # 建表TradingCalendar
+            await conn.execute(_CREATE_CALENDAR_SQL)
+
+            # 建表DataCoverage
+            await conn.execute(_CREATE_COVERAGE_SQL)
+            stale_coverage_sql = self.stock_schema.stale_coverage_sql()
+            if stale_coverage_sql:
+                removed = int((await conn.execute(stale_coverage_sql)).split()[-1])
+                if removed:
+                    logger.warning(f"已删除{removed}条不属于{self.stock_schema.name}表结构的覆盖记录（未迁移的频率）")
 
             # 建表StockInfo
             await conn.execute("""              
@@ -225,16 +292,45 @@ class DatabaseManager:
             logger.error(f"保存股票信息失败: {str(e)}")
             raise
 
-    async def check_data_completeness(self, symbol: str, start_date: date, end_date: date, frequency: str) -> list:
-        """异步检查数据完整性
+    async def _sync_trading_calendar(self, conn):
+        """把本地交易日历同步到TradingCalendar表（行数或首末日不一致时整表重写）"""
+        days = get_trading_calendar().days
+        expected = (len(days), days[0].item(), days[-1].item())
+        if self._calendar_synced == expected:
+            return
+        async with self._calendar_lock:
+            if self._calendar_synced == expected:
+                return
+            await conn.execute(_CREATE_CALENDAR_SQL)
+            row = await conn.fetchrow("SELECT COUNT(*) AS n, MIN(date) AS first, MAX(date) AS last FROM TradingCalendar")
+            if (row['n'], row['first'], row['last']) != expected:
+                async with conn.transaction():
+                    await conn.execute("TRUNCATE TradingCalendar")
+                    await conn.copy_records_to_table(
+                        'tradingcalendar',
+                        records=zip(days.tolist(), range(len(days))),
+                        columns=('date', 'seq'),
+                    )
+                logger.info(f"交易日历表已同步，共 {len(days)} 个交易日 ({expected[1]} ~ {expected[2]})")
+            self._calendar_synced = expected
+
+    async def check_data_completeness_batch(self, symbols: List[str], start_date: date, end_date: date,
+                                            frequency: str, verify: bool = False) -> Dict[str, list]:
+        """批量检查多个标的的数据完整性
+
+        默认只查DataCoverage表，按已覆盖区间计算缺失的交易日区间，不扫描StockData。
+        没有覆盖记录的标的（如覆盖表建立前保存的数据）以及verify=True时，用TradingCalendar表与StockData
+        做反连接，一次查询返回所有扫描标的的缺失区间，并把扫描到的已有数据区间补记到覆盖表。
+        跨越周末和节假日的连续缺失交易日合并为一个区间；当天不计入缺失。
         Args:
-            symbol: 股票代码
+            symbols: 股票代码列表
             start_date: 开始日期(date对象或字符串)
             end_date: 结束日期(date对象或字符串)
+            frequency: 数据频率
+            verify: 是否扫描StockData校验并修复覆盖记录
         Returns:
-            缺失日期区间列表[(start1,end1), (start2,end2)...]
+            {股票代码: 缺失日期区间列表[(start1,end1), (start2,end2)...]}
         """
-        # logger.debug("""异步检查数据完整性""")
         if not self.pool:
             await self._create_pool()
 
@@ -250,69 +346,110 @@ class DatabaseManager:
             else:
                 end_dt = end_date
 
-            logger.info(f"Checking data completeness for {symbol} from {start_dt} to {end_dt}")
-            
+            missing_ranges = {symbol: [] for symbol in symbols}
+            # 区间内没有交易日时无需查询（count同时保证本地日历覆盖该区间，再同步到数据库）
+            calendar = get_trading_calendar()
+            if not symbols or not calendar.count(start_dt, end_dt):
+                return missing_ranges
+
+            today = date.today()
             async with self.pool.acquire() as conn:
-                # 获取数据库中已有日期
-                query = """
-                    SELECT DISTINCT date 
-                    FROM StockData
-                    WHERE code = $1 AND frequency = $4 AND date BETWEEN $2 AND $3 
-                    ORDER BY date
-                """
-                rows = await conn.fetch(query, symbol, start_dt, end_dt, frequency)
-                logger.info(f"从数据库获取 {start_dt}-{end_dt} for {symbol}\n")
+                if verify:
+                    scan = list(missing_ranges)
+                else:
+                    rows = await conn.fetch(_LOAD_COVERAGE_SQL, list(missing_ranges), frequency)
+                    for row in rows:
+                        missing_ranges[row['code']] = calendar.uncovered_ranges(
+                            start_dt, end_dt, self._decode_coverage(row['covered_ranges']), exclude=[today]
+                        )
+                    covered = {row['code'] for row in rows}
+                    scan = [symbol for symbol in missing_ranges if symbol not in covered]
+
+                if scan:
+                    await self._sync_trading_calendar(conn)
+                    await self.stock_schema.prepare(conn, frequency)
+                    query, args = self.stock_schema.missing_ranges_query(scan, start_dt, end_dt, frequency, today)
+                    rows = await conn.fetch(query, *args)
+                    for row in rows:
+                        missing_ranges[row['code']].append((row['range_start'], row['range_end']))
+                    # 扫描区间内除缺失区间以外的交易日都有数据，补记为已覆盖
+                    await self._record_coverage(conn, frequency, {
+                        symbol: calendar.uncovered_ranges(start_dt, end_dt, missing_ranges[symbol], exclude=[today])
+                        for symbol in scan
+                    })
+
+            logger.info(
+                f"Checked data completeness for {len(symbols)} symbols from {start_dt} to {end_dt}: "
+                f"{len(scan)} scanned, {sum(map(bool, missing_ranges.values()))} incomplete"
+            )
+            return missing_ranges
 
-                existing_dates = {pd.to_datetime(row["date"]).date() for row in rows}
-                # logger.info(f"Existing_dates {existing_dates} for {symbol}\n")
-                
-                # 生成理论交易日集合（排除节假日）
-                all_dates = pd.date_range(start_dt, end_dt, freq='B')  # 工作日
-                trading_dates = set(
-                    date.date() for date in all_dates 
-                    if not calendar.is_holiday(date.date())
-                )
-                today = date.today()
-                trading_dates = {d for d in trading_dates if d != today}  # 若今日查询，则排除今日
-                # logger.info(f"trading_dates {trading_dates} for {symbol}")
-                
-                # 计算缺失日期
-                missing_dates = trading_dates - existing_dates
-                # logger.info(f"Missing_dates {missing_dates} for {symbol}")
-                
-                # 将连续缺失日期合并为区间
-                missing_ranges = []
-                if missing_dates:
-                    sorted_dates = sorted(missing_dates)
-                    range_start = sorted_dates[0]
-                    prev_date = range_start
-                    
-                    for current_date in sorted_dates[1:]:
-                        if (current_date - prev_date).days > 1:  # 出现断点
-                            missing_ranges.append((range_start,
-                                                 prev_date))
-                            range_start = current_date
-                        prev_date = current_date
-                    
-                    # 添加最后一个区间
-                    missing_ranges.append((range_start,
-                                         prev_date))
-                
-                logger.info(f"Found {len(missing_ranges)} missing data ranges for {symbol}")
-                return missing_ranges
-                
         except Exception as e:
             logger.error(f"检查数据完整性失败: {str(e)}")
             raise
 
+    @staticmethod
+    def _decode_coverage(covered_ranges) -> list:
+        """DATERANGE[]转换为日期闭区间列表"""
+        return [(r.lower, r.upper - timedelta(days=1)) for r in covered_ranges if not r.isempty]
+
+    async def _record_coverage(self, conn, frequency: str, coverage: Dict[str, list]):
+        """把日期闭区间并入各标的的覆盖记录（当天及以后的数据可能不完整，不记为已覆盖）
+
+        无论标的数量多少，一个事务内只执行插入、锁定、更新三条语句；
+        与已有记录的合并按交易日历在内存中完成（只隔着非交易日的区间合并为一个）。
+        Args:
+            conn: 数据库连接
+            frequency: 数据频率
+            coverage: {股票代码: 日期闭区间列表}
+        """
+        yesterday = date.today() - timedelta(days=1)
+        coverage = {
+            symbol: [(start, min(end, yesterday)) for start, end in ranges if start <= yesterday]
+            for symbol, ranges in coverage.items()
+        }
+        symbols = sorted(symbol for symbol, ranges in coverage.items() if ranges)
+        if not symbols:
+            return
+        calendar = get_trading_calendar()
+        async with conn.transaction():
+            await conn.execute(_INSERT_COVERAGE_SQL, symbols, frequency)
+            current = {row['code']: row['covered_ranges']
+                       for row in await conn.fetch(_LOCK_COVERAGE_SQL, symbols, frequency)}
+            codes, starts, ends = [], [], []
+            for symbol in symbols:
+                merged = calendar.merge_ranges(self._decode_coverage(current.get(symbol) or []) + coverage[symbol])
+                codes.extend(repeat(symbol, len(merged)))
+                starts.extend(start for start, _ in merged)
+                ends.extend(end for _, end in merged)
+            await conn.execute(_UPDATE_COVERAGE_SQL, codes, frequency, starts, ends)
+
+    async def check_data_completeness(self, symbol: str, start_date: date, end_date: date, frequency: str,
+                                      verify: bool = False) -> list:
+        """异步检查数据完整性
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期(date对象或字符串)
+            end_date: 结束日期(date对象或字符串)
+            verify: 是否扫描StockData校验并修复覆盖记录
+        Returns:
+            缺失日期区间列表[(start1,end1), (start2,end2)...]
+        """
+        missing_ranges = await self.check_data_completeness_batch([symbol], start_date, end_date, frequency,
+                                                                  verify=verify)
+        return missing_ranges[symbol]
+
 # 加载数据
-    async def load_stock_data(self, symbol: str, start_date: date, end_date: date, frequency: str) -> pd.DataFrame:
+    async def load_stock_data(self, symbol: str, start_date: date, end_date: date, frequency: str,
+                              missing_ranges: Optional[list] = None, verify: bool = False) -> pd.DataFrame:
         """从数据库加载股票数据，如有缺失则从数据源获取并保存
         Args:
             symbol: 股票代码
             start_date: 开始日期(date对象或字符串)
             end_date: 结束日期(date对象或字符串)
             frequency: 数据频率(如'd'表示日线)
+            missing_ranges: 已检查出的缺失区间（批量检查时传入），为None时在此检查
+            verify: 是否扫描StockData校验完整性（而不是只查覆盖记录）
         Returns:
             包含股票数据的DataFrame
         """
@@ -330,8 +467,9 @@ class DatabaseManager:
 
             logger.info(f"Loading stock data for {symbol} from {start_dt} to {end_dt}")
             # the date that data lack of  #
-            logger.info(f"开始检查 {symbol} 的数据完整性...")
-            missing_ranges = await self.check_data_completeness(symbol, start_dt, end_dt,frequency)
+            if missing_ranges is None:
+                logger.info(f"开始检查 {symbol} 的数据完整性...")
+                missing_ranges = await self.check_data_completeness(symbol, start_dt, end_dt,frequency, verify=verify)
             logger.info(f"数据完整性检查完成，发现 {len(missing_ranges)} 个缺失区间")
 
             # Fetch missing data ranges from Baostock
@@ -347,7 +485,8 @@ class DatabaseManager:
                     
                     new_data = await data_source.load_data(symbol, range_start, range_end, frequency)
                     
-                    await self.save_stock_data(symbol, new_data, frequency)  # save stock data into table Stockdata
+                    await self.save_stock_data(symbol, new_data, frequency,
+                                               covered=(range_start, range_end))  # save stock data into table Stockdata
                     data = pd.concat([data, new_data])
 
             else:
@@ -355,130 +494,114 @@ class DatabaseManager:
 
             # Load complete data from database
             logger.info(f"开始从数据库加载 {symbol} 的完整数据...")
-            query = """
-                SELECT date, time, code, open, high, low, close, volume, amount, adjustflag, frequency
-                FROM StockData
-                WHERE code = $1
-                AND date BETWEEN $2 AND $3
-                AND frequency = $4
-                ORDER BY date
-            """
-            
-            
             logger.info(f"执行数据库查询，参数: symbol={symbol}, start={start_dt}, end={end_dt}, frequency={frequency}")
             async with self.pool.acquire() as conn:
-                rows = await conn.fetch(query, symbol, start_dt, end_dt, frequency)
-                logger.info(f"数据库查询完成，返回 {len(rows) if rows else 0} 行数据")
+                columns = await self._fetch_stock_data_columns(conn, symbol, start_dt, end_dt, frequency)
+            rows = len(columns['day'])
+            logger.info(f"数据库查询完成，返回 {rows} 行数据")
 
-                if not rows:
-                    logger.warning(
-                        f"[{symbol}] 未找到股票数据 date_range=[{start_date}~{end_date}] "
-                        f"frequency={frequency} pool_status={self.get_pool_status()}",
-                        extra={'connection_id': f'QUERY-{symbol}'}
-                    )
-                    logger.debug(
-                        f"详细查询参数: symbol={symbol} "
-                        f"start_date={start_dt} end_date={end_dt} "
-                        f"frequency={frequency}"
-                    )
-                    return pd.DataFrame()
-                data = [dict(row) for row in rows]
-                df = pd.DataFrame(data, columns=['date', 'time', 'code', 'open', 'high', 'low', 'close', 'volume', 'amount', 'adjustflag', 'frequency'])
-                df = self._transform_data(df)
-                
-                
-                logger.info(f"Successfully loaded {len(df)} rows for {symbol}")
-                return df
+            if not rows:
+                logger.warning(
+                    f"[{symbol}] 未找到股票数据 date_range=[{start_date}~{end_date}] "
+                    f"frequency={frequency} pool_status={self.get_pool_status()}",
+                    extra={'connection_id': f'QUERY-{symbol}'}
+                )
+                logger.debug(
+                    f"详细查询参数: symbol={symbol} "
+                    f"start_date={start_dt} end_date={end_dt} "
+                    f"frequency={frequency}"
+                )
+                return pd.DataFrame()
+            df = self._stock_data_frame(columns, symbol, frequency)
+
+            logger.info(f"Successfully loaded {len(df)} rows for {symbol}")
+            return df
                 
         except Exception as e:
             logger.error(f"Failed to load stock data: {str(e)}")
             raise
 
-    def _transform_data(self, data: pd.DataFrame) -> pd.DataFrame:
-        """标准化数据格式"""
-        
-        if 'date' in data.columns:
-            data['date'] = pd.to_datetime(data['date'])
-            data['date'] = data['date'].dt.strftime('%Y-%m-%d')
-        
-        # 处理time列，确保格式正确
-        if 'time' in data.columns:
-            # 检查time列是否包含NaT值
-            if data['time'].isna().any():
-                logger.warning(f"发现 {data['time'].isna().sum()} 个NaT值在time列")
-                # 对于NaT值，使用默认时间
-                data.loc[data['time'].isna(), 'time'] = '00:00:00'
-            
-            # 确保time列是字符串格式
-            data['time'] = data['time'].astype(str)
-            
-            # 处理可能的异常格式
-            data['time'] = data['time'].apply(lambda x: x if len(x) >= 8 else '00:00:00')
-
-        # 处理frequency列，确保格式正确
-        if 'frequency' in data.columns:
-            # 检查frequency列是否包含NaN值
-            if data['frequency'].isna().any():
-                logger.warning(f"发现 {data['frequency'].isna().sum()} 个NaN值在frequency列")
-                # 对于NaN值，使用默认频率
-                data.loc[data['frequency'].isna(), 'frequency'] = 'd'
-
-        # 创建combined_time列用于回测
-        if 'date' in data.columns and 'time' in data.columns:
-            try:
-                # 确保date和time列都是字符串格式
-                data['date'] = data['date'].astype(str)
-                data['time'] = data['time'].astype(str)
-                
-                # 创建combined_time列
-                data['combined_time'] = data['date'] + ' ' + data['time']
-                
-                # 转换为datetime格式，处理可能的格式错误
-                data['combined_time'] = pd.to_datetime(
-                    data['combined_time'], 
-                    format='%Y-%m-%d %H:%M:%S', 
-                    errors='coerce'
-                )
-                
-                # 检查是否有转换失败的记录
-                if data['combined_time'].isna().any():
-                    failed_count = data['combined_time'].isna().sum()
-                    logger.warning(f"发现 {failed_count} 个combined_time转换失败")
-                    
-                    # 对于转换失败的记录，使用date + 默认时间
-                    mask = data['combined_time'].isna()
-                    data.loc[mask, 'combined_time'] = pd.to_datetime(
-                        data.loc[mask, 'date'] + ' 00:00:00', 
-                        format='%Y-%m-%d %H:%M:%S'
-                    )
-                    
-            except Exception as e:
-                logger.error(f"创建combined_time列失败: {str(e)}")
-                # 回退方案：只使用date列
-                data['combined_time'] = pd.to_datetime(data['date'])
+    async def _fetch_stock_data_columns(self, conn, symbol: str, start_dt: date, end_dt: date,
+                                        frequency: str) -> Dict[str, np.ndarray]:
+        """读取StockData为列数组（优先COPY BINARY，变长数据无法按定长解析时逐行读取）"""
+        chunks = []
 
-        # 调试信息：检查time和frequency列是否有空值
-        time_nulls = 0
-        freq_nulls = 0
-        
-        if 'time' in data.columns:
-            time_nulls = data['time'].isna().sum()
-            if time_nulls > 0:
-                logger.warning(f"time列包含 {time_nulls} 个空值")
-                
-        if 'frequency' in data.columns:
-            freq_nulls = data['frequency'].isna().sum()
-            if freq_nulls > 0:
-                logger.warning(f"frequency列包含 {freq_nulls} 个空值")
-                
-        # 确保数据按combined_time排序（修复回测和图表显示问题）
-        if 'combined_time' in data.columns:
-            data = data.sort_values(by='combined_time').reset_index(drop=True)
-        
-        # 记录数据转换后的状态
-        logger.debug(f"数据转换完成 - 行数: {len(data)}, time列空值: {time_nulls}, frequency列空值: {freq_nulls}")
+        async def collect(chunk):
+            chunks.append(chunk)
+
+        await self.stock_schema.prepare(conn, frequency)
+        query, args = self.stock_schema.load_query(symbol, start_dt, end_dt, frequency)
+        await conn.copy_from_query(query, *args, output=collect, format='binary')
+        columns = self._decode_stock_data_copy(b''.join(chunks))
+        if columns is None:
+            logger.debug(f"[{symbol}] COPY结果不是定长格式，改为逐行读取")
+            rows = await conn.fetch(query, *args)
+            values = list(zip(*rows)) or [()] * len(_LOAD_STOCK_DATA_FIELDS)
+            columns = {
+                name: np.array(column, dtype=object if name == 'adjustflag' else fmt[1:])
+                for (name, fmt), column in zip(_LOAD_STOCK_DATA_FIELDS, values)
+            }
+        return columns
+
+    @staticmethod
+    def _decode_stock_data_copy(buffer: bytes) -> Optional[Dict[str, np.ndarray]]:
+        """把COPY BINARY结果解析为列数组，不是预期的定长格式时返回None"""
+        if not buffer.startswith(_COPY_SIGNATURE) or buffer[-2:] != b'\xff\xff':
+            return None
+        header = len(_COPY_SIGNATURE) + 8 + int.from_bytes(buffer[15:19], 'big')  # 签名、标志位、扩展区
+        body = memoryview(buffer)[header:-2]
+        if len(body) % _COPY_ROW_DTYPE.itemsize:
+            return None
+        rows = np.frombuffer(body, dtype=_COPY_ROW_DTYPE)
+        if not (rows['nfields'] == len(_LOAD_STOCK_DATA_FIELDS)).all():
+            return None
+        for name, _ in _LOAD_STOCK_DATA_FIELDS:
+            if not (rows[f'{name}_len'] == _COPY_ROW_DTYPE[name].itemsize).all():
+                return None
+        return {
+            name: rows[name] if name == 'adjustflag' else rows[name].astype(fmt[1:])
+            for name, fmt in _LOAD_STOCK_DATA_FIELDS
+        }
+
+    @staticmethod
+    def _stock_data_frame(columns: Dict[str, np.ndarray], symbol: str, frequency: str) -> pd.DataFrame:
+        """由列数组构建行情DataFrame
+
+        date/time为字符串（YYYY-MM-DD / HH:MM:SS），combined_time由天数和秒数直接计算；
+        日期、时间和adjustflag只对去重后的值做格式化。
+        """
+        days = columns['day'].astype('datetime64[D]')
+        seconds = columns['seconds'].astype(np.int64)
+
+        day_index, unique_days = pd.factorize(columns['day'])
+        second_index, unique_seconds = pd.factorize(seconds)
+        day_strings = np.datetime_as_string(unique_days.astype('datetime64[D]'), unit='D').astype(object)
+        time_strings = np.array([f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}"
+                                 for s in unique_seconds.tolist()], dtype=object)
+        flags = columns['adjustflag']
+        if len(flags) and (flags == flags[0]).all():
+            # 同一标的的复权标志通常相同，跳过去重
+            unique_flags, flag_index = flags[:1], np.zeros(len(flags), dtype=np.intp)
+        else:
+            unique_flags, flag_index = np.unique(flags, return_inverse=True)
+        unique_flags = np.array([(flag.decode() if isinstance(flag, bytes) else flag).strip() or None
+                                 for flag in unique_flags.tolist()], dtype=object)
 
-        return data
+        n = len(days)
+        return pd.DataFrame({
+            'date': day_strings[day_index],
+            'time': time_strings[second_index],
+            'code': np.full(n, symbol, dtype=object),
+            'open': columns['open'],
+            'high': columns['high'],
+            'low': columns['low'],
+            'close': columns['close'],
+            'volume': columns['volume'],
+            'amount': columns['amount'],
+            'adjustflag': unique_flags[flag_index],
+            'frequency': np.full(n, frequency, dtype=object),
+            'combined_time': days.astype('datetime64[ns]') + seconds.astype('timedelta64[s]'),
+        }, columns=STOCK_DATA_FRAME_COLUMNS)
 
     def get_technical_indicators(self):
         pass
@@ -681,86 +804,111 @@ class DatabaseManager:
             logger.error(f"获取股票名称失败: {str(e)}")
             raise
 
-    async def save_stock_data(self, symbol: str, data: pd.DataFrame, frequency: str) -> bool:
+    async def save_stock_data(self, symbol: str, data: pd.DataFrame, frequency: str,
+                              chunk_size: int = COPY_CHUNK_SIZE,
+                              covered: Optional[tuple] = None) -> bool:
         """异步保存股票数据到StockData表
-        
+
+        按批用COPY写入会话临时表（不写WAL），再用一条INSERT ... ON CONFLICT合并到StockData，
+        每批一个事务，内存占用按chunk_size限制。同一时间点的重复记录保留最后一条。
+        写入后把covered区间并入DataCoverage表的覆盖记录。
+
         Args:
             symbol: 股票代码
-            data: 包含股票数据的DataFrame
+            data: 包含股票数据的DataFrame（列可以是NumPy或Arrow类型）
             frequency: 数据频率 (如 '5' 表示5分钟线，'d' 表示日线)
-            
+            chunk_size: 每批写入的记录数
+            covered: 本次从数据源获取的日期区间(start, end)，其中没有数据的交易日（如停牌）也记为已覆盖；
+                默认为数据的首末日期
+
         Returns:
             bool: 是否成功保存
         """
-        data_tmp = data.copy()
-        data_tmp['date'] = pd.to_datetime(data_tmp['date'], format="%Y-%m-%d").dt.date
         try:
-            # 将DataFrame转换为适合插入的格式
-            records = data_tmp.to_dict('records')
-            
-            # 处理不同频率的数据
-            if frequency in ["1", "5", "15", "30", "60"]:
-                # 分钟级数据有time字段
-                insert_data = [
-                    (
-                        symbol,
-                        record['date'],
-                        record.get('time', "00:00:00"),  # 安全获取时间字段
-                        record['open'],
-                        record['high'],
-                        record['low'],
-                        record['close'],
-                        record['volume'],
-                        record.get('amount'),
-                        record.get('adjustflag'),
-                        frequency
-                    )
-                    for record in records
-                ]
-            else:
-                # 日线及以上频率数据，设置默认时间
-                insert_data = [
-                    (
-                        symbol,
-                        record['date'],
-                        time.min,  # 使用time.min表示00:00:00
-                        record['open'],
-                        record['high'],
-                        record['low'],
-                        record['close'],
-                        record['volume'],
-                        record.get('amount'),
-                        record.get('adjustflag'),
-                        frequency
-                    )
-                    for record in records
-                ]
+            columns = self._stock_data_columns(data, frequency)
+            total = len(columns['date'])
+            if total == 0 and covered is None:
+                return True
+            if covered is None:
+                covered = (columns['date'].min().item(), columns['date'].max().item())
 
-            
             async with self.pool.acquire() as conn:
-                await conn.executemany("""
-                    INSERT INTO StockData (
-                        code, date, time, open, high, low, close, 
-                        volume, amount, adjustflag, frequency
-                    )
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-                    ON CONFLICT (code, date, time, frequency) DO UPDATE SET
-                        open = EXCLUDED.open,
-                        high = EXCLUDED.high,
-                        low = EXCLUDED.low,
-                        close = EXCLUDED.close,
-                        volume = EXCLUDED.volume,
-                        amount = EXCLUDED.amount,
-                        adjustflag = EXCLUDED.adjustflag
-                """, insert_data)
-                
-            # logger.info(f"成功保存{symbol}的{frequency}频率数据，共{len(insert_data)}条记录")
+                if total:
+                    await self.stock_schema.prepare(conn, frequency, symbol,
+                                                    columns['date'].min().item(), columns['date'].max().item())
+                merge_sql = self.stock_schema.merge_sql(frequency)
+                for start in range(0, total, chunk_size):
+                    stop = min(start + chunk_size, total)
+                    async with conn.transaction():
+                        await conn.execute(CREATE_STAGING_SQL)
+                        await conn.copy_records_to_table(
+                            STAGING_TABLE,
+                            records=self._stock_data_records(symbol, frequency, columns, start, stop),
+                            columns=STOCK_DATA_COLUMNS,
+                        )
+                        await conn.execute(merge_sql)
+                await self._record_coverage(conn, frequency, {symbol: [covered]})
+
+            logger.debug("成功保存%s的%s频率数据，共%d条记录", symbol, frequency, total)
             return True
-            
+
         except Exception as e:
             logger.error(f"保存股票数据失败: {str(e)}")
             raise
 
+    @staticmethod
+    def _stock_data_columns(data: pd.DataFrame, frequency: str) -> Dict[str, np.ndarray]:
+        """把行情DataFrame转换为写入StockData的列数组（按时间去重，保留最后一条）"""
+        minute = frequency in ["1", "5", "15", "30", "60"]
+        if minute and 'time' in data.columns:
+            data = data.drop_duplicates(subset=['date', 'time'], keep='last')
+        else:
+            data = data.drop_duplicates(subset=['date'], keep='last')
+        n = len(data)
+
+        columns = {
+            'date': pd.to_datetime(data['date'], format="%Y-%m-%d").to_numpy(dtype='datetime64[D]'),
+        }
+        if minute and 'time' in data.columns:
+            times = data['time']
+            if n and not isinstance(times.iloc[0], time):
+                # 字符串格式(HH:MM:SS)的时间转换为datetime.time
+                times = pd.to_datetime(times.astype(str), format="%H:%M:%S").dt.time
+            columns['time'] = times.to_numpy(dtype=object)
+        else:
+            # 日线及以上频率数据，时间固定为00:00:00（分钟线缺少time列时同样处理）
+            columns['time'] = np.full(n, time.min, dtype=object)
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            columns[name] = pd.to_numeric(data[name]).to_numpy(dtype=float)
+        if 'amount' in data.columns:
+            amount = pd.to_numeric(data['amount']).to_numpy(dtype=float)
+            columns['amount'] = np.where(np.isnan(amount), None, amount.astype(object))
+        else:
+            columns['amount'] = np.full(n, None, dtype=object)
+        if 'adjustflag' in data.columns:
+            adjustflag = data['adjustflag']
+            columns['adjustflag'] = adjustflag.astype(str).where(adjustflag.notna(), None).to_numpy(dtype=object)
+        else:
+            columns['adjustflag'] = np.full(n, None, dtype=object)
+        return columns
+
+    @staticmethod
+    def _stock_data_records(symbol: str, frequency: str, columns: Dict[str, np.ndarray], start: int, stop: int):
+        """生成[start, stop)区间的COPY记录（按列切片后批量转换为Python对象）"""
+        return zip(
+            repeat(symbol, stop - start),
+            columns['date'][start:stop].tolist(),
+            columns['time'][start:stop].tolist(),
+            columns['open'][start:stop].tolist(),
+            columns['high'][start:stop].tolist(),
+            columns['low'][start:stop].tolist(),
+            columns['close'][start:stop].tolist(),
+            columns['volume'][start:stop].tolist(),
+            columns['amount'][start:stop].tolist(),
+            columns['adjustflag'][start:stop].tolist(),
+            repeat(frequency, stop - start),
+        )
+
     async def save_money_supply_data(self, data: pd.DataFrame) -> bool:
         """保存货币供应量数据"""
         try:
@@ -865,6 +1013,9 @@ class DatabaseManager:
                 DROP TABLE {name};
                 """
             )
+            if name.lower() == 'stockdata':
+                # 覆盖记录随行情数据一起失效
+                await conn.execute("DROP TABLE IF EXISTS DataCoverage;")
 
             # 检查表是否存在
             exists = await conn.fetchval(
@@ -1141,21 +1292,28 @@ class DatabaseManager:
             logger.error(f"批量更新订单状态失败: {str(e)}")
             raise
 
-    async def load_multiple_stock_data(self, symbols: List[str], start_date: date, end_date: date, frequency: str) -> Dict[str, pd.DataFrame]:
+    async def load_multiple_stock_data(self, symbols: List[str], start_date: date, end_date: date, frequency: str,
+                                       verify: bool = False) -> Dict[str, pd.DataFrame]:
         """批量加载多个股票的数据
         Args:
             symbols: 股票代码列表
             start_date: 开始日期(date对象)
             end_date: 结束日期(date对象)
             frequency: 数据频率
+            verify: 是否扫描StockData校验完整性（而不是只查覆盖记录）
         Returns:
             字典，键为股票代码，值为对应的DataFrame
         """
         import asyncio
-        
+
+        # 一次查询检查所有标的的完整性
+        missing_ranges = await self.check_data_completeness_batch(symbols, start_date, end_date, frequency,
+                                                                  verify=verify)
+
         async def load_single(symbol):
             try:
-                data = await self.load_stock_data(symbol, start_date, end_date, frequency)
+                data = await self.load_stock_data(symbol, start_date, end_date, frequency,
+                                                  missing_ranges=missing_ranges[symbol])
                 return symbol, data
             except Exception as e:
                 logger.error(f"Failed to load data for {symbol}: {e}")
@@ -0,0 +1,382 @@
+"""行情数据表结构
+
+legacy: 原StockData表（NUMERIC价格、VARCHAR代码/频率、date与time分列、SERIAL主键+四列唯一键）。
+compact: 每个频率一张按时间范围分区的表（分钟线按月、日/周/月线按年分区），
+    价格float8、成交量int8、单一timestamp列，代码映射为stock_symbols中的int4编号，主键(symbol_id, ts)。
+
+两种结构共用写入时的COPY临时表和读取时的COPY BINARY列布局，DatabaseManager只通过StockDataSchema访问行情表。
+通过QSYS_STOCK_SCHEMA环境变量选择（默认legacy），已有数据用migrate_to_compact迁移，
+以compact初始化时删除未迁移频率的覆盖记录。
+"""
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+STOCK_SCHEMA_ENV = 'QSYS_STOCK_SCHEMA'  # 行情表结构环境变量（legacy/compact）
+MINUTE_FREQUENCIES = ('1', '5', '15', '30', '60')
+FREQUENCIES = MINUTE_FREQUENCIES + ('d', 'w', 'm')
+
+# 写入：COPY到会话临时表后合并（临时表不写WAL，各连接互不可见，可并发写入不同标的）
+STOCK_DATA_COLUMNS = ('code', 'date', 'time', 'open', 'high', 'low', 'close',
+                      'volume', 'amount', 'adjustflag', 'frequency')
+STAGING_TABLE = 'stockdata_staging'
+CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        code VARCHAR(20),
+        date DATE,
+        time TIME,
+        open NUMERIC,
+        high NUMERIC,
+        low NUMERIC,
+        close NUMERIC,
+        volume NUMERIC,
+        amount NUMERIC,
+        adjustflag VARCHAR(10),
+        frequency VARCHAR(10)
+    ) ON COMMIT DELETE ROWS
+"""
+
+# 读取：结果列为(day, seconds, open, high, low, close, volume, amount, adjustflag)，均为定长二进制类型
+# day为1970-01-01起的天数，seconds为当天秒数，adjustflag右补空格到定长
+ADJUSTFLAG_WIDTH = 10
+
+# 缺失区间查询：seq为交易日序号，缺失交易日按 seq - 行号 分组即得连续区间（gaps-and-islands）
+_MISSING_RANGES_SQL = """
+    WITH expected AS (
+        SELECT s.code, {symbol_column} c.date, c.seq
+        FROM unnest($1::varchar[]) AS s(code)
+        {symbol_join}
+        CROSS JOIN TradingCalendar c
+        WHERE c.date BETWEEN $2 AND $3 AND c.date <> {today}
+    ), missing AS (
+        SELECT e.code, e.date,
+               e.seq - ROW_NUMBER() OVER (PARTITION BY e.code ORDER BY e.seq) AS grp
+        FROM expected e
+        WHERE NOT EXISTS ({exists})
+    )
+    SELECT code, MIN(date) AS range_start, MAX(date) AS range_end
+    FROM missing
+    GROUP BY code, grp
+    ORDER BY code, range_start
+"""
+
+
+class StockDataSchema:
+    """行情表结构：建表语句、合并临时表的SQL和读取/完整性查询"""
+
+    name = ''
+
+    def init_statements(self) -> List[str]:
+        """初始化数据库时执行的建表语句"""
+        raise NotImplementedError
+
+    async def prepare(self, conn, frequency: str, symbol: Optional[str] = None,
+                      first_day: Optional[date] = None, last_day: Optional[date] = None):
+        """读写某频率数据前的准备（建表、建分区、登记代码）"""
+
+    def merge_sql(self, frequency: str) -> str:
+        """把临时表合并到行情表的SQL"""
+        raise NotImplementedError
+
+    def missing_ranges_query(self, symbols: List[str], start_date: date, end_date: date,
+                             frequency: str, today: date) -> Tuple[str, tuple]:
+        """批量缺失区间查询，返回(SQL, 参数)"""
+        raise NotImplementedError
+
+    def load_query(self, symbol: str, start_date: date, end_date: date, frequency: str) -> Tuple[str, tuple]:
+        """读取行情的查询，返回(SQL, 参数)"""
+        raise NotImplementedError
+
+    def stale_coverage_sql(self) -> Optional[str]:
+        """初始化时删除失效覆盖记录的SQL（None表示无需清理）"""
+        return None
+
+
+class LegacyStockSchema(StockDataSchema):
+    """原StockData表结构"""
+
+    name = 'legacy'
+
+    def init_statements(self) -> List[str]:
+        return ["""
+            CREATE TABLE IF NOT EXISTS StockData (
+                id SERIAL PRIMARY KEY,
+                code VARCHAR(20) NOT NULL,
+                date DATE NOT NULL,
+                time TIME NOT NULL,
+                open NUMERIC NOT NULL,
+                high NUMERIC NOT NULL,
+                low NUMERIC NOT NULL,
+                close NUMERIC NOT NULL,
+                volume NUMERIC NOT NULL,
+                amount NUMERIC,
+                adjustflag VARCHAR(10),
+                frequency VARCHAR(10) NOT NULL,
+                UNIQUE (code, date, time, frequency)
+            );
+        """]
+
+    def merge_sql(self, frequency: str) -> str:
+        return f"""
+            INSERT INTO StockData ({', '.join(STOCK_DATA_COLUMNS)})
+            SELECT {', '.join(STOCK_DATA_COLUMNS)} FROM {STAGING_TABLE}
+            ON CONFLICT (code, date, time, frequency) DO UPDATE SET
+                open = EXCLUDED.open,
+                high = EXCLUDED.high,
+                low = EXCLUDED.low,
+                close = EXCLUDED.close,
+                volume = EXCLUDED.volume,
+                amount = EXCLUDED.amount,
+                adjustflag = EXCLUDED.adjustflag
+        """
+
+    def missing_ranges_query(self, symbols, start_date, end_date, frequency, today):
+        sql = _MISSING_RANGES_SQL.format(symbol_column='', symbol_join='', today='$5', exists="""
+            SELECT 1 FROM StockData d
+            WHERE d.code = e.code AND d.date = e.date AND d.frequency = $4
+        """)
+        return sql, (symbols, start_date, end_date, frequency, today)
+
+    def load_query(self, symbol, start_date, end_date, frequency):
+        sql = f"""
+            SELECT (date - DATE '1970-01-01')::int4 AS day,
+                   EXTRACT(EPOCH FROM time)::int4 AS seconds,
+                   open::float8 AS open, high::float8 AS high, low::float8 AS low,
+                   close::float8 AS close, volume::float8 AS volume,
+                   COALESCE(amount::float8, 'NaN'::float8) AS amount,
+                   rpad(COALESCE(adjustflag, ''), {ADJUSTFLAG_WIDTH}) AS adjustflag
+            FROM StockData
+            WHERE code = $1 AND date BETWEEN $2 AND $3 AND frequency = $4
+            ORDER BY date, time
+        """
+        return sql, (symbol, start_date, end_date, frequency)
+
+
+class CompactStockSchema(StockDataSchema):
+    """按频率分表、按时间范围分区的紧凑表结构
+
+    每行只有symbol_id(int4) + ts(timestamp) + 5个float8/int8 + amount + adjustflag(int2)，
+    主键(symbol_id, ts)即按代码和时间的范围扫描索引；时间范围查询只扫描相关分区。
+    分区在写入前按需创建（分钟线按月，日/周/月线按年）。
+    """
+
+    name = 'compact'
+
+    def __init__(self):
+        self._tables: Set[str] = set()  # 已确认存在的频率表
+        self._partitions: Set[str] = set()  # 已确认存在的分区
+        self._symbols: Set[str] = set()  # 已登记的代码
+
+    @staticmethod
+    def table(frequency: str) -> str:
+        """频率对应的表名
+        Raises:
+            ValueError: 不支持的频率
+        """
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"不支持的数据频率: {frequency}")
+        return f"stock_bars_{frequency}"
+
+    @staticmethod
+    def partitions(frequency: str, first_day: date, last_day: date) -> List[Tuple[str, date, date]]:
+        """覆盖[first_day, last_day]的分区列表[(分区名, 下界, 上界)]，上界不含"""
+        table = CompactStockSchema.table(frequency)
+        monthly = frequency in MINUTE_FREQUENCIES
+        partitions = []
+        year, month = first_day.year, first_day.month if monthly else 1
+        while date(year, month, 1) <= last_day:
+            lower = date(year, month, 1)
+            if monthly:
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+                name = f"{table}_{lower:%Y_%m}"
+            else:
+                year += 1
+                name = f"{table}_{lower:%Y}"
+            partitions.append((name, lower, date(year, month, 1)))
+        return partitions
+
+    def init_statements(self) -> List[str]:
+        return ["""
+            CREATE TABLE IF NOT EXISTS stock_symbols (
+                id SERIAL PRIMARY KEY,
+                code VARCHAR(20) NOT NULL UNIQUE
+            );
+        """]
+
+    async def prepare(self, conn, frequency, symbol=None, first_day=None, last_day=None):
+        table = self.table(frequency)
+        if table not in self._tables:
+            await self._create(conn, table, f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    symbol_id INT4 NOT NULL,
+                    ts TIMESTAMP NOT NULL,
+                    open FLOAT8 NOT NULL,
+                    high FLOAT8 NOT NULL,
+                    low FLOAT8 NOT NULL,
+                    close FLOAT8 NOT NULL,
+                    volume INT8 NOT NULL,
+                    amount FLOAT8,
+                    adjustflag INT2,
+                    PRIMARY KEY (symbol_id, ts)
+                ) PARTITION BY RANGE (ts)
+            """)
+            self._tables.add(table)
+        if first_day is not None and last_day is not None:
+            for name, lower, upper in self.partitions(frequency, first_day, last_day):
+                if name not in self._partitions:
+                    await self._create(
+                        conn, name,
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+                    )
+                    self._partitions.add(name)
+        if symbol is not None and symbol not in self._symbols:
+            await conn.execute(
+                "INSERT INTO stock_symbols (code) VALUES ($1) ON CONFLICT (code) DO NOTHING", symbol
+            )
+            self._symbols.add(symbol)
+
+    @staticmethod
+    async def _create(conn, name: str, sql: str):
+        """建表（并发写入同一频率的连接用咨询锁串行化，避免CREATE IF NOT EXISTS竞争报错）"""
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", name)
+            await conn.execute(sql)
+
+    def merge_sql(self, frequency: str) -> str:
+        return f"""
+            INSERT INTO {self.table(frequency)} (symbol_id, ts, open, high, low, close, volume, amount, adjustflag)
+            SELECT sym.id, st.date + st.time, st.open::float8, st.high::float8, st.low::float8,
+                   st.close::float8, round(st.volume)::int8, st.amount::float8,
+                   CASE WHEN st.adjustflag ~ '^[0-9]{{1,4}}$' THEN st.adjustflag::int2 END
+            FROM {STAGING_TABLE} st
+            JOIN stock_symbols sym ON sym.code = st.code
+            ON CONFLICT (symbol_id, ts) DO UPDATE SET
+                open = EXCLUDED.open,
+                high = EXCLUDED.high,
+                low = EXCLUDED.low,
+                close = EXCLUDED.close,
+                volume = EXCLUDED.volume,
+                amount = EXCLUDED.amount,
+                adjustflag = EXCLUDED.adjustflag
+        """
+
+    def missing_ranges_query(self, symbols, start_date, end_date, frequency, today):
+        sql = _MISSING_RANGES_SQL.format(
+            symbol_column='sym.id AS symbol_id,',
+            symbol_join='LEFT JOIN stock_symbols sym ON sym.code = s.code',
+            today='$4',
+            exists=f"""
+                SELECT 1 FROM {self.table(frequency)} b
+                WHERE b.symbol_id = e.symbol_id AND b.ts >= e.date AND b.ts < e.date + 1
+            """,
+        )
+        return sql, (symbols, start_date, end_date, today)
+
+    def load_query(self, symbol, start_date, end_date, frequency):
+        sql = f"""
+            SELECT (b.ts::date - DATE '1970-01-01')::int4 AS day,
+                   EXTRACT(EPOCH FROM b.ts::time)::int4 AS seconds,
+                   b.open, b.high, b.low, b.close, b.volume::float8 AS volume,
+                   COALESCE(b.amount, 'NaN'::float8) AS amount,
+                   rpad(COALESCE(b.adjustflag::text, ''), {ADJUSTFLAG_WIDTH}) AS adjustflag
+            FROM {self.table(frequency)} b
+            JOIN stock_symbols sym ON sym.id = b.symbol_id
+            WHERE sym.code = $1 AND b.ts >= $2::date AND b.ts < $3::date + 1
+            ORDER BY b.ts
+        """
+        return sql, (symbol, start_date, end_date)
+
+    def stale_coverage_sql(self) -> Optional[str]:
+        # DataCoverage按(代码, 频率)记录，不区分表结构：切换到compact后，没有迁移（尚无stock_bars表）的频率
+        # 仍带着StockData中数据的覆盖记录，完整性检查会误判为已有数据，删除后按需重新扫描和获取
+        return """
+            DELETE FROM DataCoverage c
+            WHERE to_regclass('stock_bars_' || c.frequency) IS NULL
+        """
+
+
+STOCK_SCHEMAS = {
+    LegacyStockSchema.name: LegacyStockSchema,
+    CompactStockSchema.name: CompactStockSchema,
+}
+
+
+def create_stock_schema(name: str) -> StockDataSchema:
+    """按名称创建表结构
+    Raises:
+        ValueError: 未知的表结构名称
+    """
+    if name not in STOCK_SCHEMAS:
+        raise ValueError(f"未知的行情表结构: {name}，可选: {', '.join(STOCK_SCHEMAS)}")
+    return STOCK_SCHEMAS[name]()
+
+
+async def migrate_to_compact(conn, frequencies: Optional[Sequence[str]] = None) -> Dict[str, dict]:
+    """把StockData表中的数据迁移到紧凑表结构（可重复执行，已迁移的行会被覆盖更新）
+
+    每个分区一个事务，逐分区从StockData复制，迁移完成后ANALYZE。StockData保留不动，
+    确认无误后把QSYS_STOCK_SCHEMA设为compact即可切换。
+    Args:
+        conn: 数据库连接
+        frequencies: 要迁移的频率，默认为StockData中的全部频率
+    Returns:
+        {频率: {'rows': 迁移行数, 'partitions': 分区数, 'legacy_bytes': 原表中该频率的估算大小,
+                'compact_bytes': 新表大小}}
+    """
+    schema = CompactStockSchema()
+    for statement in schema.init_statements():
+        await conn.execute(statement)
+    if frequencies is None:
+        rows = await conn.fetch("SELECT DISTINCT frequency FROM StockData ORDER BY frequency")
+        frequencies = [row['frequency'] for row in rows]
+
+    legacy_bytes = await conn.fetchval("SELECT pg_total_relation_size('stockdata')")
+    legacy_rows = await conn.fetchval("SELECT GREATEST(COUNT(*), 1) FROM StockData")
+    report = {}
+    for frequency in frequencies:
+        table = schema.table(frequency)
+        bounds = await conn.fetchrow(
+            "SELECT MIN(date) AS first, MAX(date) AS last, COUNT(*) AS n FROM StockData WHERE frequency = $1",
+            frequency,
+        )
+        if not bounds['n']:
+            continue
+        await schema.prepare(conn, frequency, first_day=bounds['first'], last_day=bounds['last'])
+        await conn.execute(
+            "INSERT INTO stock_symbols (code) SELECT DISTINCT code FROM StockData WHERE frequency = $1 "
+            "ON CONFLICT (code) DO NOTHING",
+            frequency,
+        )
+        migrated = 0
+        partitions = schema.partitions(frequency, bounds['first'], bounds['last'])
+        for _, lower, upper in partitions:
+            async with conn.transaction():
+                status = await conn.execute(f"""
+                    INSERT INTO {table} (symbol_id, ts, open, high, low, close, volume, amount, adjustflag)
+                    SELECT sym.id, d.date + d.time, d.open::float8, d.high::float8, d.low::float8,
+                           d.close::float8, round(d.volume)::int8, d.amount::float8,
+                           CASE WHEN d.adjustflag ~ '^[0-9]{{1,4}}$' THEN d.adjustflag::int2 END
+                    FROM StockData d
+                    JOIN stock_symbols sym ON sym.code = d.code
+                    WHERE d.frequency = $1 AND d.date >= $2 AND d.date < $3
+                    ON CONFLICT (symbol_id, ts) DO UPDATE SET
+                        open = EXCLUDED.open,
+                        high = EXCLUDED.high,
+                        low = EXCLUDED.low,
+                        close = EXCLUDED.close,
+                        volume = EXCLUDED.volume,
+                        amount = EXCLUDED.amount,
+                        adjustflag = EXCLUDED.adjustflag
+                """, frequency, lower, upper)
+            migrated += int(status.split()[-1])
+        await conn.execute(f"ANALYZE {table}")
+        compact_bytes = await conn.fetchval(
+            "SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0) FROM pg_partition_tree($1::text::regclass)", table
+        )
+        report[frequency] = {
+            'rows': migrated,
+            'partitions': len(partitions),
+            'legacy_bytes': int(legacy_bytes * bounds['n'] / legacy_rows),
+            'compact_bytes': int(compact_bytes),
+        }
+    return report
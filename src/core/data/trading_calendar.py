@@ -0,0 +1,207 @@
+"""A股交易日历：一次性构建有序交易日数组，按区间和缺口查询"""
+import os
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+import chinese_calendar
+from src.support.log.logger import logger
+
+CALENDAR_PATH_ENV = 'QSYS_CALENDAR_PATH'  # 交易日历缓存文件路径环境变量
+DEFAULT_CALENDAR_PATH = Path.home() / '.cache' / 'qsys' / 'trading_calendar.npz'
+FIRST_YEAR = 1990  # 上交所开业年份
+
+DateLike = Union[date, str, np.datetime64, pd.Timestamp]
+
+
+def _to_day(value: DateLike) -> np.datetime64:
+    """转换为datetime64[D]"""
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+class TradingCalendar:
+    """A股交易日历
+
+    交易日 = 工作日（周一至周五）且不是法定节假日（调休补班的周末不开市）。
+    交易日保存为有序的datetime64[D]数组，区间、缺口查询都用searchsorted完成，不再逐日调用chinese_calendar。
+    日历按年份构建并缓存到磁盘，缓存在构建之后的下一年或chinese_calendar版本变化时自动重建，
+    以纳入新公布的节假日；chinese_calendar尚未收录的年份只排除周末。
+    """
+
+    def __init__(self, first_year: int = FIRST_YEAR, last_year: Optional[int] = None,
+                 path: Optional[Union[str, Path]] = None):
+        """
+        Args:
+            first_year: 日历起始年份
+            last_year: 日历结束年份，默认为明年
+            path: 缓存文件路径，默认读取QSYS_CALENDAR_PATH环境变量；传入空字符串表示不落盘
+        """
+        self.first_year = first_year
+        self.last_year = last_year if last_year is not None else date.today().year + 1
+        if path is None:
+            path = os.getenv(CALENDAR_PATH_ENV, DEFAULT_CALENDAR_PATH)
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self.days = self._load() if self.path else None
+        if self.days is None:
+            self.days = self._build(self.first_year, self.last_year)
+            self._save()
+
+    @staticmethod
+    def _build(first_year: int, last_year: int) -> np.ndarray:
+        """构建[first_year, last_year]内的交易日数组"""
+        weekdays = pd.bdate_range(f"{first_year}-01-01", f"{last_year}-12-31").values.astype('datetime64[D]')
+        holidays = []
+        for year in range(first_year, last_year + 1):
+            try:
+                holidays.extend(chinese_calendar.get_holidays(
+                    date(year, 1, 1), date(year, 12, 31), include_weekends=False))
+            except NotImplementedError:
+                continue  # chinese_calendar未收录的年份只排除周末
+        if not holidays:
+            return weekdays
+        return np.setdiff1d(weekdays, np.array(holidays, dtype='datetime64[D]'), assume_unique=True)
+
+    def _load(self) -> Optional[np.ndarray]:
+        """读取磁盘缓存，缓存不存在、已过期、chinese_calendar版本变化或年份范围不足时返回None"""
+        if not self.path.exists():
+            return None
+        try:
+            with np.load(self.path) as cached:
+                days = cached['days']
+                first_year, last_year, built_year = cached['meta'].tolist()
+                version = cached['version'].item() if 'version' in cached else None
+        except Exception as e:
+            logger.warning(f"读取交易日历缓存失败，将重新构建: {self.path} {str(e)}")
+            return None
+        if built_year < date.today().year or version != chinese_calendar.__version__:
+            return None
+        if first_year > self.first_year or last_year < self.last_year:
+            return None
+        self.first_year, self.last_year = first_year, last_year
+        return days
+
+    def _save(self):
+        """写入磁盘缓存（失败只记录警告）"""
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, days=self.days,
+                         meta=np.array([self.first_year, self.last_year, date.today().year]),
+                         version=np.array(chinese_calendar.__version__))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"写入交易日历缓存失败: {self.path} {str(e)}")
+
+    def _ensure(self, *days: np.datetime64):
+        """查询日期超出日历年份范围时扩展日历"""
+        years = [int(str(day)[:4]) for day in days]
+        if min(years) >= self.first_year and max(years) <= self.last_year:
+            return
+        with self._lock:
+            first_year, last_year = min(self.first_year, *years), max(self.last_year, *years)
+            if first_year < self.first_year or last_year > self.last_year:
+                self.days = self._build(first_year, last_year)
+                self.first_year, self.last_year = first_year, last_year
+                self._save()
+
+    def _bounds(self, start: DateLike, end: DateLike) -> Tuple[int, int]:
+        """[start, end]内交易日在数组中的下标区间[lo, hi)"""
+        start_day, end_day = _to_day(start), _to_day(end)
+        self._ensure(start_day, end_day)
+        lo = int(np.searchsorted(self.days, start_day, side='left'))
+        hi = int(np.searchsorted(self.days, end_day, side='right'))
+        return lo, max(lo, hi)
+
+    def is_trading_day(self, day: DateLike) -> bool:
+        lo, hi = self._bounds(day, day)
+        return hi > lo
+
+    def trading_days(self, start: DateLike, end: DateLike) -> np.ndarray:
+        """[start, end]内的交易日（datetime64[D]数组，只读视图）"""
+        lo, hi = self._bounds(start, end)
+        return self.days[lo:hi]
+
+    def count(self, start: DateLike, end: DateLike) -> int:
+        """[start, end]内的交易日数"""
+        lo, hi = self._bounds(start, end)
+        return hi - lo
+
+    def next_trading_day(self, day: DateLike, inclusive: bool = True) -> date:
+        """day当天（inclusive）或之后的第一个交易日"""
+        day = _to_day(day)
+        self._ensure(day, day + 31)  # 保证日历延伸到day之后，下一交易日一定存在
+        index = int(np.searchsorted(self.days, day, side='left' if inclusive else 'right'))
+        return self.days[index].item()
+
+    def uncovered_ranges(self, start: DateLike, end: DateLike,
+                         covered: Iterable[Tuple[DateLike, DateLike]] = (),
+                         exclude: Iterable[DateLike] = ()) -> List[Tuple[date, date]]:
+        """[start, end]内不在任何covered区间中的交易日，按相邻交易日合并为区间
+        Args:
+            start: 开始日期
+            end: 结束日期
+            covered: 已覆盖的闭区间[(start1, end1), ...]
+            exclude: 不计入缺失的日期（如当天）
+        Returns:
+            未覆盖区间列表[(start1, end1), (start2, end2)...]
+        """
+        lo, hi = self._bounds(start, end)
+        expected = self.days[lo:hi]
+        # 差分计数：区间起点+1、终点之后-1，前缀和大于0的交易日被覆盖
+        delta = np.zeros(len(expected) + 1, dtype=np.int64)
+        for range_start, range_end in covered:
+            delta[np.searchsorted(expected, _to_day(range_start), side='left')] += 1
+            delta[np.searchsorted(expected, _to_day(range_end), side='right')] -= 1
+        mask = np.cumsum(delta[:-1]) <= 0
+        mask &= ~np.isin(expected, np.asarray(list(exclude), dtype='datetime64[D]'))
+        return self._group(expected, mask)
+
+    def merge_ranges(self, ranges: Iterable[Tuple[DateLike, DateLike]]) -> List[Tuple[date, date]]:
+        """合并日期闭区间：重叠、相邻或只隔着非交易日的区间合并为一个
+        Returns:
+            按起始日期排序的区间列表[(start1, end1), ...]
+        """
+        merged: List[Tuple[date, date]] = []
+        for range_start, range_end in sorted((pd.Timestamp(a).date(), pd.Timestamp(b).date()) for a, b in ranges):
+            if range_end < range_start:
+                continue
+            if merged:
+                last_start, last_end = merged[-1]
+                gap_start, gap_end = _to_day(last_end) + 1, _to_day(range_start) - 1
+                if gap_end < gap_start or not self.count(gap_start, gap_end):
+                    merged[-1] = (last_start, max(last_end, range_end))
+                    continue
+            merged.append((range_start, range_end))
+        return merged
+
+    @staticmethod
+    def _group(days: np.ndarray, mask: np.ndarray) -> List[Tuple[date, date]]:
+        """把days中mask为True的交易日按相邻交易日合并为区间"""
+        selected = np.flatnonzero(mask)
+        if not len(selected):
+            return []
+        # 选中交易日在日历中的下标不连续处即为区间断点
+        breaks = np.flatnonzero(np.diff(selected) > 1)
+        starts = np.concatenate(([selected[0]], selected[breaks + 1]))
+        ends = np.concatenate((selected[breaks], [selected[-1]]))
+        return list(zip(days[starts].tolist(), days[ends].tolist()))
+
+
+_calendar: Optional[TradingCalendar] = None
+_calendar_lock = threading.Lock()
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """进程内共享的交易日历（首次调用时加载或构建）"""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                _calendar = TradingCalendar()
+    return _calendar
@@ -1,7 +1,6 @@
 from datetime import datetime
 from decimal import Decimal
-from ..data.database import DatabaseManager
-from typing import Dict, Literal, Optional
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Tuple
 import pandas as pd
 import uuid
 # from THS.THSTrader import THSTrader
@@ -10,6 +9,11 @@ from src.event_bus.event_types import FillEvent, OrderEvent
 from enum import Enum, auto
 from threading import Lock
 from abc import ABC, abstractmethod
+from src.support.log.logger import logger
+
+if TYPE_CHECKING:
+    # 仅用于类型标注：数据库模块依赖asyncpg/streamlit等，回测和无界面运行时不导入
+    from ..data.database import DatabaseManager
 
 class BaseTrader(ABC):
     """交易执行基类"""
@@ -34,11 +38,52 @@ class OrderStatus(Enum):
     CANCELLED = auto()    # 订单已取消
     REJECTED = auto()     # 订单被拒绝
 
+class InMemoryOrderStore:
+    """内存订单存储，接口与DatabaseManager的订单方法一致，不落库
+
+    回测和无界面运行时未注入数据库的情况下使用，订单只保存在当前进程中。
+    """
+
+    def __init__(self):
+        self._orders: Dict[int, Dict] = {}
+        self._next_id = 1
+
+    async def save_order(self, order: Dict) -> int:
+        order_id = self._next_id
+        self._next_id += 1
+        order['order_id'] = order_id
+        self._orders[order_id] = dict(order)
+        return order_id
+
+    async def update_order_status(self, order_id: int, status: str) -> bool:
+        order = self._orders.get(order_id)
+        if order is None:
+            return False
+        order['status'] = status
+        return True
+
+    async def batch_update_order_status(self, updates: List[Tuple[int, str]]) -> bool:
+        for order_id, status in updates:
+            await self.update_order_status(order_id, status)
+        return True
+
+    async def query_orders(self, order_id: Optional[int] = None) -> List[Dict]:
+        if order_id is None:
+            return [dict(order) for order in self._orders.values()]
+        order = self._orders.get(order_id)
+        return [dict(order)] if order is not None else []
+
+
 class TradeOrderManager:
     """交易订单管理类，负责订单的创建、修改、取消"""
     
-    def __init__(self, db_manager: DatabaseManager, trader: BaseTrader, software_dir=None):
-        self.db_manager = db_manager
+    def __init__(self, db_manager: Optional["DatabaseManager"], trader: BaseTrader, software_dir=None):
+        """
+        Args:
+            db_manager: 订单持久化（DatabaseManager或接口兼容的对象），None时使用InMemoryOrderStore不落库
+            trader: 订单执行器
+        """
+        self.db_manager = db_manager if db_manager is not None else InMemoryOrderStore()
         self.trader = trader
         self.pending_orders = []
         self.executed_trades = []
@@ -170,7 +215,7 @@ class TradeOrderManager:
                 order_id=order_dict.get('order_id', '')
             )
         except (KeyError, IndexError, ValueError, AttributeError) as e:
-            print(f"Error converting order to OrderEvent: {e}")
+            logger.warning("订单转换为OrderEvent失败: %s", e)
             return None
 
     def _convert_fill_event_to_trade(self, fill_event: FillEvent, original_order: Dict) -> Dict:
@@ -221,7 +266,7 @@ class TradeOrderManager:
 class TradeExecutionEngine:
     """交易执行引擎类"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: "DatabaseManager"):
         self.db_manager = db_manager
         
     def generate_order_instruction(self, order):
@@ -248,7 +293,7 @@ class TradeExecutionEngine:
 class TradeRecorder:
     """交易记录类"""
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: "DatabaseManager"):
         self.db_manager = db_manager
         
     async def record_trade(self, execution):
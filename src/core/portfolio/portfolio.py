@@ -1,5 +1,6 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Sequence
 import time
+import numpy as np
 from functools import lru_cache
 from datetime import datetime
 from ..strategy.position_strategy import PositionStrategy
@@ -247,7 +248,7 @@ class PortfolioManager(IPortfolio):
             else:
                 # 新持仓标的处理 - 需要获取股票对象
                 # 这里需要外部提供股票对象，暂时跳过
-                print(f"警告: 无法处理新持仓标的 {symbol}，需要提供股票对象")
+                logger.warning("无法处理新持仓标的 %s，需要提供股票对象", symbol)
                 results.append(False)
                 
         return results
@@ -351,12 +352,30 @@ class PortfolioManager(IPortfolio):
         
         return weights
 
-    def record_equity_history(self, timestamp: datetime, price_data: Optional[Dict] = None) -> None:
+    def mark_to_market(self, prices: Dict[str, float]) -> None:
+        """按最新价格重估持仓市值
+        Args:
+            prices: 价格字典 {symbol: price}，缺失或NaN的标的保持原市值
+        """
+        for symbol, position in self.positions.items():
+            price = prices.get(symbol)
+            if price is None or price != price:
+                continue
+            position.current_value = position.quantity * price
+            if hasattr(position.stock, 'last_price'):
+                position.stock.last_price = price
+        self.invalidate_cache()
+
+    def record_equity_history(self, timestamp: datetime, price_data: Optional[Dict] = None,
+                              prices: Optional[Dict[str, float]] = None) -> None:
         """记录净值历史
         Args:
             timestamp: 时间戳
             price_data: 价格数据，可选
+            prices: 记录前按此价格重估持仓市值（mark_to_market），{symbol: price}，可选
         """
+        if prices:
+            self.mark_to_market(prices)
         total_value = self.get_portfolio_value()
         
         # 更新峰值价值
@@ -387,6 +406,60 @@ class PortfolioManager(IPortfolio):
         
         self.equity_history.append(record)
 
+    def record_equity_history_batch(self, timestamps: List[datetime],
+                                    price_data: Optional[Dict[str, Any]] = None,
+                                    prices: Optional[Dict[str, Sequence[float]]] = None) -> None:
+        """批量记录一段无交易区间的净值历史
+        区间内持仓数量与资金不变，持仓市值按各时间点的价格向量化重估（数量 × 价格），
+        组合价值、峰值与回撤按数组计算，结果与逐条调用record_equity_history(prices=...)一致。
+        Args:
+            timestamps: 时间戳列表
+            price_data: 价格数据，可选，{字段名: 与timestamps等长的序列}
+            prices: 重估价格，可选，{symbol: 与timestamps等长的价格序列}，缺失或NaN的价格沿用上一市值
+        """
+        count = len(timestamps)
+        if count == 0:
+            return
+
+        # 各持仓逐时间点的市值：NaN价格沿用前一时间点的市值（与mark_to_market一致）
+        prices = prices or {}
+        positions_value = np.zeros(count)
+        for symbol, position in self.positions.items():
+            if symbol not in prices:
+                positions_value += position.current_value
+                continue
+            values = position.quantity * np.asarray(prices[symbol], dtype=float)
+            valid = ~np.isnan(values)
+            last_valid = np.maximum.accumulate(np.where(valid, np.arange(count), -1))
+            values = np.where(last_valid >= 0, values[np.maximum(last_valid, 0)], position.current_value)
+            positions_value += values
+            position.current_value = float(values[-1])
+            if valid.any() and hasattr(position.stock, 'last_price'):
+                position.stock.last_price = float(np.asarray(prices[symbol], dtype=float)[valid][-1])
+        self.invalidate_cache()
+
+        total_values = self.current_cash + positions_value
+        peaks = np.maximum(np.maximum.accumulate(total_values), self._peak_value)
+        drawdowns = np.divide(peaks - total_values, peaks, out=np.zeros(count), where=peaks > 0) * 100
+        self._peak_value = float(peaks[-1])
+        self._max_drawdown = max(self._max_drawdown, float(drawdowns.max()))
+
+        columns = {key: list(values) for key, values in (price_data or {}).items()}
+        for i, timestamp in enumerate(timestamps):
+            total_value = float(total_values[i])
+            record = {
+                'timestamp': timestamp,
+                'total_value': total_value,
+                'cash': self.current_cash,
+                'positions_value': total_value - self.current_cash,
+                'return_pct': (total_value / self.initial_capital - 1) * 100,
+                'drawdown_pct': float(drawdowns[i]),
+                'peak_value': float(peaks[i]),
+            }
+            for key, values in columns.items():
+                record[key] = values[i]
+            self.equity_history.append(record)
+
     def get_equity_history(self) -> List[Dict]:
         """获取净值历史记录
         Returns:
@@ -1,25 +1,31 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timedelta, date
-from typing import Optional, Dict, Any, List, Type
+from typing import Optional, Dict, Any, List, Tuple, Type
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from src.core.strategy.position_strategy import FixedPercentStrategy, KellyStrategy, PositionStrategyFactory
 from src.core.strategy.indicators import IndicatorService  # 新增IndicatorService导入
 from src.core.strategy.rule_parser import RuleParser  # 新增RuleParser导入
 from src.core.strategy.rule_based_strategy import RuleBasedStrategy  # 新增RuleBasedStrategy导入
 from src.core.strategy.signal_types import SignalType  # 新增信号类型导入
+from src.core.strategy.bar_cursor import BarCursor
+from src.core.strategy.debug_capture import DebugCapture
+from src.core.strategy.market_timeline import MarketTimeline
+from src.core.strategy.profiler import BacktestProfiler
 from src.event_bus.event_types import StrategyScheduleEvent, TradingDayEvent, StrategySignalEvent, OrderEvent, FillEvent  # 新增OrderEvent和FillEvent导入
 from src.core.risk.risk_manager import RiskManager  
 from src.core.portfolio.portfolio import PortfolioManager 
 from src.core.portfolio.portfolio_interface import Position, IPortfolio
 from src.core.execution.Trader import BacktestTrader, TradeOrderManager  # 新增交易执行组件导入
 import json
-import streamlit as st  # 新增streamlit导入
+import pickle
 from pathlib import Path
 from src.support.log.logger import logger
 import os
+import numpy as np
 import pandas as pd
 
 import logging
-logger.setLevel(logging.DEBUG)  
 
 @dataclass
 class BacktestConfig:
@@ -50,6 +56,27 @@ class BacktestConfig:
 
         strategy_mapping (Dict[str, Dict[str, Any]]): 股票-策略映射配置
         default_strategy (Dict[str, Any]): 默认策略配置
+
+        execution_mode (str): 执行模式，默认"event"
+            - event: 逐K线事件驱动
+            - hybrid: 向量化预计算信号位置，只在信号K线上执行事件驱动逻辑
+
+        debug_mode (str): 规则策略调试数据采集模式，默认"snapshot"
+            - off: 不采集
+            - snapshot: 回测结束时快照一次
+            - sampled: 按间隔采样写入环形缓冲区
+        debug_sample_interval (int): sampled模式的采样间隔（K线数），默认1
+        debug_buffer_size (int): sampled模式保留的采样点数，默认500
+
+        parallel_workers (int): 多标的回测的并行进程数，默认1（顺序执行）
+        portfolio_mode (str): 多标的回测的资金模式，默认"isolated"
+            - isolated: 按标的平均分配资金，各标的独立回测后合并净值
+            - shared: 所有标的共用一个投资组合和全部资金，在合并时间轴上统一执行
+
+        profile_mode (str): 性能剖析模式，默认"off"，结果写入get_results()["perf"]
+            - off: 不采集
+            - timers: 分阶段计时（墙钟/CPU）和计数器（K线、规则求值、订单、成交等）
+            - cprofile / pyinstrument: timers + 函数级剖析报告
     """
 
     start_date: str
@@ -71,6 +98,13 @@ class BacktestConfig:
     min_lot_size: int = 100
     strategy_mapping: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     default_strategy: Dict[str, Any] = field(default_factory=dict)
+    execution_mode: str = "event"
+    debug_mode: str = "snapshot"
+    debug_sample_interval: int = 1
+    debug_buffer_size: int = 500
+    parallel_workers: int = 1
+    portfolio_mode: str = "isolated"
+    profile_mode: str = "off"
 
     def __post_init__(self):
         """参数验证和兼容性处理"""
@@ -110,6 +144,18 @@ class BacktestConfig:
             raise ValueError("止损比例必须在0到1之间")
         if self.take_profit is not None and (self.take_profit <= 0 or self.take_profit >= 1):
             raise ValueError("止盈比例必须在0到1之间")
+        if self.execution_mode not in ("event", "hybrid"):
+            raise ValueError("执行模式必须是event或hybrid")
+        if self.debug_mode not in DebugCapture.MODES:
+            raise ValueError("调试数据模式必须是off、snapshot或sampled")
+        if self.debug_sample_interval < 1 or self.debug_buffer_size < 1:
+            raise ValueError("调试数据采样间隔和缓冲区容量必须大于0")
+        if self.parallel_workers < 1:
+            raise ValueError("并行进程数必须大于0")
+        if self.portfolio_mode not in ("isolated", "shared"):
+            raise ValueError("资金模式必须是isolated或shared")
+        if self.profile_mode not in BacktestProfiler.MODES:
+            raise ValueError("性能剖析模式必须是off、timers、cprofile或pyinstrument")
 
     def get_symbols(self) -> List[str]:
         """统一获取所有交易标的符号列表"""
@@ -193,7 +239,14 @@ class BacktestConfig:
             "max_holding_days": self.max_holding_days,
             "extra_params": self.extra_params,
             "position_strategy_type": self.position_strategy_type,
-            "position_strategy_params": self.position_strategy_params.copy()  # 返回副本避免引用问题
+            "position_strategy_params": self.position_strategy_params.copy(),  # 返回副本避免引用问题
+            "execution_mode": self.execution_mode,
+            "debug_mode": self.debug_mode,
+            "debug_sample_interval": self.debug_sample_interval,
+            "debug_buffer_size": self.debug_buffer_size,
+            "parallel_workers": self.parallel_workers,
+            "portfolio_mode": self.portfolio_mode,
+            "profile_mode": self.profile_mode
         }
 
     @classmethod
@@ -213,15 +266,27 @@ class BacktestConfig:
 class BacktestEngine:
     """回测引擎，负责执行回测流程"""
     
-    def __init__(self, config: BacktestConfig, data):
-        
+    def __init__(self, config: BacktestConfig, data, profiler: Optional[BacktestProfiler] = None,
+                 db_manager: Optional[Any] = None):
+        """
+        Args:
+            config: 回测配置
+            data: 行情数据（单标的DataFrame或{标的: DataFrame}）
+            profiler: 性能剖析器，默认按config.profile_mode创建（调用方可传入以记录数据加载等外部阶段）
+            db_manager: 订单持久化（DatabaseManager或接口兼容的对象），默认None不落库
+        """
         self.config = config
-        self.event_queue = []
+        self.profiler = profiler if profiler is not None else BacktestProfiler(config.profile_mode)
+        self.event_queue: deque = deque()  # 待处理事件队列（先进先出，出队O(1)）
         self.current_price = None  # 回测过程的当前价格
         self.current_time = None #回测过程的当前时间
 
         self.current_index = None
+        self.bar_cursor: Optional[BarCursor] = None  # 回测过程的列式K线游标（run开始时创建）
         self.handlers = {}  # 事件处理器字典 {event_type: handler}
+        self._dispatch_table = {}  # 事件类型 -> 处理器（按类型继承关系解析后的缓存）
+        # 逐K线/逐事件的调试日志开关（缓存isEnabledFor结果，run开始时刷新；关闭时跳过日志参数的构造）
+        self._log_debug = logger.isEnabledFor(logging.DEBUG)
         self.strategies = []  # 支持多个策略
         
         # 支持单符号和多符号数据
@@ -292,8 +357,9 @@ class BacktestEngine:
         
         # 初始化交易执行组件
         self.backtest_trader = BacktestTrader(commission_rate=config.commission_rate)
-        # TradeOrderManager需要DatabaseManager和Trader
-        self.trade_order_manager = TradeOrderManager(st.session_state.db, self.backtest_trader)
+        # 回测成交为模拟成交，不依赖数据库；未注入db_manager时订单只保存在内存中
+        self.db_manager = db_manager
+        self.trade_order_manager = TradeOrderManager(db_manager, self.backtest_trader)
         
         # 初始化Portfolio接口和RiskManager
         self.portfolio = self.portfolio_manager  # PortfolioManager 实现了 IPortfolio 接口
@@ -316,104 +382,200 @@ class BacktestEngine:
         self.rule_parser.data = self.data
         self.rule_parser.indicator_service = self.indicator_service
         self.rule_parser.portfolio_manager = self.portfolio_manager
+        self.rule_parser.cursor = self.bar_cursor
 
-    def run(self, start_date: datetime, end_date: datetime):
-        """执行事件驱动的回测"""
+    def run(self, start_date: datetime, end_date: datetime, bar_range: Optional[Tuple[int, int]] = None):
+        """执行事件驱动的回测
+        Args:
+            start_date: 回测开始时间
+            end_date: 回测结束时间
+            bar_range: 只在[start, end)位置的K线上执行回测，默认全部K线；
+                区间之前的数据仍参与指标计算（如滚动窗口的样本外测试）
+        """
+        with self.profiler.session():
+            self._run_bars(start_date, end_date, bar_range)
 
+    def _run_bars(self, start_date: datetime, end_date: datetime, bar_range: Optional[Tuple[int, int]]):
+        """run的执行主体"""
         # 更新RuleParser数据引用
         self.update_rule_parser_data()
+
+        with self.profiler.stage('prepare_data'):
+            self._prepare_data(self.data)
+            # 行情列一次性提取为数组，逐K线循环只做O(1)读取
+            self.bar_cursor = BarCursor(self.data)
+        self.update_rule_parser_data()
+        first_bar, last_bar = bar_range if bar_range is not None else (0, len(self.data))
+        if not 0 <= first_bar < last_bar <= len(self.data):
+            raise ValueError(f"无效的K线区间: {bar_range}")
+        # 初始化净值记录
+        self._update_equity({
+            'datetime': start_date,
+            'close': self.bar_cursor.value('close', first_bar)
+        })
+        
+        # 设置初始日期
+        self.current_time = self.bar_cursor.times[first_bar]
         
         
+        # 遍历触发事件
+        self._log_debug = logger.isEnabledFor(logging.DEBUG)
+        if self._log_debug:
+            logger.debug("开始回测... 数据总数: %d", len(self.data))
+            logger.debug("数据列: %s", list(self.data.columns))
+            logger.debug("数据预览: %s", self.data.head(1).to_dict())
+
+        if self.config.execution_mode == "hybrid":
+            self._run_hybrid(first_bar, last_bar)
+        else:
+            for idx in range(first_bar, last_bar):
+                if self._log_debug and idx % 100 == 0:  # 每100条记录输出一次进度
+                    logger.debug("回测进度: %d/%d", idx, len(self.data))
+
+                # 系统初始化（首个交易日）
+                if idx == first_bar:
+                    self._initialize_backtest_system()
+                    if self._log_debug:
+                        logger.debug("已注册策略数量: %d", len(self.strategies))
+                        for i, strategy in enumerate(self.strategies):
+                            logger.debug("策略 %d: %s - %s", i, type(strategy).__name__, getattr(strategy, 'name', '未命名'))
+
+                self._process_bar(idx)
+
+        # 回测过程中缓存的列写入（signal等）统一写回DataFrame
+        self.bar_cursor.flush()
+
+    def _prepare_data(self, data: pd.DataFrame):
+        """按数据频率处理时间字段并初始化signal列（原地修改）"""
         # 根据数据频率处理时间字段
         if self.config.frequency.lower() == 'd':
-            logger.debug(f"识别数据频率为：日线")
-            self.data['combined_time'] = pd.to_datetime(self.data['date'], format='%Y-%m-%d')
+            logger.debug("识别数据频率为：日线")
+            data['combined_time'] = pd.to_datetime(data['date'], format='%Y-%m-%d')
             # 为日线数据添加默认时间
-            self.data['time'] = '00:00:00'
+            data['time'] = '00:00:00'
         else:
-            
-            if 'time' not in self.data.columns:
+
+            if 'time' not in data.columns:
                 raise ValueError("分钟线数据必须包含time字段")
-            
+
             # 检查time列的空值
-            null_time_data = self.data[self.data['time'].isnull()]
+            null_time_data = data[data['time'].isnull()]
             if not null_time_data.empty:
                 logger.warning(f"发现{len(null_time_data)}条time列为空的记录")
-                logger.debug(f"空time记录: {null_time_data.head()}")
-        
-        
+                logger.debug("空time记录: %s", null_time_data.head())
+
         # 初始化signal列
-        self.data['signal'] = 0  # 0:无信号, 1:买入, -1:卖出
-        # 初始化净值记录
-        self._update_equity({
-            'datetime': start_date,
-            'close': self.data.iloc[0]['close']
-        })
-        
-        # 设置初始日期
-        self.current_time = self.data['combined_time'].iloc[0]
-        
-        
-        # 遍历触发事件
-        logger.debug(f"开始回测... 数据总数: {len(self.data)}")
-        logger.debug(f"数据列: {list(self.data.columns)}")
-        logger.debug(f"数据预览: {self.data.head(1).to_dict()}")
-
-        for idx in range(len(self.data)):
-            if idx % 100 == 0:  # 每100条记录输出一次进度
-                logger.debug(f"回测进度: {idx}/{len(self.data)}")
-
-            current_time = self.data.iloc[idx]['combined_time']
-            self.current_time = current_time
-            self.current_index = idx
-            self.current_price = self.data.loc[self.current_index,'close']
-            
-            # 仓位策略的资金更新现在通过PortfolioManager接口进行
-            # 在_calculate_position_amount方法中实时获取账户价值，确保状态一致性
-            
-            # 系统初始化（首个交易日）
-            if idx == 0:
-                self._initialize_backtest_system()
-            
-            # 更新RuleParser数据引用和当前索引
-            self.update_rule_parser_data()
-            self.rule_parser.current_index = idx
-            
-            
-            # 触发所有注册策略的定时检查
-            if idx == 0:
-                logger.debug(f"已注册策略数量: {len(self.strategies)}")
-                for i, strategy in enumerate(self.strategies):
-                    logger.debug(f"策略 {i}: {type(strategy).__name__} - {strategy.name if hasattr(strategy, 'name') else '未命名'}")
+        data['signal'] = 0  # 0:无信号, 1:买入, -1:卖出
+
+    def _process_bar(self, idx: int):
+        """执行单根K线的事件驱动逻辑：策略调度、事件处理、净值记录"""
+        self._dispatch_bar(idx, self.strategies)
+
+        # 在每个数据点通过PortfolioManager按收盘价重估持仓并记录净值历史
+        price_data = {
+            'close': self.current_price
+        }
+        with self.profiler.stage('equity'):
+            self.portfolio_manager.record_equity_history(
+                self.current_time, price_data, prices={self._bar_symbol(idx): self.current_price}
+            )
+
+    def _bar_symbol(self, idx: int) -> str:
+        """第idx根K线的标的代码（数据没有code列时为目标标的）"""
+        return self.bar_cursor.codes[idx] or self.config.target_symbol
+
+    def _dispatch_bar(self, idx: int, strategies: List[Any]):
+        """在当前游标数据的第idx根K线上调度策略并处理事件队列"""
+        cursor = self.bar_cursor
+        cursor.move_to(idx)
+        current_time = cursor.time
+        self.current_time = current_time
+        self.current_index = idx
+        self.current_price = cursor.close
+
+        # 仓位策略的资金更新现在通过PortfolioManager接口进行
+        # 在_calculate_position_amount方法中实时获取账户价值，确保状态一致性
 
-            for strategy in self.strategies:
+        # 更新RuleParser数据引用和当前索引
+        self.update_rule_parser_data()
+        self.rule_parser.current_index = idx
+
+        profiler = self.profiler
+        profiler.count('bars')
+        # 触发所有注册策略的定时检查（规则求值，信号直接转为订单事件入队）
+        with profiler.stage('strategies'):
+            for strategy in strategies:
                 # logger.debug(f"触发策略: {type(strategy).__name__} - {strategy.name if hasattr(strategy, 'name') else '未命名'}")
                 strategy.on_schedule(self)
 
-            # 处理事件队列（处理非StrategySignalEvent和OrderEvent的其他事件）
-            # logger.debug(f"处理前事件队列长度: {len(self.event_queue) if hasattr(self, 'event_queue') else 0}")
+        # 处理事件队列（处理非StrategySignalEvent和OrderEvent的其他事件）
+        with profiler.stage('events'):
             self._process_event_queue()
-            # logger.debug(f"处理后事件队列长度: {len(self.event_queue) if hasattr(self, 'event_queue') else 0}")
-
-            # 在每个数据点通过PortfolioManager记录净值历史
-            price_data = {
-                'close': self.current_price
-            }
-            self.portfolio_manager.record_equity_history(current_time, price_data)
 
-            # 添加详细调试日志
-            # logger.debug(f"当前数据: {self.data.iloc[idx].to_dict()}")
-        
+    def _get_active_bars(self, strategies: Optional[List[Any]] = None) -> Optional[np.ndarray]:
+        """汇总所有策略的信号位置
+        Args:
+            strategies: 策略列表，默认为引擎注册的策略
+        Returns:
+            需要执行事件驱动逻辑的K线位置(bool数组)，任一策略无法预计算时返回None
+        """
+        active = np.zeros(len(self.data), dtype=bool)
+        for strategy in self.strategies if strategies is None else strategies:
+            with self.profiler.stage('signal_mask'):
+                mask = strategy.get_signal_mask(self) if hasattr(strategy, 'get_signal_mask') else None
+            if mask is None:
+                logger.info(f"策略 {getattr(strategy, 'name', type(strategy).__name__)} 需逐K线调度，使用事件驱动模式")
+                return None
+            active |= np.asarray(mask, dtype=bool)
+        return active
+
+    def _run_hybrid(self, first_bar: int = 0, last_bar: Optional[int] = None):
+        """混合执行模式
+        先向量化预计算各策略的信号位置，只在信号K线上执行有状态的组合/仓位逻辑；
+        非信号K线上持仓与资金不变，其净值记录按收盘价向量化重估后批量填充。
+        Args:
+            first_bar: 回测区间起点（包含）
+            last_bar: 回测区间终点（不包含），默认数据末尾
+        """
+        last_bar = len(self.data) if last_bar is None else last_bar
+        self._initialize_backtest_system()
+        active = self._get_active_bars()
+        if active is None:
+            active = np.ones(len(self.data), dtype=bool)
+        active[:first_bar] = False
+        active[last_bar:] = False
+        if last_bar > first_bar:
+            # 最后一根K线总是执行，保证结束状态（当前价格、调试数据等）与事件驱动模式一致
+            active[last_bar - 1] = True
+        active_bars = np.flatnonzero(active)
+        logger.info(f"混合模式: 信号K线 {len(active_bars)}/{last_bar - first_bar}")
+
+        next_bar = first_bar  # 下一根需要记录净值的K线
+        for idx in active_bars:
+            idx = int(idx)
+            self._record_equity_range(next_bar, idx)
+            self._process_bar(idx)
+            next_bar = idx + 1
+
+    def _record_equity_range(self, start: int, end: int):
+        """批量记录[start, end)区间的净值（区间内无交易，持仓按各K线收盘价向量化重估）"""
+        if start >= end:
+            return
+        with self.profiler.stage('equity'):
+            close = self.bar_cursor.column('close')[start:end]
+            self.portfolio_manager.record_equity_history_batch(
+                self.bar_cursor.times[start:end], {'close': close}, prices={self._bar_symbol(start): close}
+            )
 
     def handle_trading_day_event(self, event):
         """处理交易日事件"""
-        logger.debug(f"处理交易日事件 @ {event.timestamp}")
-        logger.debug(f"待处理事件队列: {[e.__class__.__name__ for e in self.event_queue]}")
+        if self._log_debug:
+            logger.debug("处理交易日事件 @ %s, 待处理事件数: %d", event.timestamp, len(self.event_queue))
         
         # 处理事件队列
         while self.event_queue:
-            event = self.event_queue.pop(0)
-            handler = self.handlers.get(type(event))
+            event = self.event_queue.popleft()
+            handler = self._resolve_handler(type(event))
             if handler:
                 try:
                     # 处理策略信号事件
@@ -444,13 +606,13 @@ class BacktestEngine:
 
         # 记录信号到数据中
         if event.signal_type in [SignalType.OPEN, SignalType.BUY]:
-            self.data.loc[idx, 'signal'] = 1
+            self._record_signal(idx, 1)
         elif event.signal_type in [SignalType.SELL, SignalType.CLOSE]:
-            self.data.loc[idx, 'signal'] = -1
+            self._record_signal(idx, -1)
         elif event.signal_type == SignalType.HEDGE:
-            self.data.loc[idx, 'signal'] = 2  # 对冲信号
+            self._record_signal(idx, 2)  # 对冲信号
         elif event.signal_type == SignalType.REBALANCE:
-            self.data.loc[idx, 'signal'] = 3  # 再平衡信号
+            self._record_signal(idx, 3)  # 再平衡信号
 
         # 使用仓位管理策略计算交易数量
         if hasattr(self.position_strategy, 'calculate_position_size'):
@@ -465,6 +627,13 @@ class BacktestEngine:
             elif event.signal_type == SignalType.REBALANCE:
                 self._create_rebalance_order(event)
 
+    def _record_signal(self, idx: int, value: int):
+        """记录信号值（回测中经游标缓存，结束时统一写回signal列）"""
+        if self.bar_cursor is not None:
+            self.bar_cursor.set_value('signal', idx, value)
+        else:
+            self.data.loc[idx, 'signal'] = value
+
     def _create_order_with_position_strategy(self, event: StrategySignalEvent):
         """使用仓位管理策略创建订单"""
         try:
@@ -493,7 +662,8 @@ class BacktestEngine:
                 current_position=current_position
             )
 
-            logger.debug(f"仓位策略计算结果: {quantity}, 信号类型: {event.signal_type}, 当前持仓: {current_position}")
+            if self._log_debug:
+                logger.debug("仓位策略计算结果: %s, 信号类型: %s, 当前持仓: %s", quantity, event.signal_type, current_position)
 
             # 创建交易订单
             if quantity > 0:
@@ -524,7 +694,8 @@ class BacktestEngine:
 
             # 将订单事件添加到事件队列
             self.event_queue.append(order_event)
-            logger.debug(f"创建买入订单: {quantity}股 {event.symbol} @ {event.price}")
+            if self._log_debug:
+                logger.debug("创建买入订单: %s股 %s @ %s", quantity, event.symbol, event.price)
 
         except Exception as e:
             error_msg = f"买入订单创建失败: {str(e)}"
@@ -547,7 +718,8 @@ class BacktestEngine:
 
             # 将订单事件添加到事件队列
             self.event_queue.append(order_event)
-            logger.debug(f"创建卖出订单: {quantity}股 {event.symbol} @ {event.price}")
+            if self._log_debug:
+                logger.debug("创建卖出订单: %s股 %s @ %s", quantity, event.symbol, event.price)
 
         except Exception as e:
             error_msg = f"卖出订单创建失败: {str(e)}"
@@ -614,6 +786,7 @@ class BacktestEngine:
             
     def _process_order_through_trade_manager(self, order_event: OrderEvent):
         """在回测环境中处理订单（直接生成模拟的FillEvent）"""
+        self.profiler.count('orders')
         try:
             # logger.debug(f"开始处理回测订单: {order_event.direction} {order_event.quantity}@{order_event.price}")
             
@@ -691,7 +864,9 @@ class BacktestEngine:
         
     def _handle_order_event(self, event: OrderEvent):
         """处理订单事件 - 使用PortfolioManager执行订单并更新持仓和资金"""
-        logger.debug(f"处理订单事件: {event}")
+        if self._log_debug:
+            logger.debug("处理订单事件: %s", event)
+        self.profiler.count('orders')
         
         try:
             # 计算订单总金额（包含手续费），确保类型一致性
@@ -724,6 +899,7 @@ class BacktestEngine:
                 'total_cost': total_cost if event.direction == 'BUY' else -total_cost
             }
             self.trades.append(trade_record)
+            self.profiler.count('fills')
                 
             
         except Exception as e:
@@ -751,7 +927,24 @@ class BacktestEngine:
             handler: 事件处理函数
         """
         self.handlers[event_type] = handler
-        logger.debug(f"注册事件处理器: {event_type.__name__}")
+        self._dispatch_table.clear()
+        logger.debug("注册事件处理器: %s", event_type.__name__)
+
+    def _resolve_handler(self, event_type: Type):
+        """按事件类型查找处理器
+        未直接注册的类型沿继承链查找最近的父类处理器，结果按类型缓存（注册新处理器时清空）。
+        Returns:
+            处理器，未找到时为None
+        """
+        try:
+            return self._dispatch_table[event_type]
+        except KeyError:
+            pass
+        handler = next(
+            (self.handlers[cls] for cls in event_type.__mro__ if cls in self.handlers), None
+        )
+        self._dispatch_table[event_type] = handler
+        return handler
 
     def register_strategy(self, strategy):
         """注册策略实例
@@ -776,14 +969,12 @@ class BacktestEngine:
 
         # 添加调试信息
         strategy_name = getattr(strategy, 'name', '未命名')
-        print(f"[DEBUG] 策略注册成功 | ID: {strategy.strategy_id} | 名称: {strategy_name} | 类型: {type(strategy).__name__}")
-
         # 注册策略调度事件处理器
         self.register_handler(StrategyScheduleEvent, strategy.on_schedule)
-        logger.debug(f"注册策略调度处理器: {strategy.strategy_id}")
+        logger.debug("注册策略调度处理器: %s", strategy.strategy_id)
 
         # 记录策略注册日志
-        logger.info(f"策略注册成功 | ID: {strategy.strategy_id} | 名称: {strategy_name}")
+        logger.info("策略注册成功 | ID: %s | 名称: %s | 类型: %s", strategy.strategy_id, strategy_name, type(strategy).__name__)
 
     def create_rule_based_strategy(self, name: str, 
                                   buy_rule_expr: str = "", 
@@ -811,24 +1002,22 @@ class BacktestEngine:
 
         # 收集调试数据（如果有基于规则的策略）
         debug_data = {}
-        print(f"[DEBUG] 收集调试数据 - 总策略数: {len(self.strategies)}")
+        logger.debug("收集调试数据 - 总策略数: %d", len(self.strategies))
 
         for strategy in self.strategies:
             strategy_name = strategy.name if hasattr(strategy, 'name') else 'unknown'
             strategy_type = type(strategy).__name__
 
-            print(f"[DEBUG] 检查策略: {strategy_name} ({strategy_type})")
 
-            if hasattr(strategy, 'debug_data'):
-                if strategy.debug_data is not None:
-                    debug_data[strategy_name] = strategy.debug_data
-                    print(f"[DEBUG] ✓ 找到debug_data: {strategy_name}, 列数: {len(strategy.debug_data.columns)}")
-                else:
-                    print(f"[DEBUG] ✗ debug_data为None: {strategy_name}")
+            # 调试数据在此一次性组装（回测过程中不复制DataFrame）
+            strategy_debug_data = strategy.get_debug_data() if hasattr(strategy, 'get_debug_data') else None
+            if strategy_debug_data is not None:
+                debug_data[strategy_name] = strategy_debug_data
+                logger.debug("找到debug_data: %s, 列数: %d", strategy_name, len(strategy_debug_data.columns))
             else:
-                print(f"[DEBUG] ✗ 无debug_data属性: {strategy_name} ({strategy_type})")
+                logger.debug("无debug_data: %s (%s)", strategy_name, strategy_type)
 
-        print(f"[DEBUG] 最终收集到的debug_data数量: {len(debug_data)}")
+        logger.debug("最终收集到的debug_data数量: %d", len(debug_data))
 
         # 准备价格数据（包含信号信息）
         price_data = self.data.copy() if hasattr(self, 'data') and not self.data.empty else None
@@ -871,15 +1060,33 @@ class BacktestEngine:
             "performance_metrics": performance_metrics,
             "debug_data": debug_data,  # 添加调试数据
             "price_data": price_data,  # 添加价格数据
-            "signals": signals_data    # 添加信号数据
+            "signals": signals_data,   # 添加信号数据
+            "perf": self._perf_report(self.strategies)  # 性能剖析结果（未启用时为None）
         }
 
-    def _calculate_win_rate(self) -> float:
-        """计算交易胜率"""
-        if not self.trades:
+    def _record_parser_counters(self, strategies: List[Any]):
+        """把策略规则解析器的求值和缓存统计写入性能剖析计数器"""
+        if not self.profiler.enabled:
+            return
+        parsers = [strategy.parser for strategy in strategies if hasattr(strategy, 'parser')]
+        for name in ('rule_evaluations', 'series_evaluations', 'cache_hits', 'cache_misses'):
+            self.profiler.set_counter(name, sum(getattr(parser, name, 0) for parser in parsers))
+
+    def _perf_report(self, strategies: List[Any]) -> Optional[Dict[str, Any]]:
+        """生成性能剖析结果（未启用时为None）"""
+        self._record_parser_counters(strategies)
+        return self.profiler.report()
+
+    def _calculate_win_rate(self, trades: Optional[List[Dict]] = None) -> float:
+        """计算交易胜率
+        Args:
+            trades: 交易记录，默认为引擎的全部交易记录
+        """
+        trades = self.trades if trades is None else trades
+        if not trades:
             return 0.0
-        winning_trades = len([t for t in self.trades if t.get('profit', 0) > 0])
-        return winning_trades / len(self.trades) if self.trades else 0.0
+        winning_trades = len([t for t in trades if t.get('profit', 0) > 0])
+        return winning_trades / len(trades)
 
     def _calculate_max_drawdown(self) -> float:
         """计算最大回撤"""
@@ -893,17 +1100,9 @@ class BacktestEngine:
         """回测系统初始化（首个交易日执行）"""
         logger.info("回测系统初始化开始")
         
-        # 1. 预计算指标数据
-        if hasattr(self.indicator_service, 'calculate_indicators'):
-            # TODO
-            pass
-            # self.indicator_service.calculate_indicators(self.data)
-        
-        # 2. 初始化所有注册策略
+        # 1. 预计算指标数据 2. 初始化所有注册策略
         for strategy in self.strategies:
-            if hasattr(strategy, 'initialize'):
-                strategy.initialize(self.data)
-            # logger.info(f"策略初始化完成: {strategy.strategy_id}")
+            self._initialize_strategy(strategy, self.data)
         
         # 3. 设置仓位管理策略
         # if not self.position_strategy:
@@ -916,6 +1115,25 @@ class BacktestEngine:
         self.errors = []
         logger.info("回测系统初始化完成")
         
+    def _initialize_strategy(self, strategy, data: pd.DataFrame):
+        """回测开始前初始化单个策略"""
+        # 预计算指标数据（按策略规则中引用的指标整列计算并缓存）
+        if hasattr(strategy, 'precompute_indicators'):
+            with self.profiler.stage('indicators'):
+                count = strategy.precompute_indicators()
+            logger.info(f"策略 {getattr(strategy, 'name', '未命名')} 预计算指标: {count}个")
+
+        if hasattr(strategy, 'initialize'):
+            strategy.initialize(data)
+        if hasattr(strategy, 'debug_capture'):
+            # 按配置重建调试数据采集器
+            strategy.debug_capture = DebugCapture(
+                self.config.debug_mode,
+                self.config.debug_sample_interval,
+                self.config.debug_buffer_size
+            )
+        # logger.info(f"策略初始化完成: {strategy.strategy_id}")
+
     def _update_equity(self, market_data):
         """更新净值记录"""
         # 确保数值类型正确
@@ -963,28 +1181,31 @@ class BacktestEngine:
         if not self.event_queue:
             return
 
-        logger.debug(f"处理事件队列，当前队列长度: {len(self.event_queue)}")
+        if self._log_debug:
+            logger.debug("处理事件队列，当前队列长度: %d", len(self.event_queue))
 
         # 处理队列中的所有事件
         while self.event_queue:
-            event = self.event_queue.pop(0)
-            handler = self.handlers.get(type(event))
+            event = self.event_queue.popleft()
+            handler = self._resolve_handler(type(event))
 
             if handler:
                 try:
                     # 只跳过StrategySignalEvent，允许OrderEvent被处理
                     if isinstance(event, StrategySignalEvent):
-                        logger.debug(f"跳过直接处理的事件类型: {type(event).__name__}")
+                        if self._log_debug:
+                            logger.debug("跳过直接处理的事件类型: %s", type(event).__name__)
                         continue
 
                     # 处理其他类型的事件（包括OrderEvent）
                     handler(event)
-                    logger.debug(f"成功处理事件: {type(event).__name__}")
+                    if self._log_debug:
+                        logger.debug("成功处理事件: %s", type(event).__name__)
 
                 except Exception as e:
                     self.log_error(f"处理事件失败: {type(event).__name__} - {str(e)}")
             else:
-                logger.warning(f"未找到事件处理器: {type(event).__name__}")
+                logger.warning("未找到事件处理器: %s", type(event).__name__)
 
     def _handle_fill_event(self, event: FillEvent):
         """处理成交回报事件，使用PortfolioManager更新资金和持仓"""
@@ -1029,6 +1250,7 @@ class BacktestEngine:
                 'positions_value_after': self.portfolio_manager.get_portfolio_value() - self.portfolio_manager.get_cash_balance()
             }
             self.trades.append(trade_record)
+            self.profiler.count('fills')
             
             
         except Exception as e:
@@ -1050,75 +1272,44 @@ class BacktestEngine:
             self.run(start_date, end_date)
             return self.get_results()
 
+        if self.config.portfolio_mode == "shared":
+            with self.profiler.session():
+                results = self._run_shared_portfolio()
+            # 规则解析器计数器已在汇总结果时写入，剖析会话结束后生成报告
+            results["perf"] = self.profiler.report()
+            return results
+
         # 多符号模式
         all_results = {}
         individual_results = {}
 
-        # 为每个符号运行单独的回测
-        for symbol, data in self.data_dict.items():
-            logger.info(f"Running backtest for symbol: {symbol}")
-
-            # 为每个符号创建单独的配置
-            symbol_config = BacktestConfig(
-                start_date=self.config.start_date,
-                end_date=self.config.end_date,
-                target_symbol=symbol,
-                frequency=self.config.frequency,
-                initial_capital=self.config.initial_capital / len(self.data_dict),  # 平均分配资金
-                commission_rate=self.config.commission_rate,
-                position_strategy_type=self.config.position_strategy_type,
-                position_strategy_params=self.config.position_strategy_params
-            )
-
-            # 创建并运行单独的引擎
-            symbol_engine = BacktestEngine(symbol_config, data)
-
-            # 为每个符号创建新的策略实例（根据策略映射）
-            for strategy in self.strategies:
-                # 获取该股票的策略配置
-                symbol_strategy_config = self.config.get_strategy_for_symbol(symbol)
-
-                # 创建策略副本或新实例
-                if hasattr(strategy, 'name') and hasattr(strategy, 'buy_rule_expr'):
-                    # 对于RuleBasedStrategy类型的策略，重新创建实例
-                    # 确保指标服务不为None
-                    indicator_service = getattr(strategy, 'indicator_service', None)
-                    if indicator_service is None:
-                        from src.core.strategy.indicators import IndicatorService
-                        indicator_service = IndicatorService()
-
-                    # 使用策略映射中的规则表达式（如果存在），否则使用原策略的规则
-                    buy_rule = symbol_strategy_config.get('buy_rule', getattr(strategy, 'buy_rule_expr', ''))
-                    sell_rule = symbol_strategy_config.get('sell_rule', getattr(strategy, 'sell_rule_expr', ''))
-                    open_rule = symbol_strategy_config.get('open_rule', getattr(strategy, 'open_rule_expr', ''))
-                    close_rule = symbol_strategy_config.get('close_rule', getattr(strategy, 'close_rule_expr', ''))
-
-                    symbol_strategy = RuleBasedStrategy(
-                        Data=data,  # 使用当前符号的数据
-                        name=f"{getattr(strategy, 'name', 'Unknown')}_{symbol}",
-                        indicator_service=indicator_service,
-                        buy_rule_expr=buy_rule,
-                        sell_rule_expr=sell_rule,
-                        open_rule_expr=open_rule,
-                        close_rule_expr=close_rule,
-                        portfolio_manager=getattr(strategy, 'portfolio_manager', None)
-                    )
-                else:
-                    # 对于其他类型的策略，使用原策略
-                    symbol_strategy = strategy
-                symbol_engine.register_strategy(symbol_strategy)
-
-            # 运行回测
-            symbol_engine.run(start_date, end_date)
+        jobs = [self._build_symbol_job(symbol, data, start_date, end_date)
+                for symbol, data in self.data_dict.items()]
+        workers = min(self.config.parallel_workers, len(jobs))
+        if workers > 1 and not self._jobs_picklable(jobs):
+            logger.warning("存在无法序列化的策略，多标的回测改为顺序执行")
+            workers = 1
+
+        if workers > 1:
+            # 各标的引擎之间不共享状态，按进程并行执行（map保持标的顺序）
+            logger.info(f"并行执行多标的回测: {len(jobs)}个标的, {workers}个进程")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outputs = list(executor.map(_run_symbol_job, jobs))
+        else:
+            outputs = []
+            for job in jobs:
+                # 顺序执行时共享原策略的指标服务（按数据指纹缓存，不同标的互不干扰）
+                outputs.append(_run_symbol_job(job, self._shared_indicator_service()))
 
+        for job, output in zip(jobs, outputs):
             # 存储单个符号的结果
-            individual_results[symbol] = symbol_engine.get_results()
+            individual_results[job['symbol']] = output['results']
 
             # 合并交易记录
-            self.trades.extend(symbol_engine.trades)
+            self.trades.extend(output['trades'])
 
             # 合并错误
-            self.errors.extend(symbol_engine.errors)
+            self.errors.extend(output['errors'])
 
         # 创建组合结果
         all_results["individual"] = individual_results
@@ -1159,10 +1350,225 @@ class BacktestEngine:
         # 添加策略映射信息到结果中
         all_results["strategy_mapping"] = self.config.strategy_mapping
         all_results["default_strategy"] = self.config.default_strategy
+        all_results["perf"] = BacktestProfiler.merge(results.get("perf") for results in individual_results.values())
+
+        self.results = all_results
+        return all_results
+
+    def _run_shared_portfolio(self) -> Dict[str, Any]:
+        """共享资金的多标的回测
+
+        所有标的共用引擎自身的PortfolioManager和全部初始资金，在合并时间轴上按(时间, 标的)顺序统一调度策略；
+        每个时间点处理完所有标的后，用标的×时间价格矩阵（向前填充）重估持仓市值并记录一次组合净值。
+        hybrid模式下各标的只在信号K线上调度策略。
+        Returns:
+            组合结果（individual为各标的的交易和盈亏归因，combined_equity为各标的持仓市值、现金和组合总净值）
+        """
+        symbols = list(self.data_dict)
+        indicator_service = self._shared_indicator_service()
+        cursors: Dict[str, BarCursor] = {}
+        symbol_strategies: Dict[str, List[Any]] = {}
+        active: Dict[str, Optional[np.ndarray]] = {}
+        for symbol in symbols:
+            data = self.data_dict[symbol]
+            with self.profiler.stage('prepare_data'):
+                self._prepare_data(data)
+                cursors[symbol] = BarCursor(data)
+            strategies = [
+                _create_symbol_strategy(spec, data, indicator_service, self.portfolio_manager)
+                for spec in self._symbol_strategy_specs(symbol)
+            ]
+            for strategy in strategies:
+                self._initialize_strategy(strategy, data)
+            symbol_strategies[symbol] = strategies
+
+            active[symbol] = None
+            if self.config.execution_mode == "hybrid":
+                self._bind_symbol(data, cursors[symbol])
+                active[symbol] = self._get_active_bars(strategies)
+                if active[symbol] is not None and len(active[symbol]):
+                    active[symbol][-1] = True
+
+        timeline = MarketTimeline({symbol: cursors[symbol].times for symbol in symbols})
+        closes = timeline.price_matrix({symbol: cursors[symbol].column('close') for symbol in symbols})
+        logger.info(f"共享资金回测: {len(symbols)}个标的, {len(timeline)}个时间点")
+
+        self.trades = []
+        self.errors = []
+        trade_steps = []  # 每笔交易对应的(标的行号, 时间轴位置)
+        for step, bars in timeline.iter_steps():
+            for row, idx in bars:
+                symbol = timeline.symbols[row]
+                mask = active[symbol]
+                if mask is not None and not mask[idx]:
+                    continue
+                self._bind_symbol(self.data_dict[symbol], cursors[symbol])
+                trade_count = len(self.trades)
+                self._dispatch_bar(idx, symbol_strategies[symbol])
+                trade_steps.extend([(row, step)] * (len(self.trades) - trade_count))
+
+            # 按当前时间点的价格重估持仓并记录组合净值
+            with self.profiler.stage('equity'):
+                prices = closes[:, step]
+                self.portfolio_manager.mark_to_market({
+                    symbol: prices[timeline.rows[symbol]] for symbol in self.portfolio_manager.positions
+                })
+                self.portfolio_manager.record_equity_history(timeline.times[step])
+
+        for cursor in cursors.values():
+            cursor.flush()
+
+        return self._collect_shared_results(timeline, closes, trade_steps, symbol_strategies)
+
+    def _bind_symbol(self, data: pd.DataFrame, cursor: BarCursor):
+        """切换引擎当前处理的标的数据和K线游标"""
+        self.data = data
+        self.bar_cursor = cursor
+        self.update_rule_parser_data()
+
+    def _collect_shared_results(self, timeline: MarketTimeline, closes: np.ndarray,
+                                trade_steps: List[tuple], symbol_strategies: Dict[str, List[Any]]) -> Dict[str, Any]:
+        """汇总共享资金回测结果
+        各标的持仓数量按成交记录在时间轴上累加得到标的×时间的持仓矩阵，与价格矩阵相乘得到各标的持仓市值。
+        """
+        signed = np.array([
+            trade['quantity'] if trade['direction'] == 'BUY' else -trade['quantity'] for trade in self.trades
+        ], dtype=float)
+        prices = np.array([trade['price'] for trade in self.trades], dtype=float)
+        rows = np.array([row for row, _ in trade_steps], dtype=np.int64)
+        steps = np.array([step for _, step in trade_steps], dtype=np.int64)
+
+        quantities = np.zeros(closes.shape)
+        np.add.at(quantities, (rows, steps), signed)
+        np.cumsum(quantities, axis=1, out=quantities)
+        values = quantities * np.nan_to_num(closes)
+
+        equity_history = self.portfolio_manager.get_equity_history()
+        combined_equity = pd.DataFrame(values.T, columns=timeline.symbols)
+        combined_equity.insert(0, 'timestamp', timeline.times)
+        combined_equity['cash'] = [record['cash'] for record in equity_history]
+        combined_equity['total_value'] = combined_equity['cash'] + values.sum(axis=0)
+
+        # 各标的盈亏归因：成交现金流 + 期末持仓市值
+        cash_flows = np.zeros(len(timeline.symbols))
+        np.add.at(cash_flows, rows, -signed * prices)
+        individual_results = {}
+        all_debug_data = {}
+        for row, symbol in enumerate(timeline.symbols):
+            symbol_trades = [trade for trade in self.trades if trade['symbol'] == symbol]
+            symbol_capital = self.config.get_symbol_capital(symbol)
+            final_capital = symbol_capital + cash_flows[row] + values[row, -1] if values.size else symbol_capital
+            debug_data = {}
+            for strategy in symbol_strategies[symbol]:
+                strategy_debug_data = strategy.get_debug_data() if hasattr(strategy, 'get_debug_data') else None
+                if strategy_debug_data is not None:
+                    debug_data[strategy.name] = strategy_debug_data
+                    all_debug_data[f"{symbol}_{strategy.name}"] = strategy_debug_data
+            individual_results[symbol] = {
+                "summary": {
+                    "initial_capital": symbol_capital,
+                    "final_capital": final_capital,
+                    "total_trades": len(symbol_trades),
+                    "win_rate": self._calculate_win_rate(symbol_trades),
+                },
+                "trades": symbol_trades,
+                "debug_data": debug_data,
+                "price_data": self.data_dict[symbol].copy(),
+            }
 
+        all_results = {
+            "individual": individual_results,
+            "trades": self.trades,
+            "errors": self.errors,
+            "combined_equity": combined_equity,
+            "equity_records": equity_history,
+            "performance_metrics": self.portfolio_manager.get_performance_metrics(),
+            "strategy_mapping": self.config.strategy_mapping,
+            "default_strategy": self.config.default_strategy,
+        }
+        if all_debug_data:
+            all_results["debug_data"] = all_debug_data
+        self._record_parser_counters([strategy for strategies in symbol_strategies.values() for strategy in strategies])
         self.results = all_results
         return all_results
 
+    def _build_symbol_job(self, symbol: str, data: pd.DataFrame,
+                          start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        """构建单个标的的回测任务（可序列化，供子进程执行）
+        Args:
+            symbol: 标的代码
+            data: 该标的的行情数据
+            start_date: 回测开始时间
+            end_date: 回测结束时间
+        Returns:
+            任务字典：配置、数据和策略描述（规则策略只传递规则表达式，其他策略传递实例本身）
+        """
+        # 为每个符号创建单独的配置
+        symbol_config = BacktestConfig(
+            start_date=self.config.start_date,
+            end_date=self.config.end_date,
+            target_symbol=symbol,
+            frequency=self.config.frequency,
+            initial_capital=self.config.initial_capital / len(self.data_dict),  # 平均分配资金
+            commission_rate=self.config.commission_rate,
+            position_strategy_type=self.config.position_strategy_type,
+            position_strategy_params=self.config.position_strategy_params,
+            execution_mode=self.config.execution_mode,
+            debug_mode=self.config.debug_mode,
+            debug_sample_interval=self.config.debug_sample_interval,
+            debug_buffer_size=self.config.debug_buffer_size,
+            profile_mode=self.config.profile_mode
+        )
+
+        return {
+            'symbol': symbol,
+            'config': symbol_config,
+            'data': data,
+            'strategies': self._symbol_strategy_specs(symbol),
+            'start_date': start_date,
+            'end_date': end_date,
+        }
+
+    def _symbol_strategy_specs(self, symbol: str) -> List[Any]:
+        """按策略映射生成指定标的的策略描述（规则策略为规则表达式字典，其他策略为实例本身）"""
+        # 获取该股票的策略配置
+        symbol_strategy_config = self.config.get_strategy_for_symbol(symbol)
+        strategies = []
+        for strategy in self.strategies:
+            if hasattr(strategy, 'name') and hasattr(strategy, 'buy_rule_expr'):
+                # 对于RuleBasedStrategy类型的策略，在任务中重新创建实例
+                # 使用策略映射中的规则表达式（如果存在），否则使用原策略的规则
+                strategies.append({
+                    'name': f"{getattr(strategy, 'name', 'Unknown')}_{symbol}",
+                    'buy_rule': symbol_strategy_config.get('buy_rule', getattr(strategy, 'buy_rule_expr', '')),
+                    'sell_rule': symbol_strategy_config.get('sell_rule', getattr(strategy, 'sell_rule_expr', '')),
+                    'open_rule': symbol_strategy_config.get('open_rule', getattr(strategy, 'open_rule_expr', '')),
+                    'close_rule': symbol_strategy_config.get('close_rule', getattr(strategy, 'close_rule_expr', '')),
+                })
+            else:
+                # 对于其他类型的策略，使用原策略
+                strategies.append(strategy)
+        return strategies
+
+    @staticmethod
+    def _jobs_picklable(jobs: List[Dict[str, Any]]) -> bool:
+        """检查任务中的非规则策略实例能否序列化到子进程"""
+        try:
+            for strategy in jobs[0]['strategies']:
+                if not isinstance(strategy, dict):
+                    pickle.dumps(strategy)
+        except Exception:
+            return False
+        return True
+
+    def _shared_indicator_service(self) -> IndicatorService:
+        """顺序执行多标的回测时共享的指标服务（优先使用原策略的指标服务）"""
+        for strategy in self.strategies:
+            indicator_service = getattr(strategy, 'indicator_service', None)
+            if indicator_service is not None:
+                return indicator_service
+        return self.indicator_service
+
     def _create_hedge_order(self, event: StrategySignalEvent):
         """创建对冲订单"""
         # 对冲逻辑实现 - 创建反向仓位
@@ -1238,3 +1644,101 @@ class BacktestEngine:
                 
         except Exception as e:
             self.log_error(f"创建再平衡订单失败: {str(e)}")
+
+
+def _run_symbol_job(job: Dict[str, Any], indicator_service: Optional[IndicatorService] = None) -> Dict[str, Any]:
+    """执行单个标的的回测任务（模块级函数，可在子进程中执行）
+    Args:
+        job: BacktestEngine._build_symbol_job构建的任务
+        indicator_service: 指标服务，None时创建新实例
+    Returns:
+        该标的的回测结果、交易记录和错误
+    """
+    logger.info(f"Running backtest for symbol: {job['symbol']}")
+    if indicator_service is None:
+        indicator_service = IndicatorService()
+
+    # 创建并运行单独的引擎
+    symbol_engine = BacktestEngine(job['config'], job['data'])
+    for spec in job['strategies']:
+        # 规则策略绑定该标的引擎自己的投资组合（COST/POSITION等变量按标的独立计算）
+        symbol_engine.register_strategy(
+            _create_symbol_strategy(spec, job['data'], indicator_service, symbol_engine.portfolio_manager)
+        )
+
+    # 运行回测
+    symbol_engine.run(job['start_date'], job['end_date'])
+    return {
+        'results': symbol_engine.get_results(),
+        'trades': symbol_engine.trades,
+        'errors': symbol_engine.errors,
+    }
+
+
+def _create_symbol_strategy(spec: Any, data: pd.DataFrame, indicator_service: IndicatorService,
+                            portfolio_manager: PortfolioManager):
+    """根据策略描述创建标的策略实例
+    Args:
+        spec: BacktestEngine._symbol_strategy_specs生成的策略描述
+        data: 该标的的行情数据
+        indicator_service: 指标服务
+        portfolio_manager: 规则中COST/POSITION等变量使用的投资组合
+    Returns:
+        规则策略新实例，非规则策略直接返回原实例
+    """
+    if not isinstance(spec, dict):
+        return spec
+    return RuleBasedStrategy(
+        Data=data,  # 使用当前符号的数据
+        name=spec['name'],
+        indicator_service=indicator_service,
+        buy_rule_expr=spec['buy_rule'],
+        sell_rule_expr=spec['sell_rule'],
+        open_rule_expr=spec['open_rule'],
+        close_rule_expr=spec['close_rule'],
+        portfolio_manager=portfolio_manager
+    )
+
+
+def run_rule_backtest(config: BacktestConfig, data, rules: Dict[str, str],
+                      indicator_service: Optional[IndicatorService] = None,
+                      db_manager: Optional[Any] = None,
+                      profiler: Optional[BacktestProfiler] = None,
+                      strategy_name: str = 'headless',
+                      bar_range: Optional[Tuple[int, int]] = None,
+                      debug_mode: Optional[str] = None) -> Dict[str, Any]:
+    """无界面执行规则策略回测（不依赖Streamlit会话状态，可在子进程、批处理任务和命令行中调用）
+    Args:
+        config: 回测配置（回测区间取config.start_date/end_date）
+        data: 行情数据（单标的DataFrame或{标的: DataFrame}）
+        rules: 规则表达式 {open_rule/close_rule/buy_rule/sell_rule: 表达式}，
+            多标的时config.strategy_mapping中的规则优先
+        indicator_service: 指标服务，None时创建新实例
+        db_manager: 订单持久化（DatabaseManager或接口兼容的对象），默认None不落库
+        profiler: 性能剖析器，默认按config.profile_mode创建
+        strategy_name: 策略名称
+        bar_range: 只在[start, end)位置的K线上执行回测（仅单标的），默认全部K线
+        debug_mode: 覆盖config.debug_mode（如批量回测时传'off'），默认沿用配置
+    Returns:
+        回测结果（同BacktestEngine.get_results，多标的时为组合结果）
+    Raises:
+        ValueError: 多标的回测指定了bar_range
+    """
+    if debug_mode is not None:
+        config = replace(config, debug_mode=debug_mode)
+    engine = BacktestEngine(config, data, profiler=profiler, db_manager=db_manager)
+    engine.register_strategy(RuleBasedStrategy(
+        engine.data, strategy_name, indicator_service if indicator_service is not None else IndicatorService(),
+        buy_rule_expr=rules.get('buy_rule', ''),
+        sell_rule_expr=rules.get('sell_rule', ''),
+        open_rule_expr=rules.get('open_rule', ''),
+        close_rule_expr=rules.get('close_rule', ''),
+        portfolio_manager=engine.portfolio_manager,
+    ))
+    start_date, end_date = pd.to_datetime(config.start_date), pd.to_datetime(config.end_date)
+    if engine.multi_symbol_mode:
+        if bar_range is not None:
+            raise ValueError("多标的回测不支持bar_range")
+        return engine.run_multi_symbol(start_date, end_date)
+    engine.run(start_date, end_date, bar_range=bar_range)
+    return engine.get_results()
@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+class BarCursor:
+    """K线列式游标
+
+    回测开始时把行情列一次性提取为连续的NumPy数组，逐K线循环中通过位置O(1)读取标量，
+    避免每根K线都经过pandas的iloc/loc索引。对DataFrame的写入（如signal列）先缓存在数组中，
+    回测结束时调用flush()一次性写回。
+    """
+
+    PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, data: pd.DataFrame, time_column: str = 'combined_time'):
+        """
+        Args:
+            data: 行情数据DataFrame（按位置索引）
+            time_column: 时间列名
+        """
+        self.data = data
+        self.length = len(data)
+        self.index = 0
+        self._columns: Dict[str, np.ndarray] = {}
+        self._pending_writes: Dict[str, np.ndarray] = {}
+
+        for column in self.PRICE_COLUMNS:
+            if column in data.columns:
+                self._columns[column] = data[column].to_numpy()
+        # 时间和代码保留为Python对象列表（pd.Timestamp/str），与DataFrame逐行读取的类型一致
+        self.times: List[Any] = data[time_column].tolist() if time_column in data.columns else [None] * self.length
+        self.codes: List[Any] = data['code'].tolist() if 'code' in data.columns else [None] * self.length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def move_to(self, index: int):
+        """移动游标到指定K线位置"""
+        self.index = index
+
+    def column(self, name: str) -> Optional[np.ndarray]:
+        """获取列的NumPy数组视图，首次访问时提取；列不存在时返回None"""
+        values = self._pending_writes.get(name)
+        if values is None:
+            values = self._columns.get(name)
+        if values is None:
+            if name not in self.data.columns:
+                return None
+            values = self._columns[name] = self.data[name].to_numpy()
+        return values
+
+    def value(self, name: str, index: Optional[int] = None) -> Any:
+        """读取指定列在某根K线（默认当前K线）上的值
+        Raises:
+            KeyError: 列不存在
+        """
+        values = self.column(name)
+        if values is None:
+            raise KeyError(name)
+        return values[self.index if index is None else index]
+
+    @property
+    def time(self) -> Any:
+        """当前K线时间"""
+        return self.times[self.index]
+
+    @property
+    def close(self) -> Any:
+        """当前K线收盘价"""
+        return self._columns['close'][self.index]
+
+    @property
+    def code(self) -> Any:
+        """当前K线标的代码"""
+        return self.codes[self.index]
+
+    def set_value(self, name: str, index: int, value: Any):
+        """写入单个值（延迟到flush时写回DataFrame）"""
+        values = self._pending_writes.get(name)
+        if values is None:
+            if name in self.data.columns:
+                values = self.data[name].to_numpy(copy=True)
+            else:
+                values = np.zeros(self.length, dtype=np.asarray(value).dtype)
+            self._pending_writes[name] = values
+        values[index] = value
+
+    def flush(self):
+        """将缓存的写入一次性写回DataFrame"""
+        for name, values in self._pending_writes.items():
+            self.data[name] = values
+            if name in self._columns:
+                self._columns[name] = values
+        self._pending_writes.clear()
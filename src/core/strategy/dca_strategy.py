@@ -1,9 +1,10 @@
 from abc import ABC, abstractmethod
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List
 from collections import deque
 from ..events import MarketEvent, ScheduleEvent
 from .strategy import BaseStrategy
+from ..data.trading_calendar import get_trading_calendar
 
 class DCABaseStrategy(BaseStrategy):
     """定投策略基类"""
@@ -31,11 +32,9 @@ class DCABaseStrategy(BaseStrategy):
                 current_date = current_date.replace(year=current_date.year+1, month=1)
         
     def adjust_for_holidays(self, date: datetime) -> datetime:
-        """调整非交易日"""
-        # 如果当天是周末，调整到下一个工作日
-        while date.weekday() >= 5:  # 5=Saturday, 6=Sunday
-            date += timedelta(days=1)
-        return date
+        """调整非交易日（周末和法定节假日顺延到下一个交易日）"""
+        trading_day = get_trading_calendar().next_trading_day(date)
+        return datetime.combine(trading_day, date.time())
         
     def calculate_order_amount(self, price: float) -> float:
         """计算订单金额"""
@@ -0,0 +1,100 @@
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from src.core.strategy.expression_store import ExpressionStore
+
+
+class DebugCapture:
+    """规则策略调试数据采集
+
+    支持三种模式：
+        - off: 不采集调试数据
+        - snapshot: 回测结束时对数据做一次快照（包含规则生成的全部中间列）
+        - sampled: 按间隔采样K线，把规则中间列的值写入预分配的环形缓冲区，只保留最近buffer_size个采样点
+
+    逐K线循环中不再复制DataFrame，调试数据在collect()时由行情数据和表达式列存储一次性组装。
+    """
+
+    MODES = ("off", "snapshot", "sampled")
+
+    def __init__(self, mode: str = "snapshot", sample_interval: int = 1, buffer_size: int = 500):
+        """
+        Args:
+            mode: 采集模式（off/snapshot/sampled）
+            sample_interval: sampled模式下的采样间隔（每隔多少根K线采样一次）
+            buffer_size: sampled模式下环形缓冲区容量（采样点个数）
+        Raises:
+            ValueError: 参数无效
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"调试数据模式必须是{'/'.join(self.MODES)}之一: {mode}")
+        if sample_interval < 1:
+            raise ValueError("调试数据采样间隔必须大于0")
+        if buffer_size < 1:
+            raise ValueError("调试数据缓冲区容量必须大于0")
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self.buffer_size = buffer_size
+        self.reset()
+
+    def reset(self):
+        """清空已采集的数据"""
+        self._rows = np.full(self.buffer_size, -1, dtype=np.int64)  # 各槽位对应的K线位置
+        self._buffers: Dict[str, np.ndarray] = {}  # 中间列名 -> 预分配数组
+        self._count = 0  # 累计采样次数
+        self._result: Optional[pd.DataFrame] = None
+
+    def capture(self, store: ExpressionStore, index: int):
+        """记录一根K线的规则中间列（仅sampled模式生效）
+        Args:
+            store: 规则解析器的表达式列存储
+            index: K线位置
+        """
+        if self.mode != "sampled" or index % self.sample_interval:
+            return
+        slot = self._count % self.buffer_size
+        self._rows[slot] = index
+        for column, values in store.items():
+            buffer = self._buffers.get(column)
+            if buffer is None:
+                buffer = self._buffers[column] = self._allocate(values.dtype)
+            buffer[slot] = values[index]
+        self._count += 1
+        self._result = None
+
+    def _allocate(self, dtype) -> np.ndarray:
+        """按列类型预分配缓冲区"""
+        if dtype == bool:
+            return np.zeros(self.buffer_size, dtype=bool)
+        if np.issubdtype(dtype, np.number):
+            return np.full(self.buffer_size, np.nan, dtype=np.float64)
+        return np.full(self.buffer_size, None, dtype=object)
+
+    def collect(self, data: pd.DataFrame, store: ExpressionStore) -> Optional[pd.DataFrame]:
+        """组装调试数据（结果缓存到下次reset/capture）
+        Args:
+            data: 回测行情数据
+            store: 规则解析器的表达式列存储
+        Returns:
+            调试数据DataFrame，off模式返回None
+        """
+        if self.mode == "off":
+            return None
+        if self._result is None:
+            if self.mode == "snapshot":
+                self._result = store.materialize(data)
+            else:
+                self._result = self._collect_samples(data)
+        return self._result
+
+    def _collect_samples(self, data: pd.DataFrame) -> pd.DataFrame:
+        """按时间顺序拼接环形缓冲区中的采样点"""
+        size = min(self._count, self.buffer_size)
+        start = self._count % self.buffer_size if self._count > self.buffer_size else 0
+        slots = (np.arange(size) + start) % self.buffer_size
+        rows = self._rows[slots]
+
+        result = data.iloc[rows].copy()
+        for column, buffer in self._buffers.items():
+            result[column] = buffer[slots]
+        return result
@@ -0,0 +1,104 @@
+from typing import Any, Dict, ItemsView, Iterator, Optional
+import numpy as np
+import pandas as pd
+
+
+class ExpressionStore:
+    """规则中间结果的列式存储
+
+    每个表达式列是一段预分配的NumPy数组（列名 -> 数组），规则编译时登记并分配，
+    逐K线求值时直接按位置写入。只有在需要结果或调试视图时才与行情数据合并为DataFrame，
+    避免逐列扩展DataFrame带来的块合并和单元格慢路径写入。
+    """
+
+    FILL_VALUES = {
+        np.dtype(bool): False,
+        np.dtype(float): np.nan,
+        np.dtype(object): None,
+    }
+
+    def __init__(self, length: int = 0):
+        """
+        Args:
+            length: 数据长度（每列数组的长度）
+        """
+        self.length = length
+        self._dtypes: Dict[str, np.dtype] = {}  # 已登记的列及其类型（重新绑定数据后保留）
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def items(self) -> ItemsView[str, np.ndarray]:
+        return self.columns.items()
+
+    def get(self, name: str) -> Optional[np.ndarray]:
+        """获取列数组，列未登记时返回None"""
+        return self.columns.get(name)
+
+    def _allocate(self, dtype: np.dtype) -> np.ndarray:
+        return np.full(self.length, self.FILL_VALUES.get(dtype, np.nan), dtype=dtype)
+
+    def reset(self, length: int):
+        """按新的数据长度重新分配所有已登记的列（清空已有结果）"""
+        self.length = length
+        self.columns = {name: self._allocate(dtype) for name, dtype in self._dtypes.items()}
+
+    def register(self, name: str, dtype=float) -> np.ndarray:
+        """登记并预分配表达式列（已存在时直接返回）
+        Args:
+            name: 列名（表达式字符串）
+            dtype: 列类型（bool/float/object）
+        """
+        values = self.columns.get(name)
+        if values is None:
+            dtype = np.dtype(dtype)
+            self._dtypes[name] = dtype
+            values = self.columns[name] = self._allocate(dtype)
+        return values
+
+    def set(self, name: str, index: int, value: Any, dtype=float):
+        """写入单个位置的结果（列未登记时按dtype分配）"""
+        values = self.columns.get(name)
+        if values is None:
+            values = self.register(name, dtype)
+        if 0 <= index < self.length:
+            values[index] = value
+
+    def set_column(self, name: str, values, dtype=float):
+        """整列写入结果"""
+        self.register(name, dtype)
+        self.columns[name] = np.broadcast_to(
+            np.asarray(values, dtype=self._dtypes[name]), (self.length,)
+        ).copy()
+
+    def clear(self):
+        """清除所有列（包括登记信息）"""
+        self._dtypes.clear()
+        self.columns.clear()
+
+    def materialize(self, data: pd.DataFrame) -> pd.DataFrame:
+        """将表达式列与行情数据合并为新的DataFrame
+        Args:
+            data: 行情数据（长度需与存储一致）
+        Returns:
+            包含原始列和所有表达式列的DataFrame副本，表达式列在attrs中保留"{列名}_expr"注释
+        """
+        frame = data.copy()
+        if not self.columns or len(data) != self.length:
+            return frame
+        expressions = pd.DataFrame(dict(self.columns), index=data.index)
+        frame = pd.concat(
+            [frame.drop(columns=[name for name in self.columns if name in frame.columns]), expressions],
+            axis=1
+        )
+        frame.attrs = dict(data.attrs)
+        for name in self.columns:
+            frame.attrs[f"{name}_expr"] = name
+        return frame
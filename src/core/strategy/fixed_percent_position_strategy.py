@@ -44,7 +44,7 @@ class FixedPercentPositionStrategy:
         计算目标仓位大小
 
         Args:
-            signal_type: 信号类型（OPEN, ADD, CLOSE, LIQUIDATE）
+            signal_type: 信号类型（OPEN, BUY, SELL, CLOSE, LIQUIDATE）
             portfolio_data: 投资组合数据
                 - initial_capital: 初始资金
                 - available_cash: 可用现金
@@ -70,10 +70,6 @@ class FixedPercentPositionStrategy:
                 return self._calculate_open_position_size(
                     portfolio_data['available_cash'], current_price, current_position
                 )
-            elif signal_type == SignalType.ADD:
-                return self._calculate_add_position_size(
-                    portfolio_data['available_cash'], current_price
-                )
             elif signal_type in [SignalType.BUY, SignalType.SELL]:
                 # 对于通用买卖信号，根据当前持仓状态决定操作
                 if current_position > 0:
@@ -124,7 +120,7 @@ class FixedPercentPositionStrategy:
             quantity = int(available_cash / current_price / self.min_lot_size) * self.min_lot_size
 
         if quantity > 0:
-            logger.debug(f"开仓计算: 可用资金={available_cash}, 价格={current_price}, 数量={quantity}")
+            logger.debug("开仓计算: 可用资金=%s, 价格=%s, 数量=%s", available_cash, current_price, quantity)
 
         return quantity
 
@@ -140,7 +136,7 @@ class FixedPercentPositionStrategy:
             additional_quantity = int(available_cash / current_price / self.min_lot_size) * self.min_lot_size
 
         if additional_quantity > 0:
-            logger.debug(f"加仓计算: 可用资金={available_cash}, 价格={current_price}, 数量={additional_quantity}")
+            logger.debug("加仓计算: 可用资金=%s, 价格=%s, 数量=%s", available_cash, current_price, additional_quantity)
 
         return additional_quantity
 
@@ -156,7 +152,7 @@ class FixedPercentPositionStrategy:
         sell_quantity = min(sell_quantity, current_position)
 
         if sell_quantity > 0:
-            logger.debug(f"平仓计算: 当前持仓={current_position}, 卖出数量={sell_quantity}")
+            logger.debug("平仓计算: 当前持仓=%s, 卖出数量=%s", current_position, sell_quantity)
 
         return sell_quantity
 
@@ -165,7 +161,7 @@ class FixedPercentPositionStrategy:
         liquidate_quantity = current_position if current_position > 0 else 0
 
         if liquidate_quantity > 0:
-            logger.debug(f"清仓计算: 当前持仓={current_position}, 清仓数量={liquidate_quantity}")
+            logger.debug("清仓计算: 当前持仓=%s, 清仓数量=%s", current_position, liquidate_quantity)
 
         return liquidate_quantity
 
@@ -0,0 +1,132 @@
+"""指标缓存：按数据指纹索引、按内存预算做LRU淘汰"""
+import hashlib
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+class SeriesFingerprinter:
+    """序列数据指纹（长度 + 内容哈希）
+
+    内容相同的序列指纹相同，与来自哪个DataFrame无关，因此不同标的、不同频率或不同日期区间的数据
+    只要内容不同就不会互相命中，重复回测同一份数据则可以复用已计算的指标。
+    同一底层数组的哈希只计算一次（弱引用校验数组仍存活，避免内存地址复用导致误命中）；
+    原地修改数据后需调用forget()使其重新计算。
+    """
+
+    def __init__(self):
+        # (数组地址, 长度, 步长) -> (底层数组弱引用, 指纹)
+        self._memo: Dict[Tuple, Tuple[Any, Tuple]] = {}
+
+    @staticmethod
+    def _locate(series: pd.Series) -> Tuple[np.ndarray, np.ndarray, Tuple]:
+        values = series.to_numpy()
+        base = values
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        key = (values.__array_interface__['data'][0], len(values), values.strides)
+        return values, base, key
+
+    def fingerprint(self, series: pd.Series) -> Tuple:
+        """获取序列指纹"""
+        values, base, key = self._locate(series)
+        entry = self._memo.get(key)
+        if entry is not None and entry[0]() is base:
+            return entry[1]
+
+        contiguous = np.ascontiguousarray(values, dtype=float)
+        fingerprint = (len(values), hashlib.blake2b(contiguous.tobytes(), digest_size=16).hexdigest())
+        try:
+            self._memo[key] = (weakref.ref(base), fingerprint)
+        except TypeError:
+            pass  # 不支持弱引用的数组不做记忆
+        return fingerprint
+
+    def forget(self, series: pd.Series) -> Optional[Tuple]:
+        """移除序列的指纹记忆，返回原指纹（未记忆时为None）"""
+        _, base, key = self._locate(series)
+        entry = self._memo.pop(key, None)
+        if entry is None or entry[0]() is not base:
+            return None
+        return entry[1]
+
+    def clear(self):
+        self._memo.clear()
+
+
+class IndicatorCache:
+    """按内存预算做LRU淘汰的指标缓存，记录命中/未命中统计"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes: 缓存内存预算（字节），超出时淘汰最久未使用的条目
+        Raises:
+            ValueError: 内存预算无效
+        """
+        if max_bytes <= 0:
+            raise ValueError("指标缓存内存预算必须大于0")
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def keys(self):
+        return list(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取缓存条目（命中时标记为最近使用）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, entry: Any, nbytes: int):
+        """加入缓存条目，超出内存预算时按LRU淘汰（至少保留刚加入的条目）"""
+        if key in self._entries:
+            self.remove(key)
+        self._entries[key] = entry
+        self._sizes[key] = nbytes
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self.remove(oldest)
+            self.evictions += 1
+
+    def remove(self, key: Hashable):
+        """移除缓存条目"""
+        del self._entries[key]
+        self.nbytes -= self._sizes.pop(key)
+
+    def clear(self):
+        """清空缓存（保留统计）"""
+        self._entries.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
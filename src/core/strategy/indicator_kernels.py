@@ -0,0 +1,173 @@
+"""指标计算内核
+
+每个内核绑定一列输入数据和一组参数，首次请求时用pandas/NumPy向量化计算整列结果并保存在outputs数组中，
+之后任意位置的查询（包括REF回看历史位置）都是数组读取。
+各内核在数据不足时返回的安全值与原逐点实现一致。
+"""
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+
+class IndicatorKernel:
+    """指标内核基类：整列计算一次，结果缓存在outputs中"""
+
+    def __init__(self, values: np.ndarray):
+        self.values = np.asarray(values, dtype=float)
+        self.outputs: Optional[np.ndarray] = None  # 整列结果（首次compute_all时计算）
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        """输入和结果数组占用的内存（字节）"""
+        return 2 * self.values.nbytes
+
+    def compute_all(self) -> np.ndarray:
+        """向量化计算全部位置并返回结果（已计算时直接返回）"""
+        if self.outputs is None:
+            self.outputs = self.compute_series()
+        return self.outputs
+
+    def compute_series(self) -> np.ndarray:
+        """向量化计算整列结果（子类实现）"""
+        raise NotImplementedError
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """窗口内非NaN值的均值（无有效值时为NaN）"""
+    return pd.Series(values).rolling(max(window, 1), min_periods=1).mean().to_numpy()
+
+
+def _ewm_mean(values: np.ndarray, **kwargs) -> np.ndarray:
+    """指数加权平均（NaN观测只衰减权重）"""
+    return pd.Series(values).ewm(**kwargs).mean().to_numpy()
+
+
+class SMAIndicator(IndicatorKernel):
+    """简单移动平均：窗口不足时返回0.0"""
+
+    def __init__(self, values: np.ndarray, window: int):
+        super().__init__(values)
+        self.window = int(window)
+
+    def compute_series(self) -> np.ndarray:
+        result = _rolling_mean(self.values, self.window)
+        result[:max(self.window - 1, 0)] = 0.0  # 数据不足时返回安全值
+        return result
+
+
+class EMAIndicator(IndicatorKernel):
+    """指数移动平均（与ewm(span=period).mean()一致）"""
+
+    def __init__(self, values: np.ndarray, period: int):
+        super().__init__(values)
+        self.period = int(period)
+
+    def compute_series(self) -> np.ndarray:
+        return _ewm_mean(self.values, span=self.period)
+
+
+class RSIIndicator(IndicatorKernel):
+    """相对强弱指数
+    wilder=False: 涨跌幅的简单移动平均（与原rolling实现一致）
+    wilder=True: Wilder平滑（ewm(alpha=1/period, adjust=False)）
+    数据不足period根时返回50.0。
+    """
+
+    def __init__(self, values: np.ndarray, period: int = 14, wilder: bool = False):
+        super().__init__(values)
+        self.period = int(period)
+        self.wilder = wilder
+
+    def compute_series(self) -> np.ndarray:
+        delta = np.diff(self.values, prepend=np.nan)
+        # NaN涨跌（首根K线或缺失值）按0处理
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        if self.wilder:
+            avg_gain = _ewm_mean(gain, alpha=1.0 / self.period, adjust=False)
+            avg_loss = _ewm_mean(loss, alpha=1.0 / self.period, adjust=False)
+        else:
+            avg_gain = _rolling_mean(gain, self.period)
+            avg_loss = _rolling_mean(loss, self.period)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = 100 - (100 / (1 + avg_gain / avg_loss))
+        result = np.where(avg_loss == 0, np.where(avg_gain != 0, 100.0, 50.0), result)
+        result[:self.period] = 50.0  # RSI默认值
+        return result
+
+
+class MACDIndicator(IndicatorKernel):
+    """MACD柱（MACD线 - 信号线）
+    数据不足max(fast, slow, signal)时返回0.0，信号线数据不足时只返回MACD线。
+    """
+
+    def __init__(self, values: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9):
+        super().__init__(values)
+        self.fast, self.slow, self.signal = int(fast), int(slow), int(signal)
+
+    def compute_series(self) -> np.ndarray:
+        macd_line = _ewm_mean(self.values, span=self.fast) - _ewm_mean(self.values, span=self.slow)
+        signal_line = _ewm_mean(macd_line, span=self.signal)
+        result = macd_line - signal_line
+        # 信号线数据不足时只返回MACD线
+        warmup = min(max(self.fast, self.slow) + self.signal - 1, len(result))
+        result[:warmup] = macd_line[:warmup]
+        result[:max(self.fast, self.slow, self.signal)] = 0.0  # 数据不足时返回安全值
+        return result
+
+
+class BollingerIndicator(IndicatorKernel):
+    """布林带（中轨为window期均值，上下轨为中轨±num_std倍样本标准差）
+    band: mid/upper/lower；窗口不足时返回0.0。
+    """
+
+    BANDS = ('mid', 'upper', 'lower')
+
+    def __init__(self, values: np.ndarray, window: int = 20, num_std: float = 2.0, band: str = 'mid'):
+        super().__init__(values)
+        if band not in self.BANDS:
+            raise ValueError(f"不支持的布林带轨道: {band}")
+        self.window = int(window)
+        self.num_std = float(num_std)
+        self.band = band
+
+    def compute_series(self) -> np.ndarray:
+        result = _rolling_mean(self.values, self.window)
+        if self.band != 'mid':
+            std = pd.Series(self.values).rolling(max(self.window, 1), min_periods=2).std().to_numpy()
+            offset = self.num_std * std
+            result = result + offset if self.band == 'upper' else result - offset
+        result[:max(self.window - 1, 0)] = 0.0  # 数据不足时返回安全值
+        return result
+
+
+class ATRIndicator(IndicatorKernel):
+    """平均真实波幅（真实波幅的window期简单平均）
+    未提供最高/最低价时真实波幅退化为收盘价的绝对变化；窗口不足时返回0.0。
+    """
+
+    def __init__(self, close: np.ndarray, period: int = 14,
+                 high: Optional[np.ndarray] = None, low: Optional[np.ndarray] = None):
+        super().__init__(close)
+        self.period = int(period)
+        self.high = np.asarray(high, dtype=float) if high is not None else self.values
+        self.low = np.asarray(low, dtype=float) if low is not None else self.values
+
+    @property
+    def nbytes(self) -> int:
+        extra = sum(a.nbytes for a in (self.high, self.low) if a is not self.values)
+        return super().nbytes + extra
+
+    def compute_series(self) -> np.ndarray:
+        prev_close = np.concatenate(([np.nan], self.values[:-1]))
+        true_range = self.high - self.low
+        # 首根K线没有前收盘价，NaN比较项被fmax忽略
+        true_range = np.fmax(true_range, np.abs(self.high - prev_close))
+        true_range = np.fmax(true_range, np.abs(self.low - prev_close))
+        result = _rolling_mean(true_range, self.period)
+        result[:max(self.period - 1, 0)] = 0.0  # 数据不足时返回安全值
+        return result
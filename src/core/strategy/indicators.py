@@ -1,21 +1,75 @@
 """指标计算服务（支持增量计算）"""
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 import pandas as pd
 import numpy as np
+from src.core.strategy.indicator_cache import IndicatorCache, SeriesFingerprinter
+from src.core.strategy.indicator_kernels import (
+    IndicatorKernel, SMAIndicator, EMAIndicator, RSIIndicator,
+    MACDIndicator, BollingerIndicator, ATRIndicator
+)
 
 class IndicatorService:
-    """提供指标计算服务（支持增量计算）"""
-    
-    def __init__(self):
-        self._cache = {}  # 基于参数哈希的缓存
-    
+    """提供指标计算服务（支持增量计算）
+    每个(指标, 数据指纹, 参数)对应一个指标内核，首次请求时向量化整列计算并缓存为NumPy数组，
+    之后任意位置的查询都是数组读取，逐点查询与整列计算（calculate_series）结果一致。
+    缓存按数据内容指纹索引、按内存预算LRU淘汰，可在多标的和多次回测间共享；
+    原地修改数据后通过invalidate()使对应缓存失效。
+    """
+
+    # 指标名 -> 指标内核构造函数(values, *args, **inputs)
+    INDICATORS: Dict[str, Callable[..., IndicatorKernel]] = {
+        'sma': SMAIndicator,
+        'ema': EMAIndicator,
+        'rsi': RSIIndicator,
+        'rsi_wilder': lambda values, period=14: RSIIndicator(values, period, wilder=True),
+        'macd': MACDIndicator,
+        'boll': lambda values, window=20, num_std=2: BollingerIndicator(values, window, num_std, 'mid'),
+        'boll_upper': lambda values, window=20, num_std=2: BollingerIndicator(values, window, num_std, 'upper'),
+        'boll_lower': lambda values, window=20, num_std=2: BollingerIndicator(values, window, num_std, 'lower'),
+        'atr': ATRIndicator,
+    }
+
+    def __init__(self, max_cache_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_cache_bytes: 指标缓存内存预算（字节）
+        """
+        # 指标内核 {(指标, 序列指纹, 参数, 额外输入指纹): 内核}
+        self._kernels = IndicatorCache(max_cache_bytes)
+        self._fingerprints = SeriesFingerprinter()
+
+    def _series_key(self, series: pd.Series) -> Tuple:
+        """序列标识：数据内容指纹"""
+        return self._fingerprints.fingerprint(series)
+
+    def _get_kernel(self, func_name: str, series: pd.Series, args: Tuple,
+                    inputs: Dict[str, pd.Series]) -> IndicatorKernel:
+        """获取（或创建）序列对应的指标内核"""
+        factory = self.INDICATORS.get(func_name)
+        if factory is None:
+            raise ValueError(f"Unsupported indicator: {func_name}")
+
+        key = (func_name, self._series_key(series), args,
+               tuple((name, self._series_key(value)) for name, value in sorted(inputs.items())))
+        kernel = self._kernels.get(key)
+        if kernel is None:
+            kernel = factory(
+                series.to_numpy(dtype=float), *args,
+                **{name: value.to_numpy(dtype=float) for name, value in inputs.items()}
+            )
+            # 按整列结果估算占用（首次请求即整列计算）
+            self._kernels.put(key, kernel, kernel.nbytes)
+        return kernel
+
     def calculate_indicator(self, func_name: str, series: pd.Series, 
-                          current_index: int, *args) -> float:
+                          current_index: int, *args, **inputs) -> float:
         """统一指标计算入口
         Args:
             func_name: 指标函数名
             series: 输入序列（如收盘价）
             current_index: 当前索引位置
             *args: 指标函数参数
+            **inputs: 额外输入序列（如ATR的high/low）
         Returns:
             当前索引位置的指标值
         """
@@ -25,82 +79,67 @@ class IndicatorService:
         # 边界检查
         if current_index < 0 or current_index >= len(series):
             raise IndexError(f"Invalid index {current_index} for series length {len(series)}")
-        
-        # 生成缓存键（避免缓存整个series）
-        cache_key = (func_name, current_index, *args)
-        
-        # 检查缓存
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-        
+
         # 统一转为小写进行函数路由
-        func_name = func_name.lower()
-        if func_name == 'sma':
-            result = self._sma(series, current_index, *args)
-        elif func_name == 'rsi':
-            result = self._rsi(series, current_index, *args)
-        elif func_name == 'macd':
-            result = self._macd(series, current_index, *args)
-        else:
-            raise ValueError(f"Unsupported indicator: {func_name}")
-        
-        # 缓存结果
-        self._cache[cache_key] = result
-        return result
+        kernel = self._get_kernel(func_name.lower(), series, args, inputs)
+        # 首次请求时向量化整列计算，之后的查询直接读取数组
+        return float(kernel.compute_all()[current_index])
+
+    def calculate_series(self, func_name: str, series: pd.Series, *args, **inputs) -> np.ndarray:
+        """整列指标计算入口（向量化）
+        结果与逐点调用calculate_indicator在每个索引位置的返回值一致，
+        包括数据不足时返回的安全值。
+        Args:
+            func_name: 指标函数名
+            series: 输入序列（如收盘价）
+            *args: 指标函数参数
+            **inputs: 额外输入序列（如ATR的high/low）
+        Returns:
+            与series等长的指标值数组
+        """
+        return self.precompute(func_name, series, *args, **inputs).copy()
+
+    def precompute(self, func_name: str, series: pd.Series, *args, **inputs) -> np.ndarray:
+        """整列向量化预计算指标并缓存（返回缓存数组本身，调用方不应修改）
+        Args:
+            func_name: 指标函数名
+            series: 输入序列（如收盘价）
+            *args: 指标函数参数
+            **inputs: 额外输入序列（如ATR的high/low）
+        Returns:
+            与series等长的指标值数组
+        """
+        kernel = self._get_kernel(func_name.lower(), series, args, inputs)
+        return kernel.compute_all()
+
+    def invalidate(self, data: Optional[Union[pd.DataFrame, pd.Series]] = None) -> int:
+        """使缓存的指标数据失效（原地修改数据后调用）
+        Args:
+            data: 数据对象（DataFrame的所有列或单个序列），None表示清空全部缓存
+        Returns:
+            移除的缓存条目数
+        """
+        if data is None:
+            removed = len(self._kernels)
+            self._kernels.clear()
+            self._fingerprints.clear()
+            return removed
 
-    def _sma(self, series: pd.Series, current_index: int, window: int) -> float:
-        """计算简单移动平均（当前索引值）"""
-        # 确保参数为整数
-        current_index = int(current_index)
-        window = int(window)
-        
-        # 验证索引范围
-        if current_index < window - 1:
-            return 0.0  # 数据不足时返回安全值
-            
-        # 计算切片索引并确保为整数
-        start = int(current_index - window + 1)
-        end = int(current_index + 1)
-        
-        # 执行切片计算
-        return series.iloc[start:end].mean()
+        columns = [data[column] for column in data.columns] if isinstance(data, pd.DataFrame) else [data]
+        # 使用修改前记忆的指纹定位旧条目
+        stale = {fingerprint for fingerprint in map(self._fingerprints.forget, columns) if fingerprint}
+        keys = [
+            key for key in self._kernels.keys()
+            if key[1] in stale or any(input_key in stale for _, input_key in key[3])
+        ]
+        for key in keys:
+            self._kernels.remove(key)
+        return len(keys)
 
-    def _rsi(self, series: pd.Series, current_index: int, period: int = 14) -> float:
-        """计算相对强弱指数（当前索引值）"""
-        # 确保period是整数
-        period = int(period)
-        if current_index < period:
-            return 50.0  # RSI默认值
-        
-        sub_series = series.iloc[:current_index+1].astype(float)
-        delta = sub_series.diff()
-        gain = delta.where(delta > 0, 0.0)
-        loss = -delta.where(delta < 0, 0.0)
-        
-        avg_gain = gain.rolling(period).mean().iloc[-1]
-        avg_loss = loss.rolling(period).mean().iloc[-1]
-        
-        if avg_loss == 0:
-            return 100.0 if avg_gain != 0 else 50.0
-            
-        rs = avg_gain / avg_loss
-        return 100 - (100 / (1 + rs))
+    def cache_stats(self) -> Dict[str, Any]:
+        """指标缓存统计（条目数、内存占用、命中/未命中/淘汰次数、命中率）"""
+        return self._kernels.stats()
 
-    def _macd(self, series: pd.Series, current_index: int, 
-             fast: int = 12, slow: int = 26, signal: int = 9) -> float:
-        """计算MACD（当前索引值）"""
-        if current_index < max(fast, slow, signal):
-            return 0.0  # 数据不足时返回安全值
-            
-        sub_series = series.iloc[:current_index+1].astype(float)
-        ema_fast = sub_series.ewm(span=fast).mean().iloc[-1]
-        ema_slow = sub_series.ewm(span=slow).mean().iloc[-1]
-        macd_line = ema_fast - ema_slow
-        
-        # 计算信号线需要更多数据
-        if current_index < max(fast, slow) + signal - 1:
-            return macd_line
-            
-        macd_series = sub_series.ewm(span=fast).mean() - sub_series.ewm(span=slow).mean()
-        signal_line = macd_series.ewm(span=signal).mean().iloc[-1]
-        return macd_line - signal_line
+    def clear(self):
+        """清除所有指标缓存"""
+        self.invalidate()
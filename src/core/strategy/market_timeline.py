@@ -0,0 +1,75 @@
+from typing import Dict, Iterator, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+
+class MarketTimeline:
+    """多标的合并时间轴
+
+    把各标的的K线时间合并为一条有序时间轴，记录每根K线在时间轴上的位置，
+    并按(时间, 标的顺序)给出统一事件循环的遍历顺序。
+    价格矩阵按标的×时间排列，缺失的K线用该标的上一根K线的价格填充，用于逐时间点的持仓估值。
+    """
+
+    def __init__(self, times_by_symbol: Dict[str, Sequence]):
+        """
+        Args:
+            times_by_symbol: {标的代码: 按时间排序的K线时间序列}
+        """
+        self.symbols: List[str] = list(times_by_symbol)
+        self.rows: Dict[str, int] = {symbol: row for row, symbol in enumerate(self.symbols)}
+        indexes = {symbol: pd.DatetimeIndex(times) for symbol, times in times_by_symbol.items()}
+        self.times = pd.DatetimeIndex(
+            np.concatenate([index.values for index in indexes.values()]) if indexes else []
+        ).unique().sort_values()
+        # 各标的每根K线在时间轴上的位置
+        self.positions: Dict[str, np.ndarray] = {
+            symbol: self.times.get_indexer(index) for symbol, index in indexes.items()
+        }
+
+        # 所有K线按(时间轴位置, 标的行号)排序，得到统一事件循环的遍历顺序
+        steps, rows, bars = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+        for row, symbol in enumerate(self.symbols):
+            count = len(self.positions[symbol])
+            steps.append(self.positions[symbol])
+            rows.append(np.full(count, row))
+            bars.append(np.arange(count))
+        steps, rows, bars = np.concatenate(steps), np.concatenate(rows), np.concatenate(bars)
+        order = np.lexsort((rows, steps))
+        self._steps, self._rows, self._bars = steps[order], rows[order], bars[order]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def iter_steps(self) -> Iterator[Tuple[int, List[Tuple[int, int]]]]:
+        """按时间顺序遍历
+        Yields:
+            (时间轴位置, [(标的行号, 该标的K线位置), ...])，同一时间点按标的顺序排列
+        """
+        if not len(self._steps):
+            return
+        boundaries = np.flatnonzero(np.diff(self._steps)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(self._steps)]))
+        for start, end in zip(starts, ends):
+            yield int(self._steps[start]), list(zip(self._rows[start:end].tolist(), self._bars[start:end].tolist()))
+
+    def price_matrix(self, values_by_symbol: Dict[str, Sequence]) -> np.ndarray:
+        """构建标的×时间的价格矩阵（向前填充，首根K线之前为NaN）
+        Args:
+            values_by_symbol: {标的代码: 与该标的K线等长的价格序列}
+        Returns:
+            形状为(标的数, 时间点数)的float数组
+        """
+        matrix = np.full((len(self.symbols), len(self.times)), np.nan)
+        for symbol, values in values_by_symbol.items():
+            matrix[self.rows[symbol], self.positions[symbol]] = np.asarray(values, dtype=float)
+
+        # 向前填充：每个位置取该行最近一个有效值的列号
+        valid = ~np.isnan(matrix)
+        last_valid = np.where(valid, np.arange(matrix.shape[1]), 0)
+        np.maximum.accumulate(last_valid, axis=1, out=last_valid)
+        filled = np.take_along_axis(matrix, last_valid, axis=1)
+        # 首个有效值之前保持NaN
+        filled[np.logical_not(np.maximum.accumulate(valid, axis=1))] = np.nan
+        return filled
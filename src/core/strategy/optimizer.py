@@ -0,0 +1,239 @@
+"""回测参数优化
+
+把带占位符的规则模板（如 "RSI(close,{period}) < {low}"）与参数网格或随机采样组合，
+在多个进程中批量执行回测，输出按指标排序的结果表（收益率、最大回撤、夏普比率、交易次数）。
+同一进程内的所有参数点共用一个IndicatorService，相同的指标序列只计算一次。
+
+命令行入口为 python -m src.cli optimize，例如：
+    python -m src.cli optimize --data sh600000.csv --symbol sh.600000 \\
+        --open-rule "RSI(close,{period}) < {low}" --close-rule "RSI(close,{period}) > {high}" \\
+        --grid period=5,9,14 --grid low=20,30 --grid high=70,80 --grid position.percent=0.1,0.2 \\
+        --workers 4 --output results.csv
+"""
+import dataclasses
+import itertools
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from src.core.strategy.backtesting import BacktestConfig, run_rule_backtest
+from src.core.strategy.indicators import IndicatorService
+from src.support.log.logger import logger
+
+RULE_KEYS = ('open_rule', 'close_rule', 'buy_rule', 'sell_rule')
+POSITION_PREFIX = 'position.'  # 以此前缀命名的参数写入仓位策略参数（如position.percent）
+METRICS = ('total_return', 'max_drawdown', 'sharpe', 'trade_count')
+
+# 各数据频率每年的K线数（计算年化夏普比率），分钟线按每天240分钟换算
+PERIODS_PER_YEAR = {'d': 252, 'w': 52, 'm': 12, 'y': 1}
+
+
+def periods_per_year(frequency: str) -> float:
+    """数据频率对应的每年K线数"""
+    frequency = frequency.lower()
+    if frequency in PERIODS_PER_YEAR:
+        return PERIODS_PER_YEAR[frequency]
+    if frequency.isdigit() and int(frequency) > 0:
+        return 252 * 240 / int(frequency)
+    raise ValueError(f"不支持的数据频率: {frequency}")
+
+
+def grid_points(space: Dict[str, Sequence]) -> List[Dict[str, Any]]:
+    """参数网格的全部组合
+    Args:
+        space: {参数名: 候选值列表}
+    Returns:
+        参数点列表
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_points(space: Dict[str, Any], count: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """随机采样参数点
+    Args:
+        space: {参数名: 候选值列表 或 (下限, 上限)区间}，区间两端均为整数时采样整数
+        count: 采样个数
+        seed: 随机种子
+    Returns:
+        参数点列表
+    """
+    rng = random.Random(seed)
+    points = []
+    for _ in range(count):
+        point = {}
+        for name, values in space.items():
+            if isinstance(values, tuple) and len(values) == 2:
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    point[name] = rng.randint(low, high)
+                else:
+                    point[name] = rng.uniform(low, high)
+            else:
+                point[name] = rng.choice(list(values))
+        points.append(point)
+    return points
+
+
+def calculate_metrics(equity_history: List[Dict], trade_count: int, frequency: str) -> Dict[str, float]:
+    """根据净值历史计算优化指标
+    Returns:
+        total_return(%)、max_drawdown(%)、sharpe(年化)、trade_count
+    """
+    values = np.array([record['total_value'] for record in equity_history], dtype=float)
+    if len(values) < 2:
+        return {'total_return': 0.0, 'max_drawdown': 0.0, 'sharpe': 0.0, 'trade_count': trade_count}
+
+    peaks = np.maximum.accumulate(values)
+    returns = np.diff(values) / values[:-1]
+    std = returns.std(ddof=1)
+    sharpe = returns.mean() / std * math.sqrt(periods_per_year(frequency)) if std > 0 else 0.0
+    return {
+        'total_return': (values[-1] / values[0] - 1) * 100,
+        'max_drawdown': float(((peaks - values) / peaks).max() * 100),
+        'sharpe': float(sharpe),
+        'trade_count': trade_count,
+    }
+
+
+class PointEvaluator:
+    """在单个进程内执行参数点回测（进程内共用指标服务）"""
+
+    def __init__(self, data: pd.DataFrame, config: BacktestConfig, rules: Dict[str, str]):
+        self.data = data
+        self.config = config
+        self.rules = rules
+        self.indicator_service = IndicatorService()
+
+    def evaluate(self, params: Dict[str, Any], bar_range: Optional[Tuple[int, int]] = None,
+                 keep_equity: bool = False) -> Dict[str, Any]:
+        """执行一个参数点的回测
+        Args:
+            params: 参数点
+            bar_range: 回测的K线区间[start, end)，默认全部K线
+            keep_equity: 是否在结果的equity字段中保留净值历史
+        Returns:
+            参数与各项指标（失败时指标为NaN并记录error）
+        """
+        rule_params = {k: v for k, v in params.items() if not k.startswith(POSITION_PREFIX)}
+        position_params = dict(self.config.position_strategy_params)
+        position_params.update({
+            k[len(POSITION_PREFIX):]: v for k, v in params.items() if k.startswith(POSITION_PREFIX)
+        })
+        result = dict(params)
+        try:
+            rules = {key: template.format(**rule_params) for key, template in self.rules.items()}
+            config = dataclasses.replace(self.config, position_strategy_params=position_params)
+            backtest = run_rule_backtest(config, self.data, rules, self.indicator_service,
+                                         strategy_name='optimizer', bar_range=bar_range, debug_mode='off')
+            equity_history = backtest['equity_records']
+            result.update(calculate_metrics(equity_history, len(backtest['trades']), config.frequency))
+            result['error'] = None
+            if keep_equity:
+                result['equity'] = equity_history
+        except Exception as e:
+            logger.error(f"参数点回测失败: {params}, 错误: {str(e)}")
+            result.update({metric: np.nan for metric in METRICS})
+            result['error'] = str(e)
+        return result
+
+
+_worker_evaluator: Optional[PointEvaluator] = None  # 子进程内的评估器（进程初始化时创建）
+
+
+def _init_worker(data: pd.DataFrame, config: BacktestConfig, rules: Dict[str, str]):
+    global _worker_evaluator
+    _worker_evaluator = PointEvaluator(data, config, rules)
+
+
+def _evaluate_in_worker(params: Dict[str, Any]) -> Dict[str, Any]:
+    return _worker_evaluator.evaluate(params)
+
+
+class ParameterOptimizer:
+    """规则策略参数优化器（网格搜索/随机搜索）"""
+
+    def __init__(self, data: pd.DataFrame, config: BacktestConfig, rules: Dict[str, str], workers: int = 1):
+        """
+        Args:
+            data: 单个标的的行情数据
+            config: 回测基础配置（各参数点在此基础上替换仓位策略参数）
+            rules: 规则模板 {open_rule/close_rule/buy_rule/sell_rule: 模板}，占位符写作{参数名}
+            workers: 并行进程数
+        Raises:
+            ValueError: 规则模板或进程数无效
+        """
+        unknown = set(rules) - set(RULE_KEYS)
+        if unknown:
+            raise ValueError(f"不支持的规则类型: {', '.join(sorted(unknown))}")
+        if not any(rules.values()):
+            raise ValueError("至少需要一条规则模板")
+        if workers < 1:
+            raise ValueError("并行进程数必须大于0")
+        self.data = data
+        self.config = config
+        self.rules = {key: template for key, template in rules.items() if template}
+        self.workers = workers
+
+    def run(self, points: List[Dict[str, Any]], sort_by: str = 'sharpe', ascending: bool = False) -> pd.DataFrame:
+        """执行全部参数点的回测
+        Args:
+            points: 参数点列表（grid_points/random_points生成）
+            sort_by: 排序指标
+            ascending: 是否升序（如按max_drawdown排序时）
+        Returns:
+            排序后的结果表：rank、各参数、total_return、max_drawdown、sharpe、trade_count、error
+        """
+        if sort_by not in METRICS:
+            raise ValueError(f"排序指标必须是{'/'.join(METRICS)}之一: {sort_by}")
+
+        workers = min(self.workers, len(points))
+        logger.info(f"参数优化: {len(points)}个参数点, {max(workers, 1)}个进程")
+        if workers > 1:
+            chunksize = max(1, len(points) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.data, self.config, self.rules)) as executor:
+                results = list(executor.map(_evaluate_in_worker, points, chunksize=chunksize))
+        else:
+            evaluator = PointEvaluator(self.data, self.config, self.rules)
+            results = [evaluator.evaluate(point) for point in points]
+
+        table = pd.DataFrame(results)
+        if table.empty:
+            return table
+        table = table.sort_values(sort_by, ascending=ascending, na_position='last', kind='stable')
+        table.insert(0, 'rank', range(1, len(table) + 1))
+        return table.reset_index(drop=True)
+
+
+def load_price_data(path: str, symbol: str) -> pd.DataFrame:
+    """读取CSV/Parquet/Arrow(Feather)行情文件（需包含date和close列）"""
+    if path.endswith('.parquet'):
+        data = pd.read_parquet(path)
+    elif path.endswith(('.arrow', '.feather')):
+        data = pd.read_feather(path)
+    else:
+        data = pd.read_csv(path)
+    if 'date' not in data.columns or 'close' not in data.columns:
+        raise ValueError("行情数据必须包含date和close列")
+    data['date'] = pd.to_datetime(data['date']).dt.strftime('%Y-%m-%d')
+    if 'code' not in data.columns:
+        data['code'] = symbol
+    if 'combined_time' not in data.columns:
+        time = data['time'].astype(str) if 'time' in data.columns else '00:00:00'
+        data['combined_time'] = pd.to_datetime(data['date'] + ' ' + time)
+    return data.sort_values('combined_time').reset_index(drop=True)
+
+
+def slice_dates(data: pd.DataFrame, start_date: Optional[str] = None,
+                end_date: Optional[str] = None) -> pd.DataFrame:
+    """截取[start_date, end_date]区间的行情（日期格式YYYYMMDD，None表示不限）"""
+    dates = pd.to_datetime(data['date'])
+    mask = pd.Series(True, index=data.index)
+    if start_date:
+        mask &= dates >= pd.to_datetime(start_date)
+    if end_date:
+        mask &= dates <= pd.to_datetime(end_date)
+    return data[mask].reset_index(drop=True)
@@ -0,0 +1,185 @@
+"""回测性能剖析：分阶段计时、计数器和可选的函数级剖析（cProfile/pyinstrument）"""
+import importlib.util
+import io
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, Iterable, List, Optional
+
+_NULL_STAGE = nullcontext()  # 未启用剖析时所有阶段共用的空上下文（可重复进入）
+
+
+class _Stage:
+    """单个阶段的计时上下文"""
+    __slots__ = ('_totals', '_wall', '_cpu')
+
+    def __init__(self, totals: List[float]):
+        self._totals = totals
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        totals = self._totals
+        totals[0] += time.perf_counter() - self._wall
+        totals[1] += time.process_time() - self._cpu
+        totals[2] += 1
+        return False
+
+
+class BacktestProfiler:
+    """回测性能剖析
+
+    支持四种模式：
+        - off: 不采集（stage()返回共用的空上下文，count()直接返回）
+        - timers: 按阶段累计墙钟时间、CPU时间和调用次数，并记录计数器
+        - cprofile: timers + 用cProfile剖析整个回测，报告按累计耗时排序的函数列表
+        - pyinstrument: timers + 用pyinstrument采样剖析（需安装pyinstrument）
+
+    阶段计时是包含式的：嵌套阶段的耗时同时计入外层阶段（如strategies包含在run内）。
+    """
+
+    MODES = ("off", "timers", "cprofile", "pyinstrument")
+
+    def __init__(self, mode: str = "off", profile_limit: int = 30):
+        """
+        Args:
+            mode: 剖析模式（off/timers/cprofile/pyinstrument）
+            profile_limit: cprofile模式报告中保留的函数个数
+        Raises:
+            ValueError: 模式无效或pyinstrument未安装
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"性能剖析模式必须是{'/'.join(self.MODES)}之一: {mode}")
+        if mode == "pyinstrument" and importlib.util.find_spec("pyinstrument") is None:
+            raise ValueError("pyinstrument模式需要先安装pyinstrument")
+        self.mode = mode
+        self.enabled = mode != "off"
+        self.profile_limit = profile_limit
+        self.reset()
+
+    def reset(self):
+        """清空已采集的数据"""
+        self._stages: Dict[str, List[float]] = {}  # 阶段名 -> [墙钟时间, CPU时间, 调用次数]
+        self._counters: Dict[str, int] = {}
+        self._profile_text: Optional[str] = None
+
+    def stage(self, name: str):
+        """阶段计时上下文
+        Args:
+            name: 阶段名（同名阶段累计）
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        totals = self._stages.get(name)
+        if totals is None:
+            totals = self._stages[name] = [0.0, 0.0, 0]
+        return _Stage(totals)
+
+    def add_stage(self, name: str, wall: float, cpu: float = 0.0, calls: int = 1):
+        """记录在外部测得的阶段耗时（如调用方加载数据的时间）"""
+        if not self.enabled:
+            return
+        totals = self._stages.setdefault(name, [0.0, 0.0, 0])
+        totals[0] += wall
+        totals[1] += cpu
+        totals[2] += calls
+
+    def count(self, name: str, n: int = 1):
+        """累加计数器"""
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def set_counter(self, name: str, value: int):
+        """设置计数器的值（用于汇总其他组件自带的统计）"""
+        if self.enabled:
+            self._counters[name] = value
+
+    def session(self):
+        """整个回测的剖析上下文：计入run阶段，并按模式启动函数级剖析"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Session(self)
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        """剖析结果
+        Returns:
+            mode、stages({阶段名: {wall, cpu, calls}}，单位秒)、counters、profile(函数级剖析文本)；
+            未启用时为None
+        """
+        if not self.enabled:
+            return None
+        return {
+            'mode': self.mode,
+            'stages': {
+                name: {'wall': wall, 'cpu': cpu, 'calls': int(calls)}
+                for name, (wall, cpu, calls) in self._stages.items()
+            },
+            'counters': dict(self._counters),
+            'profile': self._profile_text,
+        }
+
+    @staticmethod
+    def merge(reports: Iterable[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """合并多个剖析结果（如多标的回测各标的的结果），阶段耗时和计数器分别相加
+        Returns:
+            合并后的结果，全部为None时返回None
+        """
+        reports = [report for report in reports if report]
+        if not reports:
+            return None
+        stages: Dict[str, Dict[str, float]] = {}
+        counters: Dict[str, int] = {}
+        for report in reports:
+            for name, values in report['stages'].items():
+                merged = stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+                for key in merged:
+                    merged[key] += values[key]
+            for name, value in report['counters'].items():
+                counters[name] = counters.get(name, 0) + value
+        profiles = [report['profile'] for report in reports if report.get('profile')]
+        return {
+            'mode': reports[0]['mode'],
+            'stages': stages,
+            'counters': counters,
+            'profile': "\n\n".join(profiles) if profiles else None,
+        }
+
+
+class _Session:
+    """BacktestProfiler.session()返回的上下文"""
+
+    def __init__(self, profiler: BacktestProfiler):
+        self._profiler = profiler
+        self._stage = profiler.stage('run')
+        self._backend = None
+
+    def __enter__(self):
+        mode = self._profiler.mode
+        if mode == "cprofile":
+            import cProfile
+            self._backend = cProfile.Profile()
+            self._backend.enable()
+        elif mode == "pyinstrument":
+            from pyinstrument import Profiler
+            self._backend = Profiler()
+            self._backend.start()
+        self._stage.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._stage.__exit__(*exc)
+        backend = self._backend
+        if backend is None:
+            return False
+        if self._profiler.mode == "cprofile":
+            import pstats
+            backend.disable()
+            stream = io.StringIO()
+            pstats.Stats(backend, stream=stream).sort_stats('cumulative').print_stats(self._profiler.profile_limit)
+            self._profiler._profile_text = stream.getvalue()
+        else:
+            backend.stop()
+            self._profiler._profile_text = backend.output_text()
+        return False
@@ -1,10 +1,13 @@
 
 from src.core.strategy.rule_parser import RuleParser
+from src.core.strategy.bar_cursor import BarCursor
+from src.core.strategy.debug_capture import DebugCapture
 from src.core.strategy.strategy import BaseStrategy
 from src.event_bus.event_types import StrategySignalEvent
 from src.core.strategy.indicators import IndicatorService
 from src.core.strategy.signal_types import SignalType
 from typing import Optional, Any
+import numpy as np
 import pandas as pd
 from src.support.log.logger import logger
 
@@ -33,7 +36,8 @@ class RuleBasedStrategy(BaseStrategy):
         self.close_rule_expr = close_rule_expr
         self.portfolio_manager = portfolio_manager
         self.parser = RuleParser(Data, indicator_service, portfolio_manager)
-        self.debug_data = Data.copy()  # 初始化时保存原始数据
+        self._cursor: Optional[BarCursor] = None  # Data与引擎数据不是同一对象时使用的独立游标
+        self.debug_capture = DebugCapture()  # 调试数据采集（默认回测结束时快照）
 
     def copy_for_symbol(self, symbol: str):
         """为指定符号创建策略副本"""
@@ -49,12 +53,14 @@ class RuleBasedStrategy(BaseStrategy):
             portfolio_manager=self.portfolio_manager
         )
         
-    def _generate_signal_from_rule(self, rule_expr: str, signal_type: SignalType, rule_type: str) -> Optional[StrategySignalEvent]:
+    def _generate_signal_from_rule(self, rule_expr: str, signal_type: SignalType, rule_type: str,
+                                   should_trade: Optional[bool] = None) -> Optional[StrategySignalEvent]:
         """根据规则表达式生成交易信号（统一处理函数）
         Args:
             rule_expr: 规则表达式
             signal_type: 信号类型
             rule_type: 规则类型（用于日志记录）
+            should_trade: 本根K线已评估的规则结果，为None时重新解析规则
         Returns:
             交易信号事件或None
         """
@@ -62,19 +68,30 @@ class RuleBasedStrategy(BaseStrategy):
             return None
             
         try:
-            should_trade = self.parser.parse(rule_expr)
+            if should_trade is None:
+                should_trade = self.parser.parse(rule_expr)
             # logger.debug(f"{rule_type}规则解析结果: {should_trade}")
             if should_trade:
                 # logger.debug(f"生成 {signal_type.value} 信号")
+                current_index = self.parser.current_index
+                cursor = self.parser.cursor
+                if cursor is not None and cursor.data is self.Data:
+                    symbol = cursor.codes[-1]
+                    price = float(cursor.value('close', current_index))
+                    timestamp = cursor.times[current_index]
+                else:
+                    symbol = self.Data['code'].iloc[-1]
+                    price = float(self.Data.loc[current_index, 'close'])
+                    timestamp = self.Data.loc[current_index, 'combined_time']
                 return StrategySignalEvent(
                     strategy_id=self.strategy_id,
-                    symbol=self.Data['code'].iloc[-1],
+                    symbol=symbol,
                     signal_type=signal_type,
-                    price=float(self.Data.loc[self.parser.current_index,'close']),
+                    price=price,
                     quantity=100,  # 默认数量
                     confidence=1.0,
-                    timestamp=self.Data.loc[self.parser.current_index,'combined_time'],
-                    parameters={'current_index': self.parser.current_index}
+                    timestamp=timestamp,
+                    parameters={'current_index': current_index}
                 )
         except Exception as e:
             logger.error(f"{rule_type}规则解析失败: {str(e)}")
@@ -90,7 +107,7 @@ class RuleBasedStrategy(BaseStrategy):
             self.parser.data = self.Data
             self.parser.current_index = current_index
             
-            # 首先评估所有规则以确保列生成（即使不触发信号也要评估）
+            # 按优先级顺序排列规则：开仓 > 清仓 > 加仓 > 平仓
             all_rules = [
                 (self.open_rule_expr, SignalType.OPEN, '开仓'),
                 (self.close_rule_expr, SignalType.CLOSE, '清仓'), 
@@ -98,31 +115,21 @@ class RuleBasedStrategy(BaseStrategy):
                 (self.sell_rule_expr, SignalType.SELL, '平仓')
             ]
             
-            # 评估所有规则以确保列生成
+            # 每条规则只评估一次（即使不触发信号也要评估，以确保列生成）
+            rule_results = {}
             for rule_expr, signal_type, rule_type in all_rules:
                 if rule_expr:
                     try:
-                        # 评估规则但不生成信号（仅用于列生成）
-                        self.parser.parse(rule_expr)
+                        rule_results[rule_type] = bool(self.parser.parse(rule_expr))
                     except Exception as e:
                         logger.error(f"{rule_type}规则评估失败（列生成）: {str(e)}")
             
-            # 按优先级顺序检查规则：开仓 > 清仓 > 加仓 > 平仓 （原代码：出现信号即跳出，会导致某些规则没有被解析评估）
-            signal = self._generate_signal_from_rule(self.open_rule_expr, SignalType.OPEN, '开仓')
-            if signal:
-                return signal
-                
-            signal = self._generate_signal_from_rule(self.close_rule_expr, SignalType.CLOSE, '清仓')
-            if signal:
-                return signal
-                
-            signal = self._generate_signal_from_rule(self.buy_rule_expr, SignalType.BUY, '加仓')
-            if signal:
-                return signal
-                
-            signal = self._generate_signal_from_rule(self.sell_rule_expr, SignalType.SELL, '平仓')
-            if signal:
-                return signal
+            # 按优先级顺序检查规则结果（原代码：出现信号即跳出，会导致某些规则没有被解析评估）
+            for rule_expr, signal_type, rule_type in all_rules:
+                if rule_results.get(rule_type):
+                    signal = self._generate_signal_from_rule(rule_expr, signal_type, rule_type, should_trade=True)
+                    if signal:
+                        return signal
             
             return None
                 
@@ -132,19 +139,62 @@ class RuleBasedStrategy(BaseStrategy):
         finally:
             # 每次调用后清理缓存
             self.parser.clear_cache()
-            # 保存调试数据（包含所有生成的列）
-            old_debug_data_size = len(self.debug_data.columns) if self.debug_data is not None else 0
-            self.debug_data = self.parser.data.copy()
-            new_debug_data_size = len(self.debug_data.columns) if self.debug_data is not None else 0
+            # 采集调试数据（sampled模式写入环形缓冲区，其他模式为空操作）
+            self.debug_capture.capture(self.parser.expression_store, current_index)
+
+    @property
+    def debug_data(self) -> Optional[pd.DataFrame]:
+        """调试数据（包含规则生成的所有中间列），off模式下为None"""
+        return self.debug_capture.collect(self.parser.data, self.parser.expression_store)
+
+    def get_debug_data(self) -> Optional[pd.DataFrame]:
+        """获取调试数据"""
+        return self.debug_data
+
+    def precompute_indicators(self) -> int:
+        """整列预计算规则中引用的指标（回测初始化时调用）
+        Returns:
+            预计算的指标个数
+        """
+        self.parser.data = self.Data
+        return self.parser.precompute_indicators([
+            self.open_rule_expr, self.close_rule_expr, self.buy_rule_expr, self.sell_rule_expr
+        ])
+
+    def get_signal_mask(self, engine) -> Optional[np.ndarray]:
+        """向量化预计算各规则的信号位置（混合回测模式使用）
+        同时整列写入规则的中间结果列，跳过的K线也保留调试数据。
+        Returns:
+            任一规则为真的K线位置(bool数组)；规则依赖COST/POSITION或无法向量化时返回None
+        """
+        rules = [rule for rule in (self.open_rule_expr, self.close_rule_expr,
+                                   self.buy_rule_expr, self.sell_rule_expr) if rule]
+        self.parser.data = self.Data
+        try:
+            if any(self.parser.compile(rule).uses_portfolio for rule in rules):
+                return None
+            mask = np.zeros(len(self.Data), dtype=bool)
+            for rule in rules:
+                mask |= self.parser.evaluate_series(rule, store_columns=True)
+        except Exception as e:
+            logger.warning(f"{self.name} 规则无法向量化预计算，逐K线评估: {str(e)}")
+            return None
+        return mask
+
+    def _get_cursor(self, engine) -> BarCursor:
+        """获取与策略数据对应的K线游标（优先复用引擎游标）"""
+        cursor = getattr(engine, 'bar_cursor', None)
+        if cursor is not None and cursor.data is self.Data:
+            return cursor
+        if self._cursor is None or self._cursor.data is not self.Data:
+            self._cursor = BarCursor(self.Data)
+        return self._cursor
 
-            # 添加调试信息
-            if old_debug_data_size != new_debug_data_size:
-                print(f"[DEBUG] {self.name} debug_data更新: {old_debug_data_size} -> {new_debug_data_size} 列")
-            
     def on_schedule(self, engine) -> None:
         """定时触发规则检查"""
         
-        # 同步当前索引到规则解析器
+        # 同步当前索引和K线游标到规则解析器
+        self.parser.cursor = self._get_cursor(engine)
         self.parser.current_index = engine.current_index
         signal = self.generate_signals(engine.current_index)
         if signal:
@@ -0,0 +1,19 @@
+"""内置的默认规则组（前端规则组管理和基准测试共用）"""
+from typing import Dict
+
+DEFAULT_RULE_GROUPS: Dict[str, Dict[str, str]] = {
+    '金叉死叉': {
+        'buy_rule': '(REF(SMA(close,5), 1) < REF(SMA(close,7), 1)) & (SMA(close,5) > SMA(close,7))',
+        'sell_rule': '(REF(SMA(close,5), 1) > REF(SMA(close,7), 1)) & (SMA(close,5) < SMA(close,7))'
+    },
+    '相对强度': {
+        'buy_rule': '(REF(RSI(close,5), 1) < 30) & (RSI(close,5) >= 30)',
+        'sell_rule': '(REF(RSI(close,5), 1) >= 60) & (RSI(close,5) < 60)'
+    },
+    'Martingale': {
+        'open_rule': '(close < REF(SMA(close,5), 1)) & (close > SMA(close,5))',
+        'close_rule': '(close - (COST/POSITION))/(COST/POSITION) * 100 >= 5',
+        'buy_rule': '(close - (COST/POSITION))/(COST/POSITION) * 100 <= -5',
+        'sell_rule': ''
+    }
+}
@@ -2,11 +2,14 @@ import ast
 import operator as op
 import sys  # 添加sys导入
 import logging
-from typing import Any, Dict, Callable, Union, List, Tuple
+from typing import Any, Dict, Callable, Union, List, Tuple, Set, Optional
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 import astunparse
 from .indicators import IndicatorService  # 引入IndicatorService
+from .bar_cursor import BarCursor
+from .expression_store import ExpressionStore
 from src.support.log.logger import logger
 
 @dataclass
@@ -17,6 +20,27 @@ class IndicatorFunction:
     params: Dict[str, type]
     description: str
 
+@dataclass
+class CompiledRule:
+    """编译后的规则执行计划
+    Attributes:
+        rule: 规则表达式字符串
+        tree: 规则的AST
+        evaluate: 在解析器当前位置(current_index)求值的闭包
+        variables: 规则引用的变量（数据列及COST/POSITION）
+        functions: 规则引用的指标函数名
+    """
+    rule: str
+    tree: ast.Expression
+    evaluate: Callable[[], Any]
+    variables: Set[str]
+    functions: Set[str]
+
+    @property
+    def uses_portfolio(self) -> bool:
+        """是否依赖投资组合状态（COST/POSITION），此类规则的结果与回测路径相关"""
+        return bool(self.variables & RuleParser.PORTFOLIO_VARIABLES)
+
 class RuleParser:
     """规则解析引擎核心类"""
     
@@ -60,6 +84,13 @@ class RuleParser:
         ast.Mod: op.mod,
         ast.Pow: op.pow
     }
+
+    PORTFOLIO_VARIABLES = frozenset({'COST', 'POSITION'})
+
+    # 需要额外行情列的指标 {指标名: {参数名: 列名}}（如ATR需要最高价和最低价）
+    INDICATOR_INPUTS = {
+        'ATR': {'high': 'high', 'low': 'low'},
+    }
     
     def __init__(self, data_provider: pd.DataFrame, indicator_service: IndicatorService, portfolio_manager: Any = None):
         """初始化解析器
@@ -68,9 +99,12 @@ class RuleParser:
             indicator_service: 指标计算服务
             portfolio_manager: 投资组合管理器，用于获取COST、POSITION等变量
         """
+        self.expression_store = ExpressionStore()  # 表达式中间结果的列式存储（随data重新分配）
+        self._data = None
         self.data = data_provider
         self.indicator_service = indicator_service
         self.portfolio_manager = portfolio_manager
+        self.cursor: Optional[BarCursor] = None  # 列式K线游标，绑定的DataFrame与data一致时用于O(1)取值
         # 注册支持的指标函数
         self._indicators = {
             'REF': IndicatorFunction(
@@ -87,13 +121,70 @@ class RuleParser:
             )
         }
         self.series_cache = {}  # 序列缓存字典
+        self._compiled_rules: Dict[str, CompiledRule] = {}  # 规则编译缓存 {rule: CompiledRule}
+        self._series_plans: Dict[Tuple[str, bool], Callable[[], Any]] = {}  # 向量化执行计划缓存 {(rule, store_columns): plan}
         self.value_cache = {}   # 值缓存字典
         self.current_index = 0  # 当前计算位置
         self.max_recursion_depth = 100  # 最大递归深度
         self.recursion_counter = 0     # 递归计数器
         self.cache_hits = 0            # 缓存命中统计
         self.cache_misses = 0          # 缓存未命中统计
+        self.rule_evaluations = 0      # 逐K线规则求值统计（不含REF内部的子表达式求值）
+        self.series_evaluations = 0    # 整列向量化求值统计
     
+    @property
+    def data(self) -> pd.DataFrame:
+        """行情数据"""
+        return self._data
+
+    @data.setter
+    def data(self, data: pd.DataFrame):
+        # 绑定新的数据时按其长度重新分配表达式列（指标缓存按数据指纹索引，无需失效）
+        if data is not self._data:
+            self._data = data
+            self.expression_store.reset(len(data) if data is not None else 0)
+
+    def precompute_indicators(self, rules: List[str]) -> int:
+        """整列预计算规则中引用的指标（预热IndicatorService缓存）
+        只处理参数全部为常量的指标调用，规则本身的错误留到评估时报告。
+        Args:
+            rules: 规则表达式列表
+        Returns:
+            预计算的指标个数
+        """
+        count = 0
+        for rule in rules:
+            if not rule or not rule.strip():
+                continue
+            try:
+                tree = self.compile(rule).tree
+            except Exception:
+                continue
+            for node in ast.walk(tree):
+                if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                        and node.func.id != 'REF' and node.args):
+                    continue
+                if not all(isinstance(arg, ast.Constant) for arg in node.args[1:]):
+                    continue
+                data_column = self._indicator_data_column(node)
+                if data_column not in self.data.columns:
+                    continue
+                # 参数形式与逐K线求值时一致（常量转为float），保证命中同一缓存
+                args = [self._compile_node(arg)() for arg in node.args[1:]]
+                try:
+                    self.indicator_service.precompute(
+                        node.func.id, self.data[data_column], *args,
+                        **self._indicator_inputs(node.func.id)
+                    )
+                    count += 1
+                except Exception as e:
+                    logger.warning(f"指标预计算失败: {self._node_to_expr(node)}, 错误: {str(e)}")
+        return count
+
+    def materialize(self) -> pd.DataFrame:
+        """将表达式中间结果列与行情数据合并为DataFrame（用于结果和调试展示）"""
+        return self.expression_store.materialize(self.data)
+
     def evaluate_at(self, rule: str, index: int) -> bool:
         """在指定K线位置评估规则
         Args:
@@ -124,8 +215,9 @@ class RuleParser:
         try:
             if not rule.strip():
                 return False if mode == 'rule' else 0.0
-            tree = ast.parse(rule, mode='eval')
-            result = self._eval(tree.body)
+            if mode == 'rule':
+                self.rule_evaluations += 1
+            result = self.compile(rule).evaluate()
             final_result = bool(result) if mode == 'rule' else result
             if mode == 'rule':
                 pass
@@ -136,6 +228,76 @@ class RuleParser:
         except Exception as e:
             raise SyntaxError(f"规则解析失败: {str(e)}") from e
         
+    def compile(self, rule: str) -> CompiledRule:
+        """将规则编译为可复用的执行计划
+        规则字符串只解析、校验一次，列名等在编译期预先生成，
+        之后每根K线的求值只调用预先构建的闭包。
+        Args:
+            rule: 规则表达式字符串
+        Returns:
+            编译后的规则(CompiledRule)
+        Raises:
+            SyntaxError: 规则语法错误时抛出
+            ValueError: 不支持的节点类型、运算符或函数参数时抛出
+        """
+        compiled = self._compiled_rules.get(rule)
+        if compiled is not None:
+            return compiled
+
+        tree = ast.parse(rule, mode='eval')
+        calls = [node for node in ast.walk(tree) if isinstance(node, ast.Call)]
+        func_nodes = {id(call.func) for call in calls}
+        compiled = CompiledRule(
+            rule=rule,
+            tree=tree,
+            evaluate=self._compile_node(tree.body),
+            variables={
+                node.id for node in ast.walk(tree)
+                if isinstance(node, ast.Name) and id(node) not in func_nodes
+            },
+            functions={call.func.id for call in calls if isinstance(call.func, ast.Name)}
+        )
+        self._compiled_rules[rule] = compiled
+        return compiled
+
+    def evaluate_series(self, rule: str, store_columns: bool = False) -> np.ndarray:
+        """在整列数据上向量化评估规则
+        指标函数整列计算、REF转为位移、比较与逻辑运算逐元素计算，
+        第i个元素与evaluate_at(rule, i)的结果一致。
+        Args:
+            rule: 规则表达式字符串（不能依赖COST/POSITION）
+            store_columns: 是否整列写入中间结果列（与逐K线评估生成的列一致）
+        Returns:
+            与data等长的bool信号数组
+        Raises:
+            SyntaxError: 规则语法错误或计算失败时抛出
+            ValueError: 规则依赖持仓状态(COST/POSITION)时抛出
+        """
+        length = len(self.data)
+        if not rule.strip():
+            return np.zeros(length, dtype=bool)
+
+        try:
+            compiled = self.compile(rule)
+        except Exception as e:
+            raise SyntaxError(f"规则解析失败: {str(e)}") from e
+        if compiled.uses_portfolio:
+            raise ValueError(f"规则依赖持仓状态(COST/POSITION)，不支持向量化评估: {rule}")
+        self.series_evaluations += 1
+
+        try:
+            plan = self._series_plans.get((rule, store_columns))
+            if plan is None:
+                plan = self._compile_series_node(compiled.tree.body, store_columns)
+                self._series_plans[(rule, store_columns)] = plan
+            with np.errstate(all='ignore'):
+                result = plan()
+            return np.broadcast_to(np.asarray(result, dtype=bool), (length,)).copy()
+        except RecursionError:
+            raise RecursionError("递归深度超过限制，请简化规则表达式")
+        except Exception as e:
+            raise SyntaxError(f"规则向量化评估失败: {str(e)}") from e
+
     def clear_cache(self):
         """清除序列缓存"""
         self.series_cache = {}
@@ -146,8 +308,7 @@ class RuleParser:
             return self.series_cache[expr]
         
         # 解析表达式并计算序列
-        tree = ast.parse(expr, mode='eval')
-        series = self._eval(tree.body)
+        series = self.compile(expr).evaluate()
         
         if not isinstance(series, pd.Series):
             raise ValueError(f"表达式 '{expr}' 未返回序列")
@@ -288,331 +449,479 @@ class RuleParser:
         else:
             return str(op_node)
             
-    def _store_expression_result(self, node, result, bool_only=False):
-        """存储表达式结果到data
+    def _store_column_result(self, col_name: str, result, bool_only=False):
+        """存储表达式结果到表达式列存储
         Args:
-            node: AST节点
+            col_name: 列名（编译期预先生成的表达式字符串）
             result: 计算结果
-            bool_only: 是否为bool表达式(需要符号替换)
+            bool_only: 是否为bool表达式
         """
-        # 不存储数字常量（如-5）作为列
-        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
-            return
-        
-        expr_str = self._node_to_expr(node)
-        
-        # 生成列名 - 保持原始表达式格式
-        col_name = expr_str
-        
-        # 特殊处理：为COST和POSITION等特殊变量创建单独的列（即使值为0或None）
-        if isinstance(node, ast.Name) and node.id in ['COST', 'POSITION']:
-            # 为特定变量创建单独的列
-            var_name = node.id
-            if var_name not in self.data.columns:
-                self.data[var_name] = [float('nan')] * len(self.data)
-                self.data.attrs[f"{var_name}_expr"] = var_name
-            if 0 <= self.current_index < len(self.data):
-                # 即使result为0或None也存储
-                self.data.at[self.current_index, var_name] = result if result is not None else float('nan')
-            return  # 不继续存储为表达式列
-        
-        # 检查列是否已存在（跳过数字常量）
-        if col_name not in self.data.columns and not (isinstance(node, ast.Constant) and isinstance(node.value, (int, float))):
-            # 根据表达式类型初始化列
-            if bool_only:
-                self.data[col_name] = [False] * len(self.data)
-            else:
-                self.data[col_name] = [float('nan')] * len(self.data)
-            # 添加表达式注释
-            self.data.attrs[f"{col_name}_expr"] = expr_str
-        
-        # 存储结果（跳过数字常量）
-        if 0 <= self.current_index < len(self.data) and not (isinstance(node, ast.Constant) and isinstance(node.value, (int, float))):
-            self.data.at[self.current_index, col_name] = bool(result) if bool_only else result
+        if bool_only:
+            self.expression_store.set(col_name, self.current_index, bool(result), dtype=bool)
+        else:
+            self.expression_store.set(col_name, self.current_index, result)
+
+    def _store_portfolio_variable(self, var_name: str, result):
+        """为COST和POSITION等特殊变量创建单独的列（即使值为0或None）"""
+        # 即使result为0或None也存储
+        self.expression_store.set(var_name, self.current_index, result if result is not None else float('nan'))
+
+    def _check_recursion(self):
+        """检查递归深度"""
+        if self.recursion_counter + 1 > self.max_recursion_depth:
+            raise RecursionError(f"递归深度超过限制 ({self.max_recursion_depth})")
 
-    def _eval(self, node):
-        """递归评估AST节点"""
+    def _compile_node(self, node) -> Callable[[], Any]:
+        """将AST节点编译为闭包，运行时只读取current_index/data等状态"""
         if isinstance(node, ast.Compare):
-            left = self._eval(node.left)
-            right = self._eval(node.comparators[0])
-            result = self.OPERATORS[type(node.ops[0])](left, right)
-            # 存储比较运算结果(bool值)
-            self._store_expression_result(node, result, bool_only=True)
-            # 只存储有意义的表达式（避免存储数字常量和中间表达式）
-            # 不存储比较运算的子表达式，只存储最终布尔结果
-            return result
+            return self._compile_compare(node)
         elif isinstance(node, ast.BoolOp):
-            return self._eval_bool_op(node)
+            return self._compile_bool_op(node)
         elif isinstance(node, ast.Call):
-            return self._eval_function_call(node)
+            return self._compile_function_call(node)
         elif isinstance(node, ast.Name):
-            return self._eval_variable(node)
+            return self._compile_variable(node)
         elif isinstance(node, ast.BinOp):
-            left = self._eval(node.left)
-            right = self._eval(node.right)
-            
-            # 处理除零错误
-            if isinstance(node.op, (ast.Div, ast.FloorDiv)) and right == 0:
-                # 获取当前时间信息
-                current_time = ""
-                if hasattr(self, 'data') and 'combined_time' in self.data.columns and 0 <= self.current_index < len(self.data):
-                    current_time = self.data['combined_time'].iloc[self.current_index]
-                
-                # 获取表达式字符串用于更智能的错误处理
-                expr_str = self._node_to_expr(node)
-                
-                # 特殊处理：对于COST/POSITION表达式，当POSITION为0时返回0.0（不生成信号）
-                if 'COST' in expr_str and 'POSITION' in expr_str:
-                    return 0.0  # 当持仓为0时，返回0.0表示不生成信号
-                
-                # 打印除零错误信息
-                return 0.0  # 其他除零情况返回0
-                
-            return self.OPERATORS[type(node.op)](left, right)
+            return self._compile_bin_op(node)
         elif isinstance(node, ast.Constant):
             try:
-                return float(node.value)
+                value = float(node.value)
             except (TypeError, ValueError):
-                return 0.0
+                value = 0.0
+            return lambda: value
         elif isinstance(node, ast.UnaryOp):
-            # 处理一元运算符（如 -5, +10 等）
-            operand = self._eval(node.operand)
-            if isinstance(node.op, ast.USub):  # 负号
-                return -operand
-            elif isinstance(node.op, ast.UAdd):  # 正号
-                return +operand
-            elif isinstance(node.op, ast.Not):  # 逻辑非
-                return not operand
-            elif isinstance(node.op, ast.Invert):  # 按位取反 ~
-                return ~int(operand) if operand is not None else None
-            else:
-                raise ValueError(f"不支持的一元运算符: {type(node.op)}")
+            return self._compile_unary_op(node)
         else:
             raise ValueError(f"不支持的AST节点类型: {type(node)}")
 
-    def _eval_bool_op(self, node) -> bool:
-        """评估逻辑运算符"""
-        values = [self._eval(v) for v in node.values]
-        result = self.OPERATORS[type(node.op)](*values)
-        # 存储布尔运算结果(bool值)
-        self._store_expression_result(node, result, bool_only=True)
-        # 只存储布尔运算结果，不存储子表达式（避免存储中间表达式）
-        return result
-    
-    def _eval_variable(self, node) -> float:
-        """评估变量(从数据源获取或从portfolio_manager获取)"""
-        var_name = node.id
-        
-        # 处理投资组合相关变量
-        if var_name == 'COST' and self.portfolio_manager:
-            # 获取持仓总成本
-            result = self.portfolio_manager.get_total_cost()
-            # 存储COST变量的值到对应列
-            self._store_expression_result(node, result)
+    def _get_operator(self, op_node) -> Callable:
+        """获取运算符对应的函数（编译期校验）"""
+        operator = self.OPERATORS.get(type(op_node))
+        if operator is None:
+            raise ValueError(f"不支持的运算符: {type(op_node).__name__}")
+        return operator
+
+    def _compile_compare(self, node) -> Callable[[], Any]:
+        """编译比较运算（结果存储为bool列）"""
+        left = self._compile_node(node.left)
+        right = self._compile_node(node.comparators[0])
+        operator = self._get_operator(node.ops[0])
+        col_name = self._node_to_expr(node)
+        self.expression_store.register(col_name, bool)
+
+        def evaluate():
+            result = operator(left(), right())
+            # 只存储比较运算的最终布尔结果，不存储其子表达式
+            self._store_column_result(col_name, result, bool_only=True)
             return result
-        elif var_name == 'POSITION' and self.portfolio_manager:
-            # 获取当前标的的持仓数量
-            # 需要从数据中获取当前标的代码
-            if not self.data.empty and 'code' in self.data.columns:
-                current_symbol = self.data['code'].iloc[self.current_index]
-                position = self.portfolio_manager.get_position(current_symbol)
-                result = position.quantity if position else 0.0
-            else:
-                result = 0.0
-            # 存储POSITION变量的值到对应列
-            self._store_expression_result(node, result)
+        return evaluate
+
+    def _compile_bool_op(self, node) -> Callable[[], Any]:
+        """编译逻辑运算符"""
+        values = [self._compile_node(v) for v in node.values]
+        operator = self._get_operator(node.op)
+        col_name = self._node_to_expr(node)
+        self.expression_store.register(col_name, bool)
+
+        def evaluate():
+            result = operator(*[value() for value in values])
+            self._store_column_result(col_name, result, bool_only=True)
             return result
-        
-        # 处理数据列变量
-        if var_name not in self.data.columns:
-            raise ValueError(f"数据中不存在列: {var_name}")
-        value = self.data[var_name].iloc[self.current_index]
-        if pd.isna(value):
-            return 0.0  # 空值处理
-        return float(value)
-    
-    def _eval_function_call(self, node):
-        """评估指标函数调用"""
-        # 检查递归深度
-        self.recursion_counter += 1
-        if self.recursion_counter > self.max_recursion_depth:
-            self.recursion_counter -= 1  # 恢复计数器
-            raise RecursionError(f"递归深度超过限制 ({self.max_recursion_depth})")
-            
-        try:
-            func_name = node.func.id
-            
-        finally:
-            self.recursion_counter -= 1  # 确保计数器减少
-        
-        # 记录函数参数
-        args_str = ", ".join([self._node_to_expr(arg) for arg in node.args])
-        
-        
-        # 特殊处理SMA指标的计算细节
-        period = None
-        if func_name.upper() == 'SMA':
-            period_val = self._eval(node.args[1]) if len(node.args) > 1 else 5
-            period = int(period_val) if isinstance(period_val, (int, float)) else 5
-            data_column = self._node_to_expr(node.args[0]).strip('\"\'')
-            start_idx = max(0, int(self.current_index) - period + 1)
-            end_idx = int(self.current_index) + 1
-            window_data = self.data[data_column].iloc[start_idx:end_idx]
-            # logger.debug(f"[DEBUG] SMA计算窗口数据({period}期): {window_data.values}")
-            # logger.debug(f"[DEBUG] SMA计算窗口索引: {max(0, self.current_index-period+1)}:{self.current_index+1}")
-        
-        # 特殊处理REF函数（需要解析器状态）
-        if func_name == 'REF':
-            if func_name not in self._indicators:
-                raise ValueError(f"不支持的指标函数: {func_name}")
-                
-            indicator = self._indicators[func_name]
-            
-            if len(node.args) != 2:
-                raise ValueError("REF需要2个参数 (REF(expr, period))")
-                
-            expr_node = node.args[0]
-            period_node = node.args[1]
-            
-            # 获取表达式字符串
-            expr_str = self._node_to_expr(expr_node)
-            period = self._eval(period_node)
-            
+        return evaluate
+
+    def _compile_bin_op(self, node) -> Callable[[], Any]:
+        """编译二元运算"""
+        left = self._compile_node(node.left)
+        right = self._compile_node(node.right)
+        operator = self._get_operator(node.op)
+        is_division = isinstance(node.op, (ast.Div, ast.FloorDiv))
+
+        def evaluate():
+            left_value = left()
+            right_value = right()
+            # 除零返回0.0（如POSITION为0时COST/POSITION不生成信号）
+            if is_division and right_value == 0:
+                return 0.0
+            return operator(left_value, right_value)
+        return evaluate
+
+    def _compile_unary_op(self, node) -> Callable[[], Any]:
+        """编译一元运算符（如 -5, +10 等）"""
+        operand = self._compile_node(node.operand)
+        if isinstance(node.op, ast.USub):  # 负号
+            return lambda: -operand()
+        elif isinstance(node.op, ast.UAdd):  # 正号
+            return lambda: +operand()
+        elif isinstance(node.op, ast.Not):  # 逻辑非
+            return lambda: not operand()
+        elif isinstance(node.op, ast.Invert):  # 按位取反 ~
+            def evaluate():
+                value = operand()
+                return ~int(value) if value is not None else None
+            return evaluate
+        else:
+            raise ValueError(f"不支持的一元运算符: {type(node.op)}")
+
+    def _compile_variable(self, node) -> Callable[[], float]:
+        """编译变量(从数据源获取或从portfolio_manager获取)"""
+        var_name = node.id
+
+        def eval_data_column() -> float:
+            cursor = self.cursor
+            values = cursor.column(var_name) if cursor is not None and cursor.data is self.data else None
+            if values is not None:
+                value = values[self.current_index]
+            else:
+                if var_name not in self.data.columns:
+                    raise ValueError(f"数据中不存在列: {var_name}")
+                value = self.data[var_name].iloc[self.current_index]
+            if pd.isna(value):
+                return 0.0  # 空值处理
+            return float(value)
+
+        if var_name in self.PORTFOLIO_VARIABLES and self.portfolio_manager:
+            self.expression_store.register(var_name, float)
+
+        if var_name == 'COST':
+            def evaluate():
+                if not self.portfolio_manager:
+                    return eval_data_column()
+                # 获取当前标的的持仓成本（多个标的共用投资组合时不混入其他标的）
+                current_symbol = self._current_symbol()
+                if current_symbol is None:
+                    result = self.portfolio_manager.get_total_cost()
+                else:
+                    position = self.portfolio_manager.get_position(current_symbol)
+                    result = position.avg_cost * position.quantity if position else 0.0
+                self._store_portfolio_variable(var_name, result)
+                return result
+            return evaluate
+        elif var_name == 'POSITION':
+            def evaluate():
+                if not self.portfolio_manager:
+                    return eval_data_column()
+                # 获取当前标的的持仓数量
+                current_symbol = self._current_symbol()
+                if current_symbol is not None:
+                    position = self.portfolio_manager.get_position(current_symbol)
+                    result = position.quantity if position else 0.0
+                else:
+                    result = 0.0
+                self._store_portfolio_variable(var_name, result)
+                return result
+            return evaluate
+        return eval_data_column
+
+    def _current_symbol(self) -> Optional[str]:
+        """当前K线的标的代码（数据无code列时返回None）"""
+        cursor = self.cursor
+        if cursor is not None and cursor.data is self.data:
+            return cursor.codes[self.current_index]
+        if self.data.empty or 'code' not in self.data.columns:
+            return None
+        return self.data['code'].iloc[self.current_index]
+
+    def _compile_function_call(self, node) -> Callable[[], Any]:
+        """编译指标函数调用"""
+        if not isinstance(node.func, ast.Name):
+            raise ValueError(f"不支持的函数调用: {self._node_to_expr(node)}")
+        # REF需要解析器状态，其他指标函数委托给IndicatorService
+        if node.func.id == 'REF':
+            return self._compile_ref_call(node)
+        return self._compile_indicator_call(node)
+
+    def _compile_ref_call(self, node) -> Callable[[], float]:
+        """编译REF函数调用"""
+        if 'REF' not in self._indicators:
+            raise ValueError("不支持的指标函数: REF")
+        if len(node.args) != 2:
+            raise ValueError("REF需要2个参数 (REF(expr, period))")
+
+        indicator = self._indicators['REF']
+        # 被引用的表达式以字符串形式传递给_ref，这里预先编译以便parse直接复用
+        expr_str = self._node_to_expr(node.args[0])
+        self.compile(expr_str)
+        period_value = self._compile_node(node.args[1])
+        # 指标、比较和逻辑表达式由其自身写入结果列（指标预热期保持NaN），REF只补充其余表达式的列
+        inner = node.args[0]
+        store_original = not (
+            isinstance(inner, (ast.Compare, ast.BoolOp))
+            or (isinstance(inner, ast.Call) and getattr(inner.func, 'id', None) != 'REF')
+        )
+
+        def evaluate():
+            self._check_recursion()
+            period = period_value()
             if not isinstance(period, (int, float)):
                 raise ValueError("REF周期必须是数字")
-                
-            return indicator.func(expr_str, int(period))
-        
-        # 其他指标函数委托给IndicatorService
-        # 从第一个参数获取数据列名
+            return indicator.func(expr_str, int(period), store_original)
+        return evaluate
+
+    def _indicator_data_column(self, node) -> str:
+        """从指标函数的第一个参数获取数据列名"""
         data_column = self._node_to_expr(node.args[0]).strip()
         # 移除可能的引号（兼容字符串字面量）
         if data_column.startswith('"') and data_column.endswith('"'):
             data_column = data_column[1:-1]
         elif data_column.startswith("'") and data_column.endswith("'"):
             data_column = data_column[1:-1]
-            
-        if data_column not in self.data.columns:
-            raise ValueError(f"数据中不存在列: {data_column}")
-        
-        # 获取数据序列
-        series = self.data[data_column]
+        return data_column
+
+    def _indicator_inputs(self, func_name: str) -> Dict[str, pd.Series]:
+        """获取指标需要的额外行情列（数据中不存在的列不传递）"""
+        columns = self.INDICATOR_INPUTS.get(func_name.upper())
+        if not columns:
+            return {}
+        return {name: self.data[column] for name, column in columns.items() if column in self.data.columns}
+
+    def _compile_indicator_call(self, node) -> Callable[[], float]:
+        """编译委托给IndicatorService的指标函数调用"""
+        func_name = node.func.id
+        if not node.args:
+            raise ValueError(f"函数 {func_name} 缺少数据列参数")
+
+        data_column = self._indicator_data_column(node)
         remaining_args = node.args[1:]
-        
-        # 生成缓存键：函数名+数据列+参数+当前索引
-        remaining_args_str = [self._node_to_expr(arg) for arg in remaining_args]
-        args_list = [data_column] + remaining_args_str
-        args_str = ",".join(args_list)
-        cache_key = f"{func_name}({args_str})@{self.current_index}"
-            
-        if cache_key in self.value_cache:
-            self.cache_hits += 1
-            cached_value = float(self.value_cache[cache_key])
-            # logger.info(f"[CACHE_HIT] {func_name}({args_str})={cached_value}")
-            if func_name.upper() == 'SMA':
-                period_val = self._eval(node.args[1]) if len(node.args) > 1 else 5
-                period = int(period_val) if isinstance(period_val, (int, float)) else 5
-                data_column = self._node_to_expr(node.args[0]).strip('\"\'')
-                # logger.info(f"[SMA_RESULT] SMA({data_column},{period})={cached_value}")
-            return cached_value
-        
-        # 计算并缓存结果
-        self.cache_misses += 1
-        
-        # 验证指标参数（特别是周期类参数）
-        for arg_node in remaining_args:
-            arg_value = self._eval(arg_node)
-            if not isinstance(arg_value, (int, float)) or arg_value <= 0:
-                raise ValueError(
-                    f"函数 {func_name} 的参数必须是正数: {arg_value}"
-                )
-                
-        # 检查数据长度是否满足指标计算要求
-        min_required = self._get_min_data_requirement(
-            func_name,
-            *[self._eval(arg) for arg in remaining_args]
-        )
-        if self.current_index < min_required:
-            return 0.0
-            
-        # 委托给IndicatorService计算指标（传递数据序列和剩余参数）
-        try:
-            # 特别记录SMA指标的计算细节
-            if func_name.upper() == 'SMA':
-                period_val = self._eval(remaining_args[0]) if remaining_args else 5
-                period = int(period_val) if isinstance(period_val, (int, float)) else 5
-                start_idx = max(0, int(self.current_index) - period + 1)
-                end_idx = int(self.current_index) + 1
-                # logger.debug(
-                #     f"SMA计算详情: 周期={period}, "
-                #     f"数据范围={start_idx}:{end_idx}, "
-                #     f"当前值={series.iloc[self.current_index]}"
-                # )
-            
-            # 确保current_index是整数
-            current_index = int(self.current_index) if not isinstance(self.current_index, int) else self.current_index
-            # 确保current_index是整数
-            current_index = int(self.current_index) if not isinstance(self.current_index, int) else self.current_index
-            result = self.indicator_service.calculate_indicator(
-                func_name,
-                series,  # 传递具体数据序列而非整个DataFrame
-                current_index,
-                *[self._eval(arg) for arg in remaining_args]  # 评估所有参数
-            )
-            
-            
-            if func_name.upper() == 'SMA':
-                pass
-                # logger.debug(f"SMA计算详情: {data_column},{period}={result}")
-        except AttributeError as e:
-            logging.error(f"不支持的指标函数: {func_name}, 错误: {str(e)}")
-            raise ValueError(f"不支持的指标函数: {func_name}") from e
-        except Exception as e:
-            logging.error(
-                f"指标计算失败: {func_name}({args_str}), "
-                f"错误: {str(e)}, 位置={self.current_index}"
-            )
-            raise
-        
-        # 使用统一的安全转换方法
-        try:
-            result_float = self._safe_convert_to_float(
-                result, 
-                f"函数 {func_name} 的返回值"
-            )
-        except ValueError as e:
-            # 添加额外上下文信息后重新抛出
-            raise ValueError(
-                f"指标函数 {func_name} 值转换失败: {str(e)}"
-            ) from e
-        
-        # 缓存并返回结果
-        self.value_cache[cache_key] = result_float
-        # 存储指标计算结果到engine.data
+        arg_values = [self._compile_node(arg) for arg in remaining_args]
+        args_str = ",".join([data_column] + [self._node_to_expr(arg) for arg in remaining_args])
         col_name = f"{func_name}({args_str})"
-        
-        # 严格检查列是否存在（包括属性和注释）
-        col_exists = (
-            col_name in self.data.columns and 
-            f"{col_name}_expr" in self.data.attrs
-        )
-        
-        if not col_exists:
-            # 初始化列并填充NaN
-            self.data[col_name] = [float('nan')] * len(self.data)
-            # 添加表达式注释
-            self.data.attrs[f"{col_name}_expr"] = f"{func_name}({args_str})"
-        
-        # 确保当前索引有效
-        if 0 <= self.current_index < len(self.data):
-            self.data.at[self.current_index, col_name] = result_float
-            
+        self.expression_store.register(col_name, float)
+
+        # 参数全部为常量时（如SMA(close,5)），参数值与最小数据要求只计算一次
+        static_args = None
+        if all(isinstance(arg, ast.Constant) for arg in remaining_args):
+            static_args = [value() for value in arg_values]
+            static_min_required = self._get_min_data_requirement(func_name, *static_args)
+
+        def evaluate():
+            self._check_recursion()
+            data = self.data
+            if data_column not in data.columns:
+                raise ValueError(f"数据中不存在列: {data_column}")
+
+            current_index = int(self.current_index)
+            cache_key = (col_name, current_index)
+            cached_value = self.value_cache.get(cache_key)
+            if cached_value is not None:
+                self.cache_hits += 1
+                return cached_value
+
+            # 计算并缓存结果
+            self.cache_misses += 1
+
+            args = static_args if static_args is not None else [value() for value in arg_values]
+            # 验证指标参数（特别是周期类参数）
+            for arg_value in args:
+                if not isinstance(arg_value, (int, float)) or arg_value <= 0:
+                    raise ValueError(
+                        f"函数 {func_name} 的参数必须是正数: {arg_value}"
+                    )
+
+            # 检查数据长度是否满足指标计算要求
+            if static_args is not None:
+                min_required = static_min_required
+            else:
+                min_required = self._get_min_data_requirement(func_name, *args)
+            if current_index < min_required:
+                return 0.0
+
+            # 委托给IndicatorService计算指标（传递数据序列和剩余参数）
+            try:
+                result = self.indicator_service.calculate_indicator(
+                    func_name,
+                    data[data_column],  # 传递具体数据序列而非整个DataFrame
+                    current_index,
+                    *args,
+                    **self._indicator_inputs(func_name)
+                )
+            except AttributeError as e:
+                logging.error(f"不支持的指标函数: {func_name}, 错误: {str(e)}")
+                raise ValueError(f"不支持的指标函数: {func_name}") from e
+            except Exception as e:
+                logging.error(
+                    f"指标计算失败: {func_name}({args_str}), "
+                    f"错误: {str(e)}, 位置={current_index}"
+                )
+                raise
+
+            # 使用统一的安全转换方法
+            try:
+                result_float = self._safe_convert_to_float(
+                    result,
+                    f"函数 {func_name} 的返回值"
+                )
+            except ValueError as e:
+                # 添加额外上下文信息后重新抛出
+                raise ValueError(
+                    f"指标函数 {func_name} 值转换失败: {str(e)}"
+                ) from e
+
+            self.value_cache[cache_key] = result_float
+
+            # 存储指标计算结果到表达式列
+            if 0 <= current_index < len(data):
+                self.expression_store.set(col_name, current_index, result_float)
+            else:
+                logger.error(f"无效索引 {current_index} 无法存储指标 {col_name}")
+
+            return result_float
+        return evaluate
+
+    def _store_series_column(self, col_name: str, values, dtype=float):
+        """整列写入表达式结果"""
+        self.expression_store.set_column(col_name, values, dtype)
+
+    def _compile_series_node(self, node, store: bool = False) -> Callable[[], Any]:
+        """将AST节点编译为整列求值的闭包（返回NumPy数组或标量）
+        Args:
+            node: AST节点
+            store: 是否整列写入中间结果列
+        """
+        if isinstance(node, (ast.Compare, ast.BoolOp)):
+            if isinstance(node, ast.Compare):
+                operands = [self._compile_series_node(node.left, store),
+                            self._compile_series_node(node.comparators[0], store)]
+                operator = self._get_operator(node.ops[0])
+            else:
+                operands = [self._compile_series_node(v, store) for v in node.values]
+                operator = self._get_operator(node.op)
+            if not store:
+                return lambda: operator(*[operand() for operand in operands])
+            col_name = self._node_to_expr(node)
+
+            def evaluate():
+                result = operator(*[operand() for operand in operands])
+                self._store_series_column(col_name, result, dtype=bool)
+                return result
+            return evaluate
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name):
+                raise ValueError(f"不支持的函数调用: {self._node_to_expr(node)}")
+            if node.func.id == 'REF':
+                return self._compile_series_ref(node, store)
+            return self._compile_series_indicator(node, store)
+        elif isinstance(node, ast.Name):
+            return self._compile_series_variable(node)
+        elif isinstance(node, ast.BinOp):
+            return self._compile_series_bin_op(node, store)
+        elif isinstance(node, ast.Constant):
+            try:
+                value = float(node.value)
+            except (TypeError, ValueError):
+                value = 0.0
+            return lambda: value
+        elif isinstance(node, ast.UnaryOp):
+            operand = self._compile_series_node(node.operand, store)
+            if isinstance(node.op, ast.USub):
+                return lambda: -operand()
+            elif isinstance(node.op, ast.UAdd):
+                return lambda: +operand()
+            elif isinstance(node.op, ast.Not):
+                return lambda: np.logical_not(operand())
+            elif isinstance(node.op, ast.Invert):
+                return lambda: np.invert(np.asarray(operand()).astype(np.int64))
+            else:
+                raise ValueError(f"不支持的一元运算符: {type(node.op)}")
         else:
-            logger.error(f"无效索引 {self.current_index} 无法存储指标 {col_name}")
-        
-        return result_float
-    
-        
+            raise ValueError(f"不支持的AST节点类型: {type(node)}")
+
+    def _compile_series_bin_op(self, node, store: bool = False) -> Callable[[], Any]:
+        """编译整列二元运算（除零位置返回0.0，与逐点计算一致）"""
+        left = self._compile_series_node(node.left, store)
+        right = self._compile_series_node(node.right, store)
+        operator = self._get_operator(node.op)
+        if not isinstance(node.op, (ast.Div, ast.FloorDiv)):
+            return lambda: operator(left(), right())
+
+        def evaluate():
+            left_value = left()
+            right_value = right()
+            if np.ndim(right_value) == 0:
+                return 0.0 if right_value == 0 else operator(left_value, right_value)
+            is_zero = right_value == 0
+            result = operator(left_value, np.where(is_zero, 1.0, right_value))
+            return np.where(is_zero, 0.0, result)
+        return evaluate
+
+    def _compile_series_variable(self, node) -> Callable[[], np.ndarray]:
+        """编译整列数据列变量（空值处理为0.0）"""
+        var_name = node.id
+
+        def evaluate():
+            if var_name not in self.data.columns:
+                raise ValueError(f"数据中不存在列: {var_name}")
+            values = self.data[var_name].to_numpy(dtype=float)
+            return np.where(np.isnan(values), 0.0, values)
+        return evaluate
+
+    def _compile_series_ref(self, node, store: bool = False) -> Callable[[], np.ndarray]:
+        """编译整列REF函数（转为带边界截断的位移）"""
+        if len(node.args) != 2:
+            raise ValueError("REF需要2个参数 (REF(expr, period))")
+        expr_node = node.args[0]
+        expr_value = self._compile_series_node(expr_node, store)
+        period_value = self._compile_series_node(node.args[1], store)
+        # 与_ref一致：只为指标表达式生成REF列；运算表达式本身也单独成列
+        expr_str = self._node_to_expr(expr_node)
+        store_ref = store and "(" in expr_str and ")" in expr_str
+        store_expr = store_ref and isinstance(expr_node, (ast.BinOp, ast.UnaryOp))
+
+        def evaluate():
+            period = period_value()
+            if not isinstance(period, (int, float)):
+                raise ValueError("REF周期必须是数字")
+            if period < 0:
+                raise ValueError("周期必须是非负数")
+            length = len(self.data)
+            raw_values = expr_value()
+            values = np.broadcast_to(np.asarray(raw_values, dtype=float), (length,))
+            # 回溯超出左边界时取首个位置的值
+            target_index = np.clip(np.arange(length) - int(period), 0, max(length - 1, 0))
+            result = values[target_index]
+            result = np.where(np.isnan(result), 0.0, result)
+            if store_expr:
+                self._store_series_column(expr_str, raw_values)
+            if store_ref:
+                self._store_series_column(f"REF({expr_str},{int(period)})", result)
+            return result
+        return evaluate
+
+    def _compile_series_indicator(self, node, store: bool = False) -> Callable[[], np.ndarray]:
+        """编译整列指标函数（委托给IndicatorService.calculate_series）"""
+        func_name = node.func.id
+        if not node.args:
+            raise ValueError(f"函数 {func_name} 缺少数据列参数")
+        data_column = self._indicator_data_column(node)
+        arg_values = [self._compile_series_node(arg, store) for arg in node.args[1:]]
+        args_str = ",".join([data_column] + [self._node_to_expr(arg) for arg in node.args[1:]])
+        col_name = f"{func_name}({args_str})"
+
+        def evaluate():
+            if data_column not in self.data.columns:
+                raise ValueError(f"数据中不存在列: {data_column}")
+            args = [value() for value in arg_values]
+            for arg_value in args:
+                if not isinstance(arg_value, (int, float)) or arg_value <= 0:
+                    raise ValueError(
+                        f"函数 {func_name} 的参数必须是正数: {arg_value}"
+                    )
+            values = np.array(
+                self.indicator_service.calculate_series(
+                    func_name, self.data[data_column], *args, **self._indicator_inputs(func_name)
+                ),
+                dtype=float
+            )
+            values[np.isnan(values)] = 0.0
+            # 数据长度不足指标计算要求的位置返回0.0（逐点计算时这些位置不写入列）
+            min_required = self._get_min_data_requirement(func_name, *args)
+            if store and min_required < len(values):
+                stored = values.copy()
+                stored[:min_required] = np.nan
+                self._store_series_column(col_name, stored)
+            values[:min_required] = 0.0
+            return values
+        return evaluate
+
     def _safe_convert_to_float(self, value: Any, context: str = "") -> float:
         """安全转换为浮点数，包含详细错误处理
         Args:
@@ -680,10 +989,12 @@ class RuleParser:
         """
         func_name = func_name.lower()
         try:
-            if func_name == 'sma':
+            if func_name in ('sma', 'ema'):
                 return int(float(args[0])) if args else 1
-            elif func_name == 'rsi':
+            elif func_name in ('rsi', 'rsi_wilder', 'atr'):
                 return int(float(args[0])) if args else 14
+            elif func_name in ('boll', 'boll_upper', 'boll_lower'):
+                return int(float(args[0])) if args else 20
             elif func_name == 'macd':
                 return max(
                     int(float(args[0])) if len(args)>0 else 12,
@@ -694,20 +1005,22 @@ class RuleParser:
         except (ValueError, TypeError):
             return 1  # 参数转换失败时返回默认值
 
-    def _ref(self, expr: str, period: int) -> float:
+    def _ref(self, expr: str, period: int, store_original: bool = True) -> float:
         """引用前period期的指标值（保留在RuleParser中）
         1. 计算原始指标并存储
         2. 计算REF指标并存储
+        Args:
+            expr: 被引用的表达式字符串
+            period: 回溯周期
+            store_original: 是否存储原始表达式的结果列（表达式自身会写入结果列时为False）
         """
         # logger.debug(f"[REF] 开始计算REF(expr={expr}, period={period})")
         
         # 先计算并存储原始指标
         if "(" in expr and ")" in expr:  # 如果是指标表达式
             original_result = self.parse(expr, mode='ref')
-            original_col = expr
-            if original_col not in self.data.columns:
-                self.data[original_col] = None
-            self.data.at[self.current_index, original_col] = original_result
+            if store_original:
+                self.expression_store.set(expr, self.current_index, original_result, dtype=object)
         
         # 检查递归深度
         self.recursion_counter += 1
@@ -746,9 +1059,7 @@ class RuleParser:
             # 确保嵌套指标计算结果已存储
             if "(" in expr and ")" in expr:  # 如果是指标表达式
                 nested_col = f"REF({expr},{period})"
-                if nested_col not in self.data.columns:
-                    self.data[nested_col] = None
-                self.data.at[original_index, nested_col] = result_numeric
+                self.expression_store.set(nested_col, original_index, result_numeric, dtype=object)
             
             self.value_cache[cache_key] = result_numeric
             # logger.info(f"[REF_RESULT] REF({expr},{period})={result_numeric} (from index {target_index})")
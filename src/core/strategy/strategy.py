@@ -1,4 +1,3 @@
-import streamlit as st
 import pandas as pd
 import logging
 from datetime import datetime
@@ -52,7 +51,7 @@ class BaseStrategy():
             self.position_cost = total_cost / abs(quantity) if quantity !=0 else 0
             self.position_size = remaining_qty
             
-        self.logger.debug(f"策略仓位更新 | 数量: {self.position_size} | 成本: {self.position_cost}") #debug
+        self.logger.debug("策略仓位更新 | 数量: %s | 成本: %s", self.position_size, self.position_cost)
         # 返回更新后的仓位信息
         return {
             'position_size': self.position_size,
@@ -78,6 +77,17 @@ class BaseStrategy():
         # 默认实现：不做任何操作
         pass
 
+    def get_debug_data(self):
+        """回测结束后的调试数据（子类可覆盖），None表示无调试数据"""
+        return None
+
+    def get_signal_mask(self, engine):
+        """预计算可能产生信号的K线位置（混合回测模式使用，子类可覆盖）
+        Returns:
+            与数据等长的bool数组，None表示需要在每根K线上调度
+        """
+        return None
+
 class FixedInvestmentStrategy(BaseStrategy):
     def __init__(self, Data, name, buy_rule_expr="", sell_rule_expr=""):
         super().__init__(Data, name, buy_rule_expr, sell_rule_expr)
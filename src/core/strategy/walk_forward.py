@@ -0,0 +1,193 @@
+"""滚动窗口（walk-forward）样本外验证
+
+把已加载的行情数据按K线位置切分为滚动的训练/测试窗口：在训练窗口上按参数网格寻优，
+用最优参数在紧随其后的测试窗口上回测，最后把各测试窗口的净值按收益率首尾拼接为样本外净值曲线。
+各窗口都在完整数据上运行（BacktestEngine.run的bar_range参数），指标序列按数据指纹缓存，
+同一进程内跨窗口、跨参数点复用，测试窗口开始前的历史数据也可用于指标预热。
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from src.core.strategy.backtesting import BacktestConfig
+from src.core.strategy.optimizer import METRICS, PointEvaluator, calculate_metrics, grid_points
+from src.support.log.logger import logger
+
+Window = Tuple[int, int, int, int]  # (训练起点, 训练终点, 测试起点, 测试终点)，均为左闭右开的K线位置
+
+
+def rolling_windows(length: int, train_size: int, test_size: int,
+                    step: Optional[int] = None, anchored: bool = False) -> List[Window]:
+    """生成滚动的训练/测试窗口
+    Args:
+        length: 数据长度
+        train_size: 训练窗口K线数
+        test_size: 测试窗口K线数
+        step: 窗口滚动步长，默认等于test_size（测试窗口首尾相接）
+        anchored: 为True时训练窗口起点固定为0（扩展窗口）
+    Returns:
+        窗口列表，只包含测试窗口完整的窗口
+    Raises:
+        ValueError: 窗口参数无效
+    """
+    step = test_size if step is None else step
+    if train_size < 1 or test_size < 1 or step < 1:
+        raise ValueError("训练窗口、测试窗口和滚动步长必须大于0")
+    windows = []
+    start = 0
+    while start + train_size + test_size <= length:
+        train_end = start + train_size
+        windows.append((0 if anchored else start, train_end, train_end, train_end + test_size))
+        start += step
+    return windows
+
+
+def _evaluate_window(evaluator: PointEvaluator, points: List[Dict[str, Any]], window: Window,
+                     sort_by: str, ascending: bool) -> Dict[str, Any]:
+    """在训练窗口上寻优并在测试窗口上验证最优参数"""
+    train_start, train_end, test_start, test_end = window
+    train = pd.DataFrame([evaluator.evaluate(point, (train_start, train_end)) for point in points])
+    train = train[train['error'].isna()].sort_values(sort_by, ascending=ascending, kind='stable')
+    if train.empty:
+        return {'window': window, 'params': None, 'train': None, 'test': None}
+
+    best = train.iloc[0]
+    params = points[best.name]  # 结果表的索引即参数点序号
+    test = evaluator.evaluate(params, (test_start, test_end), keep_equity=True)
+    return {
+        'window': window,
+        'params': params,
+        'train': {metric: best[metric] for metric in METRICS},
+        'test': test,
+    }
+
+
+_worker_state: Optional[Dict[str, Any]] = None  # 子进程内的评估器和寻优设置（进程初始化时创建）
+
+
+def _init_worker(data: pd.DataFrame, config: BacktestConfig, rules: Dict[str, str],
+                 points: List[Dict[str, Any]], sort_by: str, ascending: bool):
+    global _worker_state
+    _worker_state = {
+        'evaluator': PointEvaluator(data, config, rules),
+        'points': points,
+        'sort_by': sort_by,
+        'ascending': ascending,
+    }
+
+
+def _evaluate_window_in_worker(window: Window) -> Dict[str, Any]:
+    state = _worker_state
+    return _evaluate_window(state['evaluator'], state['points'], window, state['sort_by'], state['ascending'])
+
+
+class WalkForwardAnalyzer:
+    """滚动窗口样本外验证"""
+
+    def __init__(self, data: pd.DataFrame, config: BacktestConfig, rules: Dict[str, str],
+                 space: Dict[str, Sequence], train_size: int, test_size: int,
+                 step: Optional[int] = None, anchored: bool = False,
+                 sort_by: str = 'sharpe', ascending: bool = False, workers: int = 1):
+        """
+        Args:
+            data: 单个标的的行情数据（各窗口共用，不重新加载）
+            config: 回测基础配置
+            rules: 规则模板（同ParameterOptimizer）
+            space: 训练窗口寻优的参数网格 {参数名: 候选值列表}
+            train_size: 训练窗口K线数
+            test_size: 测试窗口K线数
+            step: 窗口滚动步长，默认等于test_size
+            anchored: 训练窗口是否固定从数据起点开始
+            sort_by: 训练窗口选取最优参数的指标
+            ascending: 指标是否越小越好
+            workers: 并行进程数（按窗口并行）
+        Raises:
+            ValueError: 参数无效
+        """
+        if sort_by not in METRICS:
+            raise ValueError(f"排序指标必须是{'/'.join(METRICS)}之一: {sort_by}")
+        if workers < 1:
+            raise ValueError("并行进程数必须大于0")
+        self.data = data
+        self.config = config
+        self.rules = {key: template for key, template in rules.items() if template}
+        self.points = grid_points(space)
+        if not self.points or not self.points[0]:
+            raise ValueError("参数网格不能为空")
+        self.windows = rolling_windows(len(data), train_size, test_size, step, anchored)
+        if not self.windows:
+            raise ValueError("数据长度不足以切分出完整的训练/测试窗口")
+        self.sort_by = sort_by
+        self.ascending = ascending
+        self.workers = workers
+
+    def run(self) -> Dict[str, Any]:
+        """执行全部窗口
+        Returns:
+            windows: 各窗口的时间范围、最优参数、训练指标和测试指标
+            equity: 拼接后的样本外净值曲线（timestamp, window, total_value）
+            summary: 样本外净值的整体指标及窗口统计
+        """
+        workers = min(self.workers, len(self.windows))
+        logger.info(f"滚动窗口验证: {len(self.windows)}个窗口, 每窗口{len(self.points)}个参数点, {workers}个进程")
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.data, self.config, self.rules, self.points,
+                                               self.sort_by, self.ascending)) as executor:
+                results = list(executor.map(_evaluate_window_in_worker, self.windows))
+        else:
+            evaluator = PointEvaluator(self.data, self.config, self.rules)
+            results = [
+                _evaluate_window(evaluator, self.points, window, self.sort_by, self.ascending)
+                for window in self.windows
+            ]
+        return self._aggregate(results)
+
+    def _aggregate(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """汇总各窗口结果并拼接样本外净值"""
+        times = pd.to_datetime(self.data['combined_time']) if 'combined_time' in self.data.columns \
+            else pd.to_datetime(self.data['date'])
+        initial_capital = self.config.initial_capital
+        rows = []
+        timestamps, window_ids, returns = [], [], []
+        for number, result in enumerate(results):
+            train_start, train_end, test_start, test_end = result['window']
+            row = {
+                'window': number,
+                'train_start': times.iloc[train_start],
+                'train_end': times.iloc[train_end - 1],
+                'test_start': times.iloc[test_start],
+                'test_end': times.iloc[test_end - 1],
+            }
+            test = result['test']
+            if test is not None:
+                row.update(result['params'])
+                row.update({f"train_{metric}": value for metric, value in result['train'].items()})
+                row.update({f"test_{metric}": test[metric] for metric in METRICS})
+                row['error'] = test['error']
+                equity = test.get('equity') or []
+                # 每个测试窗口从初始资金开始，按逐K线收益率拼接
+                values = np.array([initial_capital] + [record['total_value'] for record in equity], dtype=float)
+                returns.extend(values[1:] / values[:-1] - 1)
+                timestamps.extend(record['timestamp'] for record in equity)
+                window_ids.extend([number] * len(equity))
+            else:
+                row['error'] = "训练窗口内所有参数点回测失败"
+            rows.append(row)
+
+        stitched = initial_capital * np.cumprod(1 + np.array(returns, dtype=float))
+        equity = pd.DataFrame({'timestamp': timestamps, 'window': window_ids, 'total_value': stitched})
+        windows = pd.DataFrame(rows)
+
+        summary = calculate_metrics(
+            [{'total_value': initial_capital}] + [{'total_value': value} for value in stitched],
+            int(windows['test_trade_count'].sum()) if 'test_trade_count' in windows else 0,
+            self.config.frequency,
+        )
+        test_returns = windows['test_total_return'] if 'test_total_return' in windows else pd.Series(dtype=float)
+        summary.update({
+            'windows': len(windows),
+            'profitable_windows': int((test_returns > 0).sum()),
+            'mean_window_return': float(test_returns.mean()) if len(test_returns) else 0.0,
+        })
+        return {'windows': windows, 'equity': equity, 'summary': summary}
@@ -13,10 +13,10 @@ class ResultsDisplayUI:
 
     def render_results_tabs(self, results: Dict[str, Any], backtest_config: BacktestConfig) -> None:
         """渲染结果展示标签页"""
-        tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9, tab10, tab11 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9, tab10, tab11, tab12 = st.tabs([
             "📊 回测摘要", "💱 交易记录", "📈 仓位明细", "📉 净值曲线",
             "📈 技术指标", "📊 性能分析", "📉 回撤分析", "📊 收益分布",
-            "🎯 交易信号", "🔍 详细数据", "🐛 调试数据"
+            "🎯 交易信号", "🔍 详细数据", "🐛 调试数据", "⏱️ 性能剖析"
         ])
 
         with tab1:
@@ -41,6 +41,8 @@ class ResultsDisplayUI:
             self.render_detailed_data_tab(results)
         with tab11:
             self.render_debug_data_tab(results)
+        with tab12:
+            self.render_profiling_tab(results)
 
     def render_summary_tab(self, results: Dict[str, Any], backtest_config: BacktestConfig) -> None:
         """渲染回测摘要标签页"""
@@ -625,6 +627,39 @@ class ResultsDisplayUI:
 
             st.divider()
 
+    def render_profiling_tab(self, results: Dict[str, Any]) -> None:
+        """渲染性能剖析标签页（回测各阶段耗时、计数器和函数级剖析报告）"""
+        st.subheader("⏱️ 回测性能剖析")
+
+        perf = results.get("perf")
+        if not perf:
+            st.info("未启用性能剖析（回测配置中设置profile_mode为timers、cprofile或pyinstrument）")
+            return
+
+        stages = pd.DataFrame.from_dict(perf["stages"], orient="index")
+        if not stages.empty:
+            stages.index.name = "阶段"
+            total_wall = perf["stages"].get("run", {}).get("wall") or stages["wall"].max()
+            stages["占比(%)"] = stages["wall"] / total_wall * 100 if total_wall else 0.0
+            stages = stages.rename(columns={"wall": "墙钟时间(秒)", "cpu": "CPU时间(秒)", "calls": "调用次数"})
+            stages = stages.sort_values("墙钟时间(秒)", ascending=False)
+
+            st.write("**各阶段耗时**（阶段计时为包含式，嵌套阶段同时计入run）")
+            st.dataframe(stages, use_container_width=True)
+            st.bar_chart(stages.drop(index="run", errors="ignore")["墙钟时间(秒)"])
+
+        counters = perf.get("counters") or {}
+        if counters:
+            st.write("**计数器**")
+            columns = st.columns(min(len(counters), 4))
+            for i, (name, value) in enumerate(sorted(counters.items())):
+                with columns[i % len(columns)]:
+                    st.metric(name, f"{value:,}")
+
+        if perf.get("profile"):
+            with st.expander(f"函数级剖析报告（{perf['mode']}）"):
+                st.text(perf["profile"])
+
     def _get_equity_data(self, results: Dict[str, Any]) -> pd.DataFrame:
         """获取净值数据"""
         if "combined_equity" in results:
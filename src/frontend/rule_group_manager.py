@@ -1,5 +1,7 @@
+import copy
 import streamlit as st
 from src.core.strategy.rule_parser import RuleParser
+from src.core.strategy.rule_groups import DEFAULT_RULE_GROUPS
 from typing import Dict, Any
 
 class RuleGroupManager:
@@ -11,22 +13,7 @@ class RuleGroupManager:
     def initialize_default_rule_groups(self):
         """初始化默认规则组"""
         if 'rule_groups' not in self.session_state:
-            self.session_state.rule_groups = {
-                '金叉死叉': {
-                    'buy_rule': '(REF(SMA(close,5), 1) < REF(SMA(close,7), 1)) & (SMA(close,5) > SMA(close,7))',
-                    'sell_rule': '(REF(SMA(close,5), 1) > REF(SMA(close,7), 1)) & (SMA(close,5) < SMA(close,7))'
-                },
-                '相对强度': {
-                    'buy_rule': '(REF(RSI(close,5), 1) < 30) & (RSI(close,5) >= 30)',
-                    'sell_rule': '(REF(RSI(close,5), 1) >= 60) & (RSI(close,5) < 60)'
-                },
-                'Martingale': {
-                    'open_rule': '(close < REF(SMA(close,5), 1)) & (close > SMA(close,5))',
-                    'close_rule': '(close - (COST/POSITION))/(COST/POSITION) * 100 >= 5',
-                    'buy_rule': '(close - (COST/POSITION))/(COST/POSITION) * 100 <= -5',
-                    'sell_rule': ''
-                }
-            }
+            self.session_state.rule_groups = copy.deepcopy(DEFAULT_RULE_GROUPS)
 
         # 初始化默认规则编辑器状态
         if 'buy_rule_default' not in self.session_state:
@@ -1,9 +1,14 @@
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL_ENV = 'QSYS_LOG_LEVEL'  # 日志级别环境变量（DEBUG/INFO/WARNING/ERROR）
+DEFAULT_LOG_LEVEL = 'INFO'
 
 # 全局logger实例
 logger = logging.getLogger(__name__)
 logger.propagate = False
-logger.setLevel(logging.DEBUG)
 
 # 创建文件处理器
 # 验证日志文件路径可写
@@ -28,11 +33,53 @@ console_handler.setFormatter(logging.Formatter(
 ))
 console_handler.setLevel(logging.DEBUG)  # 确保捕获所有调试日志
 
+# 文件写入经队列交给后台线程完成，记录日志的线程（如回测循环）不等待磁盘I/O
+queue_handler = QueueHandler(queue.SimpleQueue())
+_listener = QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+_listener.start()
+atexit.register(lambda: _listener.stop())
+
+
+def _restart_listener():
+    """fork出的子进程没有后台写入线程，换用新队列并重新启动"""
+    global _listener
+    queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener)
+
 # 添加处理器（仅当无Handler时添加）
 # 确保handler只添加一次
 logger.handlers.clear()  # 先清除所有handler
-logger.addHandler(file_handler)
+logger.addHandler(queue_handler)
 logger.addHandler(console_handler)
+
+
+def configure_logging(level=None) -> int:
+    """设置日志级别
+    Args:
+        level: 级别名称或数值，默认读取环境变量QSYS_LOG_LEVEL（未设置时为INFO）
+    Returns:
+        生效的日志级别
+    Raises:
+        ValueError: 无效的级别名称
+    """
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV, DEFAULT_LOG_LEVEL)
+    if isinstance(level, str):
+        resolved = logging.getLevelName(level.upper())
+        if not isinstance(resolved, int):
+            raise ValueError(f"无效的日志级别: {level}")
+        level = resolved
+    logger.setLevel(level)
+    return level
+
+
+configure_logging()
+
 # 日志系统状态检查函数
 def check_logger_status():
     """手动检查日志系统状态"""
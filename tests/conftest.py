@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from benchmarks.synthetic_data import make_ohlcv
+
+
+@pytest.fixture
+def make_data():
+    """合成日线行情（与基准测试同一生成器）：make_data(n=200, seed=1, symbol='sh.600000')"""
+    def factory(n=200, seed=1, symbol='sh.600000'):
+        return make_ohlcv(n, 'd', symbol, seed=seed, start='2020-01-01')
+    return factory
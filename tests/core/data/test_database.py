@@ -0,0 +1,312 @@
+import os
+import sys
+import pytest
+from datetime import date, time, timedelta
+from unittest.mock import AsyncMock, MagicMock
+import asyncpg
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.data.database import (DatabaseManager, STOCK_DATA_COLUMNS, STOCK_DATA_FRAME_COLUMNS,
+                                   _COPY_ROW_DTYPE, _COPY_SIGNATURE, _LOAD_STOCK_DATA_FIELDS)
+
+
+class FakeConnection:
+    """记录COPY写入的批次和执行的SQL，在内存中模拟DataCoverage表"""
+
+    def __init__(self):
+        self.batches = []
+        self.statements = []
+        self.rows = []
+        self.fetch_args = []
+        self.coverage = {}
+        self.tables = set()  # 已存在的紧凑结构频率表
+        self.copy_data = b''
+        self.calendar_stats = {'n': 0, 'first': None, 'last': None}
+        self.transaction = MagicMock(return_value=AsyncMock())
+
+    async def execute(self, sql, *args):
+        self.statements.append(sql)
+        sql = sql.strip()
+        if sql.startswith('INSERT INTO DataCoverage'):
+            symbols, frequency = args
+            for symbol in symbols:
+                self.coverage.setdefault((symbol, frequency), [])
+        elif sql.startswith('UPDATE DataCoverage'):
+            codes, frequency, starts, ends = args
+            for symbol in set(codes):
+                self.coverage[(symbol, frequency)] = [
+                    asyncpg.Range(start, end + timedelta(days=1))
+                    for code, start, end in sorted(zip(codes, starts, ends)) if code == symbol
+                ]
+        elif sql.startswith('DELETE FROM DataCoverage'):
+            stale = [key for key in self.coverage if f"stock_bars_{key[1]}" not in self.tables]
+            for key in stale:
+                del self.coverage[key]
+            return f"DELETE {len(stale)}"
+
+    async def fetch(self, sql, *args):
+        self.statements.append(sql)
+        if 'FROM DataCoverage' in sql:
+            symbols, frequency = args
+            return [{'code': code, 'covered_ranges': ranges}
+                    for (code, freq), ranges in self.coverage.items() if code in symbols and freq == frequency]
+        self.fetch_args.append(args)
+        return self.rows
+
+    async def fetchrow(self, sql, *args):
+        self.statements.append(sql)
+        return self.calendar_stats
+
+    async def fetchval(self, sql, *args):
+        self.statements.append(sql)
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.batches.append((table, list(records), columns))
+
+    async def copy_from_query(self, sql, *args, output, format):
+        self.statements.append(sql)
+        await output(self.copy_data)
+
+
+@pytest.fixture(params=['legacy'])
+def db_manager(request):
+    manager = DatabaseManager(password='test', stock_schema=request.param)
+    conn = FakeConnection()
+    manager.pool = MagicMock()
+    manager.pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    manager.pool.acquire.return_value.__aexit__ = AsyncMock(return_value=False)
+    return manager, conn
+
+
+@pytest.mark.asyncio
+async def test_save_stock_data_copies_minute_bars_in_chunks(db_manager):
+    manager, conn = db_manager
+    data = pd.DataFrame({
+        'date': ['2024-01-02'] * 4 + ['2024-01-03'],
+        'time': ['09:35:00', '09:40:00', '09:45:00', '09:45:00', '09:35:00'],
+        'open': ['10.1', '10.2', '10.3', '10.4', '10.5'],
+        'high': [11.0] * 5,
+        'low': [9.0] * 5,
+        'close': [10.0, 10.1, 10.2, 10.3, 10.4],
+        'volume': [100, 200, 300, 400, 500],
+        'amount': [1000.0, np.nan, 3000.0, 4000.0, 5000.0],
+        'adjustflag': ['3'] * 5,
+    })
+
+    assert await manager.save_stock_data('sh.600000', data, '5', chunk_size=3)
+
+    # 重复的09:45记录只保留最后一条，4条记录分两批写入
+    assert [len(records) for _, records, _ in conn.batches] == [3, 1]
+    table, records, columns = conn.batches[0]
+    assert columns == STOCK_DATA_COLUMNS
+    assert records[0] == ('sh.600000', date(2024, 1, 2), time(9, 35), 10.1, 11.0, 9.0, 10.0,
+                          100.0, 1000.0, '3', '5')
+    assert records[1][8] is None
+    assert records[2][3] == 10.4
+    assert conn.batches[1][1][0][1:3] == (date(2024, 1, 3), time(9, 35))
+    # 每批在独立事务中建临时表、COPY并合并，最后一个事务更新覆盖记录
+    assert conn.transaction.call_count == 3
+    assert sum('INSERT INTO StockData' in sql for sql in conn.statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_save_stock_data_daily_uses_midnight(db_manager):
+    manager, conn = db_manager
+    data = pd.DataFrame({
+        'date': ['2024-01-02', '2024-01-03'],
+        'open': [10.0, 10.1], 'high': [11.0, 11.1], 'low': [9.0, 9.1],
+        'close': [10.5, 10.6], 'volume': [100.0, 200.0],
+    })
+
+    assert await manager.save_stock_data('sh.600000', data, 'd')
+
+    records = conn.batches[0][1]
+    assert [record[2] for record in records] == [time.min, time.min]
+    assert [record[8:] for record in records] == [(None, None, 'd'), (None, None, 'd')]
+
+
+@pytest.mark.asyncio
+async def test_check_data_completeness_scans_symbols_without_coverage(db_manager):
+    manager, conn = db_manager
+    conn.rows = [
+        {'code': 'sh.600000', 'range_start': date(2024, 9, 27), 'range_end': date(2024, 9, 27)},
+        {'code': 'sh.600000', 'range_start': date(2024, 10, 8), 'range_end': date(2024, 10, 8)},
+        {'code': 'sz.000001', 'range_start': date(2024, 9, 27), 'range_end': date(2024, 10, 11)},
+    ]
+    symbols = ['sh.600000', 'sh.600001', 'sz.000001']
+
+    missing = await manager.check_data_completeness_batch(symbols, '2024-09-27', '2024-10-11', 'd')
+
+    assert missing == {
+        'sh.600000': [(date(2024, 9, 27), date(2024, 9, 27)), (date(2024, 10, 8), date(2024, 10, 8))],
+        'sh.600001': [],
+        'sz.000001': [(date(2024, 9, 27), date(2024, 10, 11))],
+    }
+    # 没有覆盖记录的标的共用一次扫描查询，缺失区间在数据库中计算
+    assert len(conn.fetch_args) == 1
+    assert conn.fetch_args[0][:4] == (symbols, date(2024, 9, 27), date(2024, 10, 11), 'd')
+    # 首次扫描把交易日历写入TradingCalendar表，seq为交易日序号
+    table, records, columns = conn.batches[0]
+    assert (table, columns) == ('tradingcalendar', ('date', 'seq'))
+    assert [seq for _, seq in records] == list(range(len(records)))
+    # 扫描到的已有数据区间补记为覆盖记录（DATERANGE左闭右开），没有数据的标的不记录
+    assert conn.coverage[('sh.600000', 'd')] == [asyncpg.Range(date(2024, 9, 30), date(2024, 10, 1)),
+                                                 asyncpg.Range(date(2024, 10, 9), date(2024, 10, 12))]
+    assert conn.coverage[('sh.600001', 'd')] == [asyncpg.Range(date(2024, 9, 27), date(2024, 10, 12))]
+    assert ('sz.000001', 'd') not in conn.coverage
+    # 全部扫描标的的覆盖记录在一个事务内批量写入
+    assert sum('UPDATE DataCoverage' in sql for sql in conn.statements) == 1
+
+    # 有覆盖记录后只查覆盖表，不再扫描StockData
+    conn.rows = []
+    missing = await manager.check_data_completeness_batch(symbols[:2], '2024-09-20', '2024-10-11', 'd')
+    assert missing == {
+        'sh.600000': [(date(2024, 9, 20), date(2024, 9, 27)), (date(2024, 10, 8), date(2024, 10, 8))],
+        'sh.600001': [(date(2024, 9, 20), date(2024, 9, 26))],
+    }
+    assert len(conn.fetch_args) == 1
+    assert len(conn.batches) == 1
+
+    # verify模式强制扫描
+    assert await manager.check_data_completeness('sh.600001', '2024-09-27', '2024-10-11', 'd', verify=True) == []
+    assert len(conn.fetch_args) == 2
+
+
+@pytest.mark.asyncio
+async def test_save_stock_data_records_fetched_range_as_covered(db_manager):
+    manager, conn = db_manager
+    data = pd.DataFrame({
+        'date': ['2024-09-27', '2024-09-30'],
+        'open': [10.0, 10.1], 'high': [11.0, 11.1], 'low': [9.0, 9.1],
+        'close': [10.5, 10.6], 'volume': [100.0, 200.0],
+    })
+
+    # 国庆后停牌没有数据，但已从数据源获取过，仍记为已覆盖
+    assert await manager.save_stock_data('sh.600000', data, 'd', covered=(date(2024, 9, 27), date(2024, 10, 11)))
+    assert conn.coverage[('sh.600000', 'd')] == [asyncpg.Range(date(2024, 9, 27), date(2024, 10, 12))]
+
+    # 与已有覆盖记录只隔着周末的区间合并为一个
+    assert await manager.save_stock_data('sh.600000', data.iloc[:0], 'd', covered=(date(2024, 10, 14), date(2024, 10, 18)))
+    assert conn.coverage[('sh.600000', 'd')] == [asyncpg.Range(date(2024, 9, 27), date(2024, 10, 19))]
+    assert await manager.check_data_completeness('sh.600000', '2024-09-27', '2024-10-25', 'd') == [
+        (date(2024, 10, 21), date(2024, 10, 25)),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_compact_init_drops_coverage_of_unmigrated_frequencies():
+    """只迁移了日线时，切换到compact后分钟线的覆盖记录（对应StockData中的数据）失效"""
+    manager = DatabaseManager(password='test', stock_schema='compact')
+    conn = FakeConnection()
+    manager.pool = MagicMock()
+    manager.pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    manager.pool.acquire.return_value.__aexit__ = AsyncMock(return_value=False)
+    conn.tables = {'stock_bars_d'}
+    ranges = [asyncpg.Range(date(2024, 9, 27), date(2024, 10, 12))]
+    conn.coverage = {('sh.600000', 'd'): ranges, ('sh.600000', '5'): ranges}
+
+    await manager._init_db_tables()
+    assert conn.coverage == {('sh.600000', 'd'): ranges}
+
+    # 分钟线没有覆盖记录，完整性检查扫描紧凑表
+    conn.rows = [{'code': 'sh.600000', 'range_start': date(2024, 9, 27), 'range_end': date(2024, 10, 11)}]
+    assert await manager.check_data_completeness('sh.600000', '2024-09-27', '2024-10-11', '5') == [
+        (date(2024, 9, 27), date(2024, 10, 11)),
+    ]
+    assert len(conn.fetch_args) == 1
+
+
+@pytest.mark.asyncio
+async def test_check_data_completeness_skips_query_without_trading_days(db_manager):
+    manager, conn = db_manager
+
+    # 国庆休市期间没有交易日
+    assert await manager.check_data_completeness('sh.600000', '2024-10-01', '2024-10-07', 'd') == []
+    assert conn.statements == []
+
+
+def copy_binary(records):
+    """按COPY BINARY格式编码(day, seconds, open, high, low, close, volume, amount, adjustflag)记录"""
+    rows = np.zeros(len(records), dtype=_COPY_ROW_DTYPE)
+    rows['nfields'] = len(_LOAD_STOCK_DATA_FIELDS)
+    for i, (name, _) in enumerate(_LOAD_STOCK_DATA_FIELDS):
+        rows[f'{name}_len'] = _COPY_ROW_DTYPE[name].itemsize
+        rows[name] = [record[i] for record in records]
+    return _COPY_SIGNATURE + b'\x00' * 8 + rows.tobytes() + b'\xff\xff'
+
+
+MINUTE_RECORDS = [
+    (19724, 34500, 10.1, 11.0, 9.0, 10.0, 100.0, 1000.0, b'3         '),  # 2024-01-02 09:35
+    (19724, 34800, 10.2, 11.0, 9.0, 10.1, 200.0, np.nan, b'3         '),
+    (19725, 54000, 10.3, 11.0, 9.0, 10.2, 300.0, 3000.0, b'          '),  # 2024-01-03 15:00
+]
+
+
+@pytest.mark.asyncio
+async def test_load_stock_data_decodes_copy_binary(db_manager):
+    manager, conn = db_manager
+    conn.copy_data = copy_binary(MINUTE_RECORDS)
+
+    df = await manager.load_stock_data('sh.600000', date(2024, 1, 2), date(2024, 1, 3), '5', missing_ranges=[])
+
+    assert list(df.columns) == STOCK_DATA_FRAME_COLUMNS
+    assert df['date'].tolist() == ['2024-01-02', '2024-01-02', '2024-01-03']
+    assert df['time'].tolist() == ['09:35:00', '09:40:00', '15:00:00']
+    assert df['combined_time'].tolist() == [pd.Timestamp('2024-01-02 09:35'), pd.Timestamp('2024-01-02 09:40'),
+                                            pd.Timestamp('2024-01-03 15:00')]
+    assert df['close'].tolist() == [10.0, 10.1, 10.2]
+    assert df['amount'].isna().tolist() == [False, True, False]
+    assert df['adjustflag'].tolist() == ['3', '3', None]
+    assert set(df['code']) == {'sh.600000'} and set(df['frequency']) == {'5'}
+    assert not any('SELECT date, time' in sql for sql in conn.statements)
+
+
+@pytest.mark.asyncio
+async def test_load_stock_data_falls_back_to_rows_for_variable_width(db_manager):
+    manager, conn = db_manager
+    # 多字节adjustflag导致COPY结果不是定长格式
+    conn.copy_data = copy_binary(MINUTE_RECORDS)[:-2] + b'\x00\xff\xff'
+    conn.rows = [record[:8] + ((record[8].decode().strip() + '前').ljust(10),) for record in MINUTE_RECORDS]
+
+    df = await manager.load_stock_data('sh.600000', date(2024, 1, 2), date(2024, 1, 3), '5', missing_ranges=[])
+
+    assert len(conn.fetch_args) == 1
+    assert df['adjustflag'].tolist() == ['3前', '3前', '前']
+    assert df['combined_time'].iloc[-1] == pd.Timestamp('2024-01-03 15:00')
+
+
+@pytest.mark.asyncio
+async def test_load_stock_data_returns_empty_frame_without_rows(db_manager):
+    manager, conn = db_manager
+    conn.copy_data = copy_binary([])
+
+    df = await manager.load_stock_data('sh.600000', date(2024, 1, 2), date(2024, 1, 3), '5', missing_ranges=[])
+
+    assert df.empty
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('db_manager', ['compact'], indirect=True)
+async def test_save_stock_data_compact_schema_merges_into_partitioned_table(db_manager):
+    manager, conn = db_manager
+    data = pd.DataFrame({
+        'date': ['2024-01-31', '2024-02-01'],
+        'time': ['15:00:00', '09:35:00'],
+        'open': [10.0, 10.1], 'high': [11.0, 11.1], 'low': [9.0, 9.1],
+        'close': [10.5, 10.6], 'volume': [100.0, 200.0],
+    })
+
+    assert await manager.save_stock_data('sh.600000', data, '5')
+
+    statements = [' '.join(sql.split()) for sql in conn.statements]
+    assert any('PARTITION OF stock_bars_5 FOR VALUES FROM (\'2024-01-01\')' in sql for sql in statements)
+    assert any('PARTITION OF stock_bars_5 FOR VALUES FROM (\'2024-02-01\')' in sql for sql in statements)
+    assert any(sql.startswith('INSERT INTO stock_bars_5') for sql in statements)
+    assert not any('INSERT INTO StockData' in sql for sql in statements)
+    # 写入临时表的记录与legacy结构相同
+    assert conn.batches[0][1][1][1:3] == (date(2024, 2, 1), time(9, 35))
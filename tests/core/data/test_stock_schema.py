@@ -0,0 +1,72 @@
+import os
+import re
+import sys
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.data.stock_schema import CompactStockSchema, LegacyStockSchema, create_stock_schema
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+        self.transaction = MagicMock(return_value=AsyncMock())
+
+    async def execute(self, sql, *args):
+        self.statements.append((' '.join(sql.split()), args))
+
+
+def placeholders(sql):
+    return sorted({int(n) for n in re.findall(r'\$(\d+)', sql)})
+
+
+def test_compact_partitions_monthly_for_minutes_yearly_for_daily():
+    assert CompactStockSchema.partitions('5', date(2023, 12, 15), date(2024, 2, 1)) == [
+        ('stock_bars_5_2023_12', date(2023, 12, 1), date(2024, 1, 1)),
+        ('stock_bars_5_2024_01', date(2024, 1, 1), date(2024, 2, 1)),
+        ('stock_bars_5_2024_02', date(2024, 2, 1), date(2024, 3, 1)),
+    ]
+    assert CompactStockSchema.partitions('d', date(2023, 6, 1), date(2024, 1, 2)) == [
+        ('stock_bars_d_2023', date(2023, 1, 1), date(2024, 1, 1)),
+        ('stock_bars_d_2024', date(2024, 1, 1), date(2025, 1, 1)),
+    ]
+    with pytest.raises(ValueError):
+        CompactStockSchema.table('5; DROP TABLE StockData')
+
+
+@pytest.mark.asyncio
+async def test_compact_prepare_creates_tables_partitions_and_symbol_once():
+    schema = CompactStockSchema()
+    conn = RecordingConnection()
+
+    await schema.prepare(conn, '5', 'sh.600000', date(2024, 1, 2), date(2024, 2, 5))
+    await schema.prepare(conn, '5', 'sh.600000', date(2024, 2, 6), date(2024, 2, 7))
+
+    creates = [sql for sql, _ in conn.statements if sql.startswith('CREATE TABLE')]
+    assert len(creates) == 3
+    assert 'stock_bars_5' in creates[0] and 'PARTITION BY RANGE (ts)' in creates[0]
+    assert creates[2] == ("CREATE TABLE IF NOT EXISTS stock_bars_5_2024_02 PARTITION OF stock_bars_5 "
+                          "FOR VALUES FROM ('2024-02-01') TO ('2024-03-01')")
+    assert sum(sql.startswith('INSERT INTO stock_symbols') for sql, _ in conn.statements) == 1
+    # 建表前取咨询锁，避免并发写入同一频率时CREATE IF NOT EXISTS竞争
+    assert sum('pg_advisory_xact_lock' in sql for sql, _ in conn.statements) == 3
+
+
+@pytest.mark.parametrize('schema', [LegacyStockSchema(), CompactStockSchema()])
+def test_query_parameters_match_placeholders(schema):
+    sql, args = schema.missing_ranges_query(['sh.600000'], date(2024, 1, 2), date(2024, 1, 31), '5',
+                                            date(2024, 2, 1))
+    assert placeholders(sql) == list(range(1, len(args) + 1))
+    sql, args = schema.load_query('sh.600000', date(2024, 1, 2), date(2024, 1, 31), '5')
+    assert placeholders(sql) == list(range(1, len(args) + 1))
+
+
+def test_create_stock_schema_rejects_unknown_name():
+    assert isinstance(create_stock_schema('compact'), CompactStockSchema)
+    with pytest.raises(ValueError):
+        create_stock_schema('columnar')
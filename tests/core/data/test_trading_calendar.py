@@ -0,0 +1,70 @@
+import os
+import sys
+from datetime import date
+import numpy as np
+import chinese_calendar
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.data.trading_calendar import TradingCalendar
+
+
+def make_calendar(tmp_path):
+    return TradingCalendar(first_year=2023, last_year=2024, path=tmp_path / 'calendar.npz')
+
+
+def test_trading_days_exclude_weekends_and_holidays(tmp_path):
+    calendar = make_calendar(tmp_path)
+    # 2024年国庆：10月1日-7日休市，9月29日、10月12日周末调休补班不开市
+    days = calendar.trading_days('2024-09-27', '2024-10-14')
+    assert [day.item() for day in days] == [
+        date(2024, 9, 27), date(2024, 9, 30), date(2024, 10, 8), date(2024, 10, 9),
+        date(2024, 10, 10), date(2024, 10, 11), date(2024, 10, 14),
+    ]
+    assert calendar.count(date(2024, 10, 1), date(2024, 10, 7)) == 0
+    assert not calendar.is_trading_day('2024-10-12')
+    assert calendar.next_trading_day(date(2024, 10, 1)) == date(2024, 10, 8)
+    assert calendar.next_trading_day(date(2024, 10, 8), inclusive=False) == date(2024, 10, 9)
+
+
+def test_calendar_is_persisted_and_extended(tmp_path):
+    calendar = make_calendar(tmp_path)
+    assert (tmp_path / 'calendar.npz').exists()
+
+    cached = make_calendar(tmp_path)
+    np.testing.assert_array_equal(cached.days, calendar.days)
+
+    # 超出年份范围的查询会扩展日历并重新落盘
+    assert cached.is_trading_day('2022-01-04')
+    assert cached.first_year == 2022
+    assert TradingCalendar(first_year=2022, last_year=2024, path=tmp_path / 'calendar.npz').days[0] == np.datetime64('2022-01-04')
+
+
+def test_calendar_rebuilt_when_chinese_calendar_upgraded(tmp_path, monkeypatch):
+    """缓存构建时chinese_calendar未收录的年份只排除周末，升级后重建以纳入节假日"""
+    def get_holidays(start, end, include_weekends=True):
+        raise NotImplementedError
+
+    with monkeypatch.context() as patch:
+        patch.setattr(chinese_calendar, 'get_holidays', get_holidays)
+        patch.setattr(chinese_calendar, '__version__', '0.0.1')
+        assert make_calendar(tmp_path).is_trading_day('2024-10-08')
+        assert make_calendar(tmp_path).is_trading_day('2024-10-01')
+
+    assert not make_calendar(tmp_path).is_trading_day('2024-10-01')
+
+
+def test_uncovered_and_merged_ranges(tmp_path):
+    calendar = make_calendar(tmp_path)
+    covered = [(date(2024, 9, 27), date(2024, 9, 30)), (date(2024, 10, 10), date(2024, 10, 10))]
+    assert calendar.uncovered_ranges('2024-09-27', '2024-10-14', covered, exclude=[date(2024, 10, 14)]) == [
+        (date(2024, 10, 8), date(2024, 10, 9)),
+        (date(2024, 10, 11), date(2024, 10, 11)),
+    ]
+    # 重叠、相邻或只隔着非交易日的区间合并
+    assert calendar.merge_ranges([
+        ('2024-10-08', '2024-10-11'), ('2024-09-20', '2024-09-30'),
+        ('2024-10-14', '2024-10-15'), ('2024-10-17', '2024-10-18'),
+    ]) == [(date(2024, 9, 20), date(2024, 10, 15)), (date(2024, 10, 17), date(2024, 10, 18))]
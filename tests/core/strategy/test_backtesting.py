@@ -0,0 +1,284 @@
+import os
+import subprocess
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.strategy.backtesting import BacktestEngine, BacktestConfig, run_rule_backtest
+from src.core.execution.Trader import InMemoryOrderStore
+from src.core.strategy.rule_based_strategy import RuleBasedStrategy
+from src.core.strategy.indicators import IndicatorService
+from src.core.strategy.rule_groups import DEFAULT_RULE_GROUPS
+
+GOLDEN_CROSS = {
+    'open_rule': '(REF(SMA(close,5), 1) < REF(SMA(close,7), 1)) & (SMA(close,5) > SMA(close,7))',
+    'close_rule': '(REF(SMA(close,5), 1) > REF(SMA(close,7), 1)) & (SMA(close,5) < SMA(close,7))',
+}
+MARTINGALE = {
+    'open_rule': '(close < REF(SMA(close,5), 1)) & (close > SMA(close,5))',
+    'close_rule': '(close - (COST/POSITION))/(COST/POSITION) * 100 >= 5',
+    'buy_rule': '(close - (COST/POSITION))/(COST/POSITION) * 100 <= -5',
+}
+
+
+def run_backtest(data, rules, execution_mode):
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        frequency='d',
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.1},
+        execution_mode=execution_mode,
+    )
+    engine = BacktestEngine(config, data)
+    strategy = RuleBasedStrategy(
+        data, 'test', IndicatorService(),
+        buy_rule_expr=rules.get('buy_rule', ''),
+        sell_rule_expr=rules.get('sell_rule', ''),
+        open_rule_expr=rules.get('open_rule', ''),
+        close_rule_expr=rules.get('close_rule', ''),
+        portfolio_manager=engine.portfolio_manager,
+    )
+    engine.register_strategy(strategy)
+    engine.run(pd.to_datetime('2020-01-01'), pd.to_datetime('2030-01-01'))
+    return engine.get_results()
+
+
+@pytest.mark.parametrize("rules", [GOLDEN_CROSS, MARTINGALE], ids=['golden_cross', 'martingale'])
+def test_hybrid_matches_event(make_data, rules):
+    """混合模式与事件驱动模式的交易、净值和信号应完全一致"""
+    event = run_backtest(make_data(), rules, 'event')
+    hybrid = run_backtest(make_data(), rules, 'hybrid')
+
+    def trades(results):
+        return [(t['timestamp'], t['direction'], t['price'], t['quantity']) for t in results['trades']]
+
+    assert len(trades(event)) > 0
+    assert trades(hybrid) == trades(event)
+
+    def equity(results):
+        return [(e['timestamp'], e['total_value'], e['close'], e['drawdown_pct']) for e in results['equity_records']]
+
+    assert equity(hybrid) == equity(event)
+    assert hybrid['price_data']['signal'].tolist() == event['price_data']['signal'].tolist()
+
+
+@pytest.mark.parametrize("execution_mode", ['event', 'hybrid'])
+def test_equity_marked_to_market_every_bar(make_data, execution_mode):
+    """净值按每根K线的收盘价重估持仓：两次交易之间total_value随收盘价变化"""
+    results = run_backtest(make_data(), GOLDEN_CROSS, execution_mode)
+    equity = pd.DataFrame(results['equity_records'])
+    quantity = equity['positions_value'] / equity['close']
+    np.testing.assert_allclose(quantity, quantity.round(), atol=1e-6)
+    np.testing.assert_allclose(equity['total_value'], equity['cash'] + quantity.round() * equity['close'])
+    held = equity[quantity.round() > 0]
+    assert held['total_value'].nunique() > len(results['trades'])
+
+
+def test_buy_sell_rules_trade(make_data):
+    """买入/卖出规则（BUY/SELL信号）按固定比例仓位策略开仓、加仓和减仓"""
+    results = run_backtest(make_data(), DEFAULT_RULE_GROUPS['金叉死叉'], 'event')
+    directions = {trade['direction'] for trade in results['trades']}
+    assert directions == {'BUY', 'SELL'}
+
+
+def test_invalid_execution_mode():
+    with pytest.raises(ValueError):
+        BacktestConfig(
+            start_date='20200101',
+            end_date='20301231',
+            target_symbol='sh.600000',
+            frequency='d',
+            execution_mode='vectorized',
+        )
+
+
+def test_debug_mode_off_skips_debug_data(make_data):
+    data = make_data()
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        frequency='d',
+        debug_mode='off',
+    )
+    engine = BacktestEngine(config, data)
+    engine.register_strategy(RuleBasedStrategy(
+        data, 'test', IndicatorService(),
+        open_rule_expr=GOLDEN_CROSS['open_rule'],
+        close_rule_expr=GOLDEN_CROSS['close_rule'],
+        portfolio_manager=engine.portfolio_manager,
+    ))
+    engine.run(pd.to_datetime('2020-01-01'), pd.to_datetime('2030-01-01'))
+    assert engine.get_results()['debug_data'] == {}
+
+
+def run_multi_symbol(make_data, parallel_workers):
+    data = {
+        'sh.600000': make_data(seed=1),
+        'sh.600001': make_data(seed=2, symbol='sh.600001'),
+    }
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        target_symbols=list(data),
+        frequency='d',
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.1},
+        parallel_workers=parallel_workers,
+    )
+    engine = BacktestEngine(config, data)
+    engine.register_strategy(RuleBasedStrategy(
+        data['sh.600000'], 'test', IndicatorService(),
+        open_rule_expr=MARTINGALE['open_rule'],
+        close_rule_expr=MARTINGALE['close_rule'],
+        buy_rule_expr=MARTINGALE['buy_rule'],
+    ))
+    return engine.run_multi_symbol(pd.to_datetime('2020-01-01'), pd.to_datetime('2030-01-01'))
+
+
+def test_parallel_multi_symbol_matches_sequential(make_data):
+    """多进程执行多标的回测与顺序执行结果一致"""
+    sequential = run_multi_symbol(make_data, 1)
+    parallel = run_multi_symbol(make_data, 2)
+
+    def trades(results):
+        return [(t['timestamp'], t['symbol'], t['direction'], t['price'], t['quantity']) for t in results['trades']]
+
+    assert {t[1] for t in trades(sequential)} == {'sh.600000', 'sh.600001'}
+    assert trades(parallel) == trades(sequential)
+    pd.testing.assert_frame_equal(parallel['combined_equity'], sequential['combined_equity'])
+    assert parallel['debug_data'].keys() == sequential['debug_data'].keys()
+
+
+def test_invalid_parallel_workers():
+    with pytest.raises(ValueError):
+        BacktestConfig(
+            start_date='20200101',
+            end_date='20301231',
+            target_symbol='sh.600000',
+            frequency='d',
+            parallel_workers=0,
+        )
+
+
+def test_shared_portfolio_mode(make_data):
+    """共享资金模式：一个投资组合、合并时间轴，净值按价格矩阵逐时间点重估"""
+    data = {
+        'sh.600000': make_data(seed=1),
+        # 第二个标的缺少部分交易日
+        'sh.600001': make_data(seed=2, symbol='sh.600001').iloc[::2].reset_index(drop=True),
+    }
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        target_symbols=list(data),
+        frequency='d',
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.1},
+        portfolio_mode='shared',
+    )
+    engine = BacktestEngine(config, data)
+    engine.register_strategy(RuleBasedStrategy(
+        data['sh.600000'], 'test', IndicatorService(),
+        open_rule_expr=MARTINGALE['open_rule'],
+        close_rule_expr=MARTINGALE['close_rule'],
+        buy_rule_expr=MARTINGALE['buy_rule'],
+    ))
+    results = engine.run_multi_symbol(pd.to_datetime('2020-01-01'), pd.to_datetime('2030-01-01'))
+
+    assert {t['symbol'] for t in results['trades']} == set(data)
+    combined = results['combined_equity']
+    assert len(combined) == len(data['sh.600000'])
+    np.testing.assert_allclose(
+        combined['total_value'], [r['total_value'] for r in results['equity_records']], rtol=1e-12
+    )
+    assert (combined['cash'] >= 0).all()
+
+    # 各标的盈亏归因之和等于组合盈亏
+    final_capitals = sum(r['summary']['final_capital'] for r in results['individual'].values())
+    assert final_capitals == pytest.approx(combined['total_value'].iloc[-1])
+
+
+def test_event_queue_dispatch_in_order(make_data):
+    from src.event_bus.event_types import OrderEvent
+
+    class RebalanceOrderEvent(OrderEvent):
+        pass
+
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        frequency='d',
+    )
+    engine = BacktestEngine(config, make_data())
+    handled = []
+    engine.register_handler(OrderEvent, lambda event: handled.append(event.order_id))
+
+    # 同一时间点的一批订单（含未直接注册处理器的子类）按入队顺序处理
+    timestamp = pd.Timestamp('2020-01-01')
+    for i in range(500):
+        event_class = RebalanceOrderEvent if i % 2 else OrderEvent
+        engine.push_event(event_class(timestamp, 'test', f"sh.{i:06d}", 'BUY', 10.0, 100, order_id=str(i)))
+    engine._process_event_queue()
+
+    assert handled == [str(i) for i in range(500)]
+    assert len(engine.event_queue) == 0
+
+
+def test_debug_logging_follows_configured_level(make_data):
+    from src.support.log.logger import configure_logging
+
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        frequency='d',
+    )
+    try:
+        configure_logging('INFO')
+        assert not BacktestEngine(config, make_data())._log_debug
+        configure_logging('DEBUG')
+        assert BacktestEngine(config, make_data())._log_debug
+        with pytest.raises(ValueError):
+            configure_logging('VERBOSE')
+    finally:
+        configure_logging()
+
+
+def test_backtesting_import_is_headless():
+    """导入回测引擎不应加载Streamlit和数据库模块"""
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[1]); import src.core.strategy.backtesting; "
+        "print(sorted({'streamlit', 'asyncpg', 'src.core.data.database'} & set(sys.modules)))"
+    )
+    output = subprocess.run([sys.executable, '-c', code, project_root],
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip().splitlines()[-1] == '[]'
+
+
+def test_run_rule_backtest_without_database(make_data):
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        frequency='d',
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.1},
+    )
+    assert isinstance(BacktestEngine(config, make_data()).trade_order_manager.db_manager, InMemoryOrderStore)
+
+    results = run_rule_backtest(config, make_data(), GOLDEN_CROSS)
+    expected = run_backtest(make_data(), GOLDEN_CROSS, 'event')
+    assert results['trades']
+    assert [(t['timestamp'], t['direction'], t['quantity']) for t in results['trades']] == \
+        [(t['timestamp'], t['direction'], t['quantity']) for t in expected['trades']]
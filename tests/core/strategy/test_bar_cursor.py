@@ -0,0 +1,43 @@
+import os
+import sys
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.strategy.bar_cursor import BarCursor
+
+
+def make_data():
+    return pd.DataFrame({
+        'code': ['sh.600000'] * 3,
+        'close': [10.0, 11.0, 12.0],
+        'volume': [100.0, 200.0, 300.0],
+        'combined_time': pd.date_range('2024-01-01', periods=3, freq='D'),
+        'signal': 0,
+    })
+
+
+def test_scalar_access_matches_dataframe():
+    data = make_data()
+    cursor = BarCursor(data)
+    for idx in range(len(data)):
+        cursor.move_to(idx)
+        assert cursor.close == data.loc[idx, 'close']
+        assert cursor.time == data.iloc[idx]['combined_time']
+        assert cursor.code == data['code'].iloc[idx]
+        assert cursor.value('volume') == data['volume'].iloc[idx]
+    assert cursor.column('missing') is None
+
+
+def test_writes_deferred_until_flush():
+    data = make_data()
+    cursor = BarCursor(data)
+    cursor.set_value('signal', 1, -1)
+    assert cursor.value('signal', 1) == -1
+    assert data['signal'].tolist() == [0, 0, 0]
+
+    cursor.flush()
+    assert data['signal'].tolist() == [0, -1, 0]
+    assert data['signal'].dtype == 'int64'
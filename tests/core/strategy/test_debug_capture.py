@@ -0,0 +1,64 @@
+import os
+import sys
+import pytest
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.strategy.debug_capture import DebugCapture
+from src.core.strategy.expression_store import ExpressionStore
+
+
+def make_data(n=10):
+    return pd.DataFrame({'close': [float(i) for i in range(n)]})
+
+
+def run_capture(capture, data):
+    """模拟逐K线评估：每根K线写入中间列后采集"""
+    store = ExpressionStore(len(data))
+    store.register('SMA(close,2)', float)
+    store.register('close > 3', bool)
+    for idx in range(len(data)):
+        store.set('SMA(close,2)', idx, idx - 0.5)
+        store.set('close > 3', idx, idx > 3, dtype=bool)
+        capture.capture(store, idx)
+    return store
+
+
+def test_snapshot_mode():
+    data = make_data()
+    capture = DebugCapture('snapshot')
+    store = run_capture(capture, data)
+    result = capture.collect(data, store)
+    assert result.columns.tolist() == ['close', 'SMA(close,2)', 'close > 3']
+    assert result['SMA(close,2)'].tolist() == [idx - 0.5 for idx in range(len(data))]
+    assert result['close > 3'].dtype == bool
+    assert result.attrs['close > 3_expr'] == 'close > 3'
+    assert 'SMA(close,2)' not in data.columns  # 行情数据本身不被修改
+    assert capture.collect(data, store) is result  # 只组装一次
+
+
+def test_off_mode():
+    data = make_data()
+    capture = DebugCapture('off')
+    store = run_capture(capture, data)
+    assert capture.collect(data, store) is None
+
+
+def test_sampled_ring_buffer_keeps_latest_samples():
+    data = make_data()
+    capture = DebugCapture('sampled', sample_interval=2, buffer_size=3)
+    store = run_capture(capture, data)
+    result = capture.collect(data, store)
+    # 采样点为0,2,4,6,8，缓冲区只保留最后3个
+    assert result.index.tolist() == [4, 6, 8]
+    assert result['close'].tolist() == [4.0, 6.0, 8.0]
+    assert result['SMA(close,2)'].tolist() == [3.5, 5.5, 7.5]
+    assert result['close > 3'].tolist() == [True, True, True]
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        DebugCapture('full')
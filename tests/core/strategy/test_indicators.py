@@ -0,0 +1,173 @@
+import os
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.strategy.indicators import IndicatorService
+from src.core.strategy.indicator_kernels import SMAIndicator
+
+
+@pytest.fixture
+def ohlc():
+    rng = np.random.default_rng(3)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, 500)))
+    return pd.DataFrame({
+        'high': close * (1 + rng.uniform(0, 0.02, 500)),
+        'low': close * (1 - rng.uniform(0, 0.02, 500)),
+        'close': close,
+    })
+
+
+def incremental(service, func_name, series, *args, **inputs):
+    """逐K线查询全部位置"""
+    return np.array([
+        service.calculate_indicator(func_name, series, i, *args, **inputs)
+        for i in range(len(series))
+    ])
+
+
+def pandas_rsi(close, period, wilder):
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0.0)
+    loss = -delta.where(delta < 0, 0.0)
+    if wilder:
+        avg_gain = gain.ewm(alpha=1 / period, adjust=False).mean()
+        avg_loss = loss.ewm(alpha=1 / period, adjust=False).mean()
+    else:
+        avg_gain = gain.rolling(period).mean()
+        avg_loss = loss.rolling(period).mean()
+    rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    rsi[:period] = 50.0
+    return rsi.to_numpy()
+
+
+def test_sma_matches_pandas(ohlc):
+    result = incremental(IndicatorService(), 'sma', ohlc['close'], 10)
+    expected = ohlc['close'].rolling(10).mean().fillna(0.0).to_numpy()
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+
+def test_ema_matches_pandas(ohlc):
+    result = incremental(IndicatorService(), 'ema', ohlc['close'], 12)
+    np.testing.assert_allclose(result, ohlc['close'].ewm(span=12).mean().to_numpy(), rtol=1e-12)
+
+
+@pytest.mark.parametrize("func_name,wilder", [('rsi', False), ('rsi_wilder', True)])
+def test_rsi_matches_pandas(ohlc, func_name, wilder):
+    result = incremental(IndicatorService(), func_name, ohlc['close'], 14)
+    np.testing.assert_allclose(result, pandas_rsi(ohlc['close'], 14, wilder), rtol=1e-9)
+
+
+def test_macd_matches_pandas(ohlc):
+    close = ohlc['close']
+    macd_line = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    expected = (macd_line - macd_line.ewm(span=9).mean()).to_numpy(copy=True)
+    expected[:34] = macd_line.to_numpy()[:34]  # 信号线数据不足时只返回MACD线
+    expected[:26] = 0.0
+
+    result = incremental(IndicatorService(), 'macd', close, 12, 26, 9)
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_bollinger_matches_pandas(ohlc):
+    close = ohlc['close']
+    mid = close.rolling(20).mean()
+    std = close.rolling(20).std()
+    service = IndicatorService()
+    for func_name, expected in (('boll', mid), ('boll_upper', mid + 2 * std), ('boll_lower', mid - 2 * std)):
+        result = incremental(service, func_name, close, 20, 2)
+        np.testing.assert_allclose(result, expected.fillna(0.0).to_numpy(), rtol=1e-9)
+
+
+def test_atr_matches_pandas(ohlc):
+    prev_close = ohlc['close'].shift()
+    true_range = pd.concat([
+        ohlc['high'] - ohlc['low'],
+        (ohlc['high'] - prev_close).abs(),
+        (ohlc['low'] - prev_close).abs(),
+    ], axis=1).max(axis=1)
+    expected = true_range.rolling(14).mean().fillna(0.0).to_numpy()
+
+    result = incremental(IndicatorService(), 'atr', ohlc['close'], 14, high=ohlc['high'], low=ohlc['low'])
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("func_name,args", [
+    ('sma', (5,)), ('ema', (12,)), ('rsi', (14,)), ('rsi_wilder', (14,)), ('macd', (12, 26, 9)),
+    ('boll', (20, 2)), ('boll_upper', (20, 2)), ('boll_lower', (20, 2)), ('atr', (14,)),
+])
+def test_series_matches_per_bar_lookup(ohlc, func_name, args):
+    """整列计算与逐点查询读取同一缓存结果（含缺失值）"""
+    close = ohlc['close'].copy()
+    close[[30, 31, 200]] = np.nan
+    inputs = {'high': ohlc['high'], 'low': ohlc['low']} if func_name == 'atr' else {}
+    service = IndicatorService()
+    result = service.calculate_series(func_name, close, *args, **inputs)
+    np.testing.assert_array_equal(incremental(service, func_name, close, *args, **inputs), result)
+    assert np.isfinite(result[32:]).all()
+
+
+def test_unsupported_indicator(ohlc):
+    with pytest.raises(ValueError):
+        IndicatorService().calculate_indicator('kdj', ohlc['close'], 0, 9)
+
+
+def test_precompute_and_invalidate(ohlc):
+    """整列预计算后逐点查询直接读取缓存，数据对象变化后需显式失效"""
+    service = IndicatorService()
+    close = ohlc['close']
+    cached = service.precompute('sma', close, 10)
+    assert service.calculate_indicator('sma', close, 50, 10) == cached[50]
+    service.precompute('atr', close, 14, high=ohlc['high'], low=ohlc['low'])
+
+    other = pd.Series(close.to_numpy() * 2, name='close')
+    service.precompute('sma', other, 10)
+    assert service.invalidate(ohlc) == 2
+    assert service.invalidate(other) == 1
+    assert service.invalidate() == 0
+
+
+def test_column_computed_once(ohlc, monkeypatch):
+    """预计算后的逐点查询和整列计算都读取缓存，不重复计算"""
+    calls = []
+    compute_series = SMAIndicator.compute_series
+    monkeypatch.setattr(SMAIndicator, 'compute_series', lambda self: calls.append(1) or compute_series(self))
+    service = IndicatorService()
+    close = ohlc['close']
+    cached = service.precompute('sma', close, 10)
+    np.testing.assert_allclose(cached, close.rolling(10).mean().fillna(0.0).to_numpy(), rtol=1e-12)
+    assert service.calculate_indicator('sma', close, 300, 10) == cached[300]
+    np.testing.assert_array_equal(service.calculate_series('sma', close, 10), cached)
+    assert len(calls) == 1
+
+
+def test_cache_keyed_by_data_content(ohlc):
+    """共享的服务按数据内容区分序列，相同内容的新数据对象直接命中"""
+    service = IndicatorService()
+    close = ohlc['close']
+    other = pd.Series(close.to_numpy()[::-1].copy(), name='close')
+    assert service.calculate_indicator('sma', other, 100, 10) == pytest.approx(other.rolling(10).mean()[100])
+    assert service.calculate_indicator('sma', close, 100, 10) == pytest.approx(close.rolling(10).mean()[100])
+
+    copy = ohlc.copy()
+    service.calculate_indicator('sma', copy['close'], 100, 10)
+    stats = service.cache_stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (2, 1, 2)
+
+
+def test_cache_evicts_least_recently_used(ohlc):
+    close = ohlc['close']
+    service = IndicatorService(max_cache_bytes=3 * 2 * close.to_numpy().nbytes)
+    for window in (5, 10, 5, 20, 30):
+        service.calculate_indicator('sma', close, 100, window)
+    stats = service.cache_stats()
+    assert (stats['entries'], stats['evictions']) == (3, 1)
+    assert stats['bytes'] <= stats['max_bytes']
+    # 最近使用过的window=5保留，window=10被淘汰
+    service.calculate_indicator('sma', close, 100, 5)
+    assert service.cache_stats()['hits'] == stats['hits'] + 1
@@ -0,0 +1,41 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.strategy.market_timeline import MarketTimeline
+
+
+def make_timeline():
+    days = pd.date_range('2024-01-01', periods=4, freq='D')
+    return MarketTimeline({
+        'sh.600000': days[[0, 1, 3]],
+        'sh.600001': days[[1, 2, 3]],
+    })
+
+
+def test_steps_follow_merged_time_then_symbol_order():
+    timeline = make_timeline()
+    assert len(timeline) == 4
+    assert list(timeline.iter_steps()) == [
+        (0, [(0, 0)]),
+        (1, [(0, 1), (1, 0)]),
+        (2, [(1, 1)]),
+        (3, [(0, 2), (1, 2)]),
+    ]
+
+
+def test_price_matrix_forward_fills_missing_bars():
+    timeline = make_timeline()
+    prices = timeline.price_matrix({
+        'sh.600000': [10.0, 11.0, 13.0],
+        'sh.600001': [20.0, 21.0, 22.0],
+    })
+    np.testing.assert_array_equal(prices, [
+        [10.0, 11.0, 11.0, 13.0],
+        [np.nan, 20.0, 21.0, 22.0],
+    ])
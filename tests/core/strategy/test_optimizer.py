@@ -0,0 +1,74 @@
+import os
+import sys
+import pytest
+import pandas as pd
+from unittest.mock import Mock
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.strategy.backtesting import BacktestConfig
+from src.core.strategy.optimizer import (ParameterOptimizer, grid_points, random_points, calculate_metrics,
+                                         load_price_data)
+
+RULES = {
+    'open_rule': '(REF(SMA(close,{fast}),1) < REF(SMA(close,{slow}),1)) & (SMA(close,{fast}) > SMA(close,{slow}))',
+    'close_rule': '(REF(SMA(close,{fast}),1) > REF(SMA(close,{slow}),1)) & (SMA(close,{fast}) < SMA(close,{slow}))',
+}
+
+
+def make_optimizer(data, workers=1):
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        frequency='d',
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.1},
+    )
+    return ParameterOptimizer(data, config, RULES, workers=workers)
+
+
+def test_parameter_spaces():
+    assert grid_points({'fast': [3, 5], 'slow': [10]}) == [{'fast': 3, 'slow': 10}, {'fast': 5, 'slow': 10}]
+    points = random_points({'fast': (2, 8), 'percent': (0.1, 0.5), 'slow': [10, 20]}, 20, seed=7)
+    assert points == random_points({'fast': (2, 8), 'percent': (0.1, 0.5), 'slow': [10, 20]}, 20, seed=7)
+    assert all(isinstance(p['fast'], int) and 2 <= p['fast'] <= 8 for p in points)
+    assert all(0.1 <= p['percent'] <= 0.5 and p['slow'] in (10, 20) for p in points)
+
+
+def test_metrics():
+    history = [{'total_value': v} for v in (100.0, 110.0, 99.0, 121.0)]
+    metrics = calculate_metrics(history, 3, 'd')
+    assert metrics['total_return'] == pytest.approx(21.0)
+    assert metrics['max_drawdown'] == pytest.approx(10.0)
+    assert metrics['trade_count'] == 3
+
+
+def test_ranked_results_parallel_matches_sequential(make_data):
+    points = grid_points({'fast': [3, 5], 'slow': [10, 20], 'position.percent': [0.1, 0.2]})
+    sequential = make_optimizer(make_data()).run(points)
+    assert len(sequential) == 8
+    assert sequential['error'].isna().all()
+    assert sequential['rank'].tolist() == list(range(1, 9))
+    assert sequential['sharpe'].is_monotonic_decreasing
+    # 仓位比例参数生效
+    by_percent = sequential.groupby('position.percent')['total_return'].apply(lambda r: r.abs().sum())
+    assert by_percent[0.2] > by_percent[0.1]
+
+    parallel = make_optimizer(make_data(), workers=2).run(points)
+    pd.testing.assert_frame_equal(parallel, sequential)
+
+
+def test_load_price_data_without_time_column(tmp_path, make_data):
+    path = tmp_path / 'daily.csv'
+    make_data(5).drop(columns=['code', 'time', 'combined_time']).iloc[::-1].to_csv(path, index=False)
+    data = load_price_data(str(path), 'sh.600000')
+    assert data['code'].eq('sh.600000').all()
+    assert data['combined_time'].tolist() == list(pd.bdate_range('2020-01-01', periods=5))
+
+
+def test_invalid_rule_template(make_data):
+    with pytest.raises(ValueError):
+        ParameterOptimizer(make_data(), Mock(), {'entry_rule': 'close > {x}'})
@@ -0,0 +1,88 @@
+import os
+import sys
+import pytest
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.strategy.backtesting import BacktestEngine, BacktestConfig
+from src.core.strategy.rule_based_strategy import RuleBasedStrategy
+from src.core.strategy.indicators import IndicatorService
+from src.core.strategy.profiler import BacktestProfiler
+
+GOLDEN_CROSS = {
+    'open_rule': '(REF(SMA(close,5), 1) < REF(SMA(close,7), 1)) & (SMA(close,5) > SMA(close,7))',
+    'close_rule': '(REF(SMA(close,5), 1) > REF(SMA(close,7), 1)) & (SMA(close,5) < SMA(close,7))',
+}
+
+
+def run_backtest(data, profile_mode, execution_mode='event'):
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        frequency='d',
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.1},
+        execution_mode=execution_mode,
+        profile_mode=profile_mode,
+    )
+    engine = BacktestEngine(config, data)
+    engine.register_strategy(RuleBasedStrategy(
+        data, 'test', IndicatorService(),
+        open_rule_expr=GOLDEN_CROSS['open_rule'],
+        close_rule_expr=GOLDEN_CROSS['close_rule'],
+        portfolio_manager=engine.portfolio_manager,
+    ))
+    engine.run(pd.to_datetime('2020-01-01'), pd.to_datetime('2030-01-01'))
+    return engine.get_results()
+
+
+def test_profiling_off_by_default(make_data):
+    assert run_backtest(make_data(), 'off')['perf'] is None
+
+
+def test_timers_report_stages_and_counters(make_data):
+    results = run_backtest(make_data(), 'timers')
+    perf = results['perf']
+    stages, counters = perf['stages'], perf['counters']
+
+    for name in ('run', 'prepare_data', 'indicators', 'strategies', 'events', 'equity'):
+        assert name in stages
+    assert stages['strategies']['calls'] == 200
+    assert stages['run']['wall'] >= stages['strategies']['wall']
+    assert counters['bars'] == 200
+    assert counters['rule_evaluations'] == 400  # 每根K线评估开仓、清仓两条规则
+    assert counters['fills'] == len(results['trades']) > 0
+    assert counters['orders'] >= counters['fills']
+    assert perf['profile'] is None
+
+
+def test_hybrid_timers_count_dispatched_bars_only(make_data):
+    perf = run_backtest(make_data(), 'timers', execution_mode='hybrid')['perf']
+    assert perf['counters']['series_evaluations'] == 2
+    assert 0 < perf['counters']['bars'] < 200
+    assert 'signal_mask' in perf['stages']
+
+
+def test_cprofile_report_and_merge(make_data):
+    perf = run_backtest(make_data(), 'cprofile')['perf']
+    assert 'cumulative' in perf['profile']
+
+    merged = BacktestProfiler.merge([perf, None, perf])
+    assert merged['counters']['bars'] == 2 * perf['counters']['bars']
+    assert merged['stages']['run']['calls'] == 2
+    assert BacktestProfiler.merge([None]) is None
+
+
+def test_invalid_profile_mode():
+    with pytest.raises(ValueError):
+        BacktestConfig(
+            start_date='20200101',
+            end_date='20301231',
+            target_symbol='sh.600000',
+            frequency='d',
+            profile_mode='perf',
+        )
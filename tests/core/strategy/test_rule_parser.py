@@ -169,5 +169,98 @@ def test_performance():
     duration = time.time() - start
     assert duration < 2.0, f"性能不达标: 1000次评估耗时 {duration:.2f}秒 > 2秒"
 
+def test_compile_reuses_plan():
+    """测试规则只编译一次，逐K线求值不再重复解析"""
+    data = setup_data()
+    mock_service = create_mock_indicator_service()
+    parser = RuleParser(data, mock_service)
+
+    rule = "REF(SMA(close,5),1) < SMA(close,5)"
+    compiled = parser.compile(rule)
+    assert parser.compile(rule) is compiled
+
+    import ast
+    from unittest.mock import patch
+    with patch.object(ast, 'parse', side_effect=AssertionError("不应重复解析")):
+        for i in range(1, len(data)):
+            parser.evaluate_at(rule, i)
+    assert compiled.functions == {'REF', 'SMA'}
+    assert compiled.variables == {'close'}
+    assert not compiled.uses_portfolio
+
+def test_compile_portfolio_variables():
+    """测试编译结果标记COST/POSITION依赖"""
+    parser = RuleParser(setup_data(), create_mock_indicator_service())
+    compiled = parser.compile("(close - (COST/POSITION))/(COST/POSITION) * 100 >= 5")
+    assert compiled.uses_portfolio
+    assert compiled.variables == {'close', 'COST', 'POSITION'}
+
+def test_compile_rejects_unsupported_operator():
+    """测试编译期校验不支持的运算符"""
+    parser = RuleParser(setup_data(), create_mock_indicator_service())
+    with pytest.raises(ValueError):
+        parser.compile("close != 10")
+    with pytest.raises(SyntaxError):
+        parser.evaluate_at("close != 10", 1)
+
+def setup_random_data(length: int = 300) -> pd.DataFrame:
+    """创建随机游走行情数据"""
+    rng = np.random.default_rng(7)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    return pd.DataFrame({
+        'code': 'sh.600000',
+        'close': close,
+        'volume': rng.integers(100, 1000, length).astype(float)
+    })
+
+@pytest.mark.parametrize("rule", [
+    "(REF(SMA(close,5), 1) < REF(SMA(close,7), 1)) & (SMA(close,5) > SMA(close,7))",
+    "(REF(RSI(close,5), 1) < 30) & (RSI(close,5) >= 30)",
+    "(close < REF(SMA(close,5), 1)) & (close > SMA(close,5))",
+    "MACD(close,12,26,9) > 0",
+    "close / REF(close,1) > 1.01",
+    "-close < -10",
+])
+def test_evaluate_series_matches_evaluate_at(rule):
+    """测试向量化评估与逐K线评估结果一致"""
+    from src.core.strategy.indicators import IndicatorService
+
+    data = setup_random_data()
+    series_result = RuleParser(data.copy(), IndicatorService()).evaluate_series(rule)
+
+    parser = RuleParser(data.copy(), IndicatorService())
+    scalar_result = np.array([parser.evaluate_at(rule, i) for i in range(len(data))])
+
+    assert series_result.dtype == bool
+    assert series_result.shape == (len(data),)
+    np.testing.assert_array_equal(series_result, scalar_result)
+
+def test_evaluate_series_rejects_portfolio_rule():
+    """测试依赖COST/POSITION的规则不支持向量化评估"""
+    parser = RuleParser(setup_random_data(), create_mock_indicator_service())
+    with pytest.raises(ValueError):
+        parser.evaluate_series("(close - (COST/POSITION))/(COST/POSITION) * 100 >= 5")
+
+def test_expression_results_stored_outside_dataframe():
+    """测试表达式中间结果写入列式存储，物化时才合并为DataFrame"""
+    from src.core.strategy.indicators import IndicatorService
+
+    data = setup_random_data(20)
+    columns = list(data.columns)
+    parser = RuleParser(data, IndicatorService())
+    rule = "(REF(SMA(close,3), 1) < close) & (SMA(close,3) > 0)"
+    parser.compile(rule)
+    # 编译时即预分配结果列
+    assert 'SMA(close,3)' in parser.expression_store
+
+    for i in range(len(data)):
+        parser.evaluate_at(rule, i)
+    assert list(data.columns) == columns
+
+    frame = parser.materialize()
+    assert frame['SMA(close,3) > 0'].tolist() == [i >= 3 for i in range(len(data))]
+    assert frame['SMA(close,3)'].iloc[:3].isna().all()
+    assert frame['REF(SMA(close,3),1)'].iloc[5] == frame['SMA(close,3)'].iloc[4]
+
 if __name__ == "__main__":
     pytest.main([__file__])
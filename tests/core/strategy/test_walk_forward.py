@@ -0,0 +1,62 @@
+import os
+import sys
+import pytest
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, project_root)
+
+from src.core.strategy.backtesting import BacktestConfig
+from src.core.strategy.walk_forward import WalkForwardAnalyzer, rolling_windows
+
+RULES = {
+    'open_rule': '(REF(SMA(close,{fast}),1) < REF(SMA(close,{slow}),1)) & (SMA(close,{fast}) > SMA(close,{slow}))',
+    'close_rule': '(REF(SMA(close,{fast}),1) > REF(SMA(close,{slow}),1)) & (SMA(close,{fast}) < SMA(close,{slow}))',
+}
+
+
+def make_analyzer(data, workers=1):
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20301231',
+        target_symbol='sh.600000',
+        frequency='d',
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.2},
+    )
+    return WalkForwardAnalyzer(
+        data, config, RULES, {'fast': [3, 5], 'slow': [10, 20]},
+        train_size=120, test_size=60, workers=workers,
+    )
+
+
+def test_rolling_windows():
+    assert rolling_windows(10, 4, 2) == [(0, 4, 4, 6), (2, 6, 6, 8), (4, 8, 8, 10)]
+    assert rolling_windows(10, 4, 3, step=3, anchored=True) == [(0, 4, 4, 7), (0, 7, 7, 10)]
+    with pytest.raises(ValueError):
+        rolling_windows(10, 0, 2)
+
+
+def test_walk_forward_stitches_out_of_sample_equity(make_data):
+    result = make_analyzer(make_data(300)).run()
+    windows, equity = result['windows'], result['equity']
+
+    assert len(windows) == 3
+    assert windows['error'].isna().all()
+    assert set(windows['fast']) <= {3, 5} and set(windows['slow']) <= {10, 20}
+    # 样本外净值只覆盖测试窗口（各60根K线），按时间首尾相接
+    assert len(equity) == 180
+    assert equity['timestamp'].is_monotonic_increasing
+    assert equity['window'].tolist() == [0] * 60 + [1] * 60 + [2] * 60
+    # 拼接净值的总收益等于各窗口收益复利
+    compounded = np.prod(1 + windows['test_total_return'] / 100) - 1
+    assert result['summary']['total_return'] == pytest.approx(compounded * 100)
+
+
+def test_parallel_windows_match_sequential(make_data):
+    sequential = make_analyzer(make_data(300)).run()
+    parallel = make_analyzer(make_data(300), workers=3).run()
+    pd.testing.assert_frame_equal(parallel['windows'], sequential['windows'])
+    pd.testing.assert_frame_equal(parallel['equity'], sequential['equity'])
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import src.cli as cli
+from src.cli import cache_range, main, write_cache
+from src.core.strategy.backtesting import BacktestConfig
+from src.core.strategy import optimizer
+
+RULES = {
+    'open_rule': '(REF(SMA(close,5), 1) < REF(SMA(close,7), 1)) & (SMA(close,5) > SMA(close,7))',
+    'close_rule': '(REF(SMA(close,5), 1) > REF(SMA(close,7), 1)) & (SMA(close,5) < SMA(close,7))',
+}
+
+
+def write_config(path, **overrides):
+    config = BacktestConfig(
+        start_date='20200101',
+        end_date='20200531',
+        target_symbol='sh.600000',
+        frequency='d',
+        position_strategy_type='fixed_percent',
+        position_strategy_params={'percent': 0.1},
+        **overrides,
+    ).to_dict()
+    config['rules'] = RULES
+    path.write_text(json.dumps(config), encoding='utf-8')
+    return path
+
+
+def test_backtest_from_parquet_cache(tmp_path, make_data):
+    cache = tmp_path / 'cache'
+    cache.mkdir()
+    make_data().to_parquet(cache / 'sh.600000_d.parquet', index=False)
+    config = write_config(tmp_path / 'golden.json', profile_mode='timers')
+
+    assert main(['backtest', str(config), '--cache-dir', str(cache), '--output', str(tmp_path / 'out')]) == 0
+
+    output = tmp_path / 'out' / 'golden'
+    summary = json.loads((output / 'summary.json').read_text(encoding='utf-8'))
+    assert summary['rules'] == RULES
+    assert summary['summary']['total_trades'] > 0
+    assert 'load_data' in summary['perf']['stages']
+    trades = pd.read_parquet(output / 'trades.parquet')
+    equity = pd.read_parquet(output / 'equity.parquet')
+    assert len(trades) == summary['summary']['total_trades']
+    # 只回测配置区间内的K线（1月1日至5月31日）
+    assert pd.to_datetime(equity['timestamp']).max() <= pd.Timestamp('2020-05-31')
+
+
+def test_backtest_missing_cache_fails(tmp_path):
+    config = write_config(tmp_path / 'missing.json')
+    assert main(['backtest', str(config), '--cache-dir', str(tmp_path), '--output', str(tmp_path / 'out')]) == 1
+    assert not (tmp_path / 'out' / 'missing').exists()
+
+
+def test_range_limited_cache_reloads_wider_range(tmp_path, monkeypatch, make_data):
+    """数据库加载时写入的缓存记录日期区间，回测区间超出时从数据库重新加载"""
+    cache = tmp_path / 'cache'
+    path = cache / 'sh.600000_d.parquet'
+    data = make_data()
+    write_cache(data[data['date'] <= '2020-03-31'], path, '20200101', '20200331')
+    config = write_config(tmp_path / 'wide.json')
+    output = ['--cache-dir', str(cache), '--output', str(tmp_path / 'out')]
+
+    # 未启用数据库时不用截断的缓存回测
+    assert main(['backtest', str(config)] + output) == 1
+
+    loads = []
+
+    def load_from_database(symbols, config, start_date, end_date, verify=False):
+        loads.append((symbols, start_date, end_date))
+        return {symbol: data[data['date'] <= '2020-05-31'] for symbol in symbols}
+
+    monkeypatch.setattr(cli, '_load_from_database', load_from_database)
+    assert main(['backtest', str(config), '--db'] + output) == 0
+    assert loads == [(['sh.600000'], '20200101', '20200531')]
+    assert cache_range(path) == ('20200101', '20200531')
+    equity = pd.read_parquet(tmp_path / 'out' / 'wide' / 'equity.parquet')
+    assert pd.to_datetime(equity['timestamp']).max() == pd.Timestamp('2020-05-29')  # 5月最后一个交易日
+
+    # 缓存已覆盖回测区间，不再访问数据库
+    narrow = write_config(tmp_path / 'narrow.json')
+    narrow.write_text(narrow.read_text(encoding='utf-8').replace('20200531', '20200430'), encoding='utf-8')
+    assert main(['backtest', str(narrow), '--db'] + output) == 0
+    assert len(loads) == 1
+
+
+def test_optimize_date_range_limits_bars(tmp_path, monkeypatch, make_data):
+    path = tmp_path / 'daily.csv'
+    make_data(60).to_csv(path, index=False)
+    evaluated = []
+
+    class RecordingOptimizer(optimizer.ParameterOptimizer):
+        def run(self, points, sort_by='sharpe', ascending=False):
+            evaluated.append((self.data['date'].iloc[0], self.data['date'].iloc[-1], len(self.data)))
+            return super().run(points, sort_by, ascending)
+
+    monkeypatch.setattr(optimizer, 'ParameterOptimizer', RecordingOptimizer)
+    argv = ['optimize', '--data', str(path), '--symbol', 'sh.600000', '--open-rule', 'close > SMA(close,{n})',
+            '--close-rule', 'close < SMA(close,{n})', '--grid', 'n=5']
+    assert main(argv) == 0
+    assert main(argv + ['--start', '20200110', '--end', '20200131']) == 0
+    assert evaluated == [('2020-01-01', '2020-03-24', 60), ('2020-01-10', '2020-01-31', 16)]